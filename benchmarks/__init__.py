@@ -0,0 +1 @@
+"""Reproducible benchmarks for ingestion, scoring, chart and panel hot paths"""
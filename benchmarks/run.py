@@ -0,0 +1,327 @@
+"""
+Benchmark harness. Each case reports median wall time, throughput and peak
+traced memory; results are written as JSON so runs can be compared.
+
+Usage:
+    python -m benchmarks.run [--quick] [--only SUBSTRING] [--repeat N] [--output FILE] [--compare BASELINE.json]
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from ews.batch import calculate_ews_batch, MODEL_FIELDS
+from ews.extraction import process_uploaded_file
+from ews.model import (
+    calculate_financial_ratios, calculate_altman_z_score, calculate_s_score, calculate_ews_signals
+)
+from ews.panel import (
+    PANEL_CSV_PATH, PANEL_COLUMNS, build_panel_index, build_panel_store, load_panel, panel_company_year,
+    score_ews_panel
+)
+from ews.colstore import build_column_store, open_column_store, store_company_year
+from ews.coverage import COVERAGE_POINT_BUDGET, build_coverage_summary
+from ews.export import export_panel_xlsx, iter_frame_chunks
+from ews.market import build_market_reference
+from ews.report import company_report, render_company_report, init_report_worker
+from ews.stream import scan_panel, load_stream_index, stream_company_rows
+
+from .workbooks import cf_export_workbook, vietnamese_workbook
+
+# (years, extra rows per statement) of the synthetic workbooks
+WORKBOOK_SIZES = [(5, 0), (10, 100), (20, 1000), (20, 5000)]
+QUICK_WORKBOOK_SIZES = [(5, 0), (10, 100)]
+
+# Firm-years scored by the model cases, and rows of the chart frames
+MODEL_SIZES = [100, 1000, 10000]
+QUICK_MODEL_SIZES = [100, 1000]
+CHART_SIZES = [1000, 10000, 100000]
+QUICK_CHART_SIZES = [1000, 10000]
+
+# Copies of the repository panel stacked for the panel cases
+PANEL_SCALES = [1, 10]
+QUICK_PANEL_SCALES = [1]
+
+def measure(fn, repeat=5, items=1):
+    """
+    Time fn() `repeat` times after one warm-up call, then run it once more
+    under tracemalloc for the peak allocation
+    """
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    wall = statistics.median(times)
+    return {
+        'wall_s': wall,
+        'min_s': min(times),
+        'repeat': repeat,
+        'items': items,
+        'throughput_per_s': items / wall if wall > 0 else None,
+        'peak_mb': peak / 2 ** 20
+    }
+
+def synthetic_fields(n, seed=0):
+    """n firm-years of random model fields, as dicts and as a batch frame"""
+    rng = np.random.default_rng(seed)
+    total_assets = rng.uniform(1e9, 1e13, n)
+    frame = pd.DataFrame({
+        'Total Assets': total_assets,
+        'Total Current Assets': total_assets * rng.uniform(0.1, 0.7, n),
+        'Total Current Liabilities': total_assets * rng.uniform(0.05, 0.6, n),
+        'Total Liabilities': total_assets * rng.uniform(0.1, 0.9, n),
+        'Shareholders Equity': total_assets * rng.uniform(-0.1, 0.8, n),
+        'Net Income after Tax': total_assets * rng.uniform(-0.1, 0.15, n),
+        'Revenue': total_assets * rng.uniform(0.0, 1.5, n),
+        'Total Fixed Assets - Net': total_assets * rng.uniform(0.0, 0.6, n),
+        'Retained Earnings': total_assets * rng.uniform(-0.2, 0.3, n),
+        'EBIT': total_assets * rng.uniform(-0.1, 0.2, n),
+        'Income before Taxes': total_assets * rng.uniform(-0.1, 0.18, n),
+        'Interest Expense': total_assets * rng.uniform(0.0, 0.05, n)
+    }, columns=MODEL_FIELDS)
+    return frame.to_dict('records'), frame
+
+def score_scalar(records):
+    """The per-firm-year model path of the original dashboard"""
+    for data in records:
+        ratios = calculate_financial_ratios(data)
+        calculate_altman_z_score(data, ratios)
+        calculate_s_score(data, ratios)
+        calculate_ews_signals(data, ratios)
+
+def synthetic_coverage_frame(n, seed=0):
+    """n rows of EBIT / interest / ews_level for create_interest_coverage_chart"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Year': rng.integers(2014, 2025, n),
+        'Interest': rng.lognormal(20, 2, n),
+        'EBIT': rng.lognormal(21, 2, n) * rng.choice([-1, 1], n, p=[0.1, 0.9]),
+        'ews_level': rng.choice(['Safe', 'Watchlist', 'High Risk'], n, p=[0.55, 0.3, 0.15])
+    })
+
+def ingestion_cases(sizes):
+    for fmt, build in [('cf_export', cf_export_workbook), ('vietnamese', vietnamese_workbook)]:
+        for years, extra_rows in sizes:
+            workbook = build(years, extra_rows)
+            content = workbook.getvalue()
+            name = workbook.name
+
+            def run(content=content, name=name):
+                buffer = io.BytesIO(content)
+                buffer.name = name
+                return process_uploaded_file(buffer)
+
+            params = {'format': fmt, 'years': years, 'extra_rows': extra_rows}
+            yield 'ingest.process_uploaded_file', params, run, years, 'firm-years'
+
+def model_cases(sizes):
+    for n in sizes:
+        records, frame = synthetic_fields(n)
+        yield 'model.scalar', {'firm_years': n}, lambda records=records: score_scalar(records), n, 'firm-years'
+        yield 'model.batch', {'firm_years': n}, lambda frame=frame: calculate_ews_batch(frame), n, 'firm-years'
+
+def chart_cases(sizes):
+    # The chart builders live in the dashboard module
+    from dashboard import create_interest_coverage_chart, create_portfolio_coverage_chart
+
+    for n in sizes:
+        df = synthetic_coverage_frame(n)
+
+        def build(df=df):
+            return create_interest_coverage_chart(df, 'Interest', 'EBIT')
+
+        yield 'chart.interest_coverage.build', {'rows': n}, build, n, 'rows'
+        yield 'chart.interest_coverage.to_json', {'rows': n}, lambda build=build: build()['fig'].to_json(), n, 'rows'
+
+        # Portfolio scatter: points up to the budget, log-space bins past it
+        panel = df.assign(Name=[f'C{i % 1000}' for i in range(n)])
+
+        def portfolio(panel=panel):
+            summary = build_coverage_summary(iter_frame_chunks(panel), 'Interest', 'EBIT',
+                                             budget=COVERAGE_POINT_BUDGET)
+            return create_portfolio_coverage_chart(summary).to_json()
+
+        yield 'chart.portfolio_coverage.to_json', {'rows': n}, portfolio, n, 'rows'
+
+def report_cases(sizes):
+    init_report_worker()
+    # Report cost depends on the number of years, not on the workbook's size
+    for years in sorted({years for years, _ in sizes}):
+        results = process_uploaded_file(vietnamese_workbook(years, 0))
+        report = company_report(results['data'], results['company_info'])
+        params = {'years': years}
+        yield 'report.content', params, lambda results=results: company_report(
+            results['data'], results['company_info']), 1, 'reports'
+        yield 'report.render_pdf', params, lambda report=report: render_company_report(report), 1, 'reports'
+
+def panel_cases(scales, workdir):
+    source = pd.read_csv(PANEL_CSV_PATH)
+    for scale in scales:
+        if scale == 1:
+            df = source
+        else:
+            df = pd.concat([source.assign(Name=source['Name'] + f'.{k}') for k in range(scale)], ignore_index=True)
+        csv_path = os.path.join(workdir, f'panel_x{scale}.csv')
+        store_path = os.path.join(workdir, f'panel_x{scale}.parquet')
+        df.to_csv(csv_path, index=False)
+        build_panel_store(csv_path, store_path)
+        rows = len(df)
+        params = {'scale': scale, 'rows': rows}
+
+        yield ('panel.load_csv', params,
+               lambda csv_path=csv_path: pd.read_csv(csv_path, usecols=PANEL_COLUMNS), rows, 'rows')
+        yield ('panel.load_store', params,
+               lambda csv_path=csv_path, store_path=store_path: load_panel(PANEL_COLUMNS, csv_path, store_path),
+               rows, 'rows')
+
+        panel = load_panel(PANEL_COLUMNS, csv_path, store_path)
+        names = panel['Name'].astype(str).unique()[:200]
+        years = [2014 + i % 11 for i in range(len(names))]
+
+        def filter_mask(panel=panel, names=names, years=years):
+            for name, year in zip(names, years):
+                panel[(panel['Name'] == name) & (panel['Year'] == year)]
+
+        index = build_panel_index(panel.sort_values(['Name', 'Year'], kind='stable').reset_index(drop=True))
+
+        def filter_index(index=index, names=names, years=years):
+            for name, year in zip(names, years):
+                panel_company_year(index, name, year)
+
+        store = open_column_store(build_column_store(index, os.path.join(workdir, f'panel_x{scale}.npcols')))
+
+        def filter_store(store=store, names=names, years=years):
+            for name, year in zip(names, years):
+                store_company_year(store, name, year)
+
+        yield 'panel.filter_mask', params, filter_mask, len(names), 'lookups'
+        yield 'panel.filter_index', params, filter_index, len(names), 'lookups'
+        yield 'panel.filter_store', params, filter_store, len(names), 'lookups'
+        yield 'panel.market_reference', params, lambda panel=panel: build_market_reference(panel), rows, 'rows'
+        if scale == 1:
+            # openpyxl writes some 40k cells/s; larger panels only add minutes, not information
+            scored = score_ews_panel(panel)
+            yield ('panel.export_xlsx', params,
+                   lambda scored=scored: export_panel_xlsx(iter_frame_chunks(scored)).close(), rows, 'rows')
+
+        yield 'panel.stream_scan', params, lambda csv_path=csv_path: scan_panel(csv_path, (2014, 2024)), rows, 'rows'
+
+        stream_index = load_stream_index(csv_path, (2014, 2024))
+        stream_names = stream_index['companies'][:20]
+
+        def stream_companies(stream_index=stream_index, stream_names=stream_names):
+            for name in stream_names:
+                stream_company_rows(stream_index, name)
+
+        yield 'panel.stream_company', params, stream_companies, len(stream_names), 'companies'
+
+def run_benchmarks(quick=False, only=None, repeat=5):
+    workdir = tempfile.mkdtemp(prefix='ews-bench-')
+    try:
+        groups = [
+            ingestion_cases(QUICK_WORKBOOK_SIZES if quick else WORKBOOK_SIZES),
+            model_cases(QUICK_MODEL_SIZES if quick else MODEL_SIZES),
+            chart_cases(QUICK_CHART_SIZES if quick else CHART_SIZES),
+            report_cases(QUICK_WORKBOOK_SIZES if quick else WORKBOOK_SIZES),
+            panel_cases(QUICK_PANEL_SCALES if quick else PANEL_SCALES, workdir)
+        ]
+        results = []
+        for cases in groups:
+            for name, params, fn, items, unit in cases:
+                if only and only not in name:
+                    continue
+                result = {'name': name, 'params': params, 'unit': unit}
+                result.update(measure(fn, repeat, items))
+                results.append(result)
+                print(format_result(result), file=sys.stderr)
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def run_metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__
+    }
+
+def format_result(result):
+    params = ' '.join(f'{k}={v}' for k, v in result['params'].items())
+    throughput = result['throughput_per_s'] or 0
+    return (f"{result['name']:<32} {params:<48} {result['wall_s'] * 1000:10.2f} ms "
+            f"{throughput:12.1f} {result['unit']}/s {result['peak_mb']:8.2f} MB")
+
+def result_key(result):
+    return result['name'], json.dumps(result['params'], sort_keys=True)
+
+def compare(baseline, current):
+    """Print the wall time of each case against the baseline run"""
+    before = {result_key(r): r for r in baseline['results']}
+    print(f"{'case':<80} {'baseline ms':>12} {'current ms':>12} {'speedup':>8}")
+    for result in current['results']:
+        old = before.get(result_key(result))
+        params = ' '.join(f'{k}={v}' for k, v in result['params'].items())
+        label = f"{result['name']} {params}"
+        if old is None:
+            print(f"{label:<80} {'-':>12} {result['wall_s'] * 1000:12.2f} {'-':>8}")
+        else:
+            speedup = old['wall_s'] / result['wall_s'] if result['wall_s'] > 0 else float('inf')
+            print(f"{label:<80} {old['wall_s'] * 1000:12.2f} {result['wall_s'] * 1000:12.2f} {speedup:7.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description="Run the EWS benchmarks.")
+    parser.add_argument('--quick', action='store_true', help="smaller sizes only")
+    parser.add_argument('--only', help="run only the cases whose name contains this string")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per case (default: 5)")
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help="results JSON (default: benchmark_results.json)")
+    parser.add_argument('--compare', metavar='BASELINE', help="results JSON of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    report = {
+        'meta': run_metadata(),
+        'results': run_benchmarks(args.quick, args.only, max(args.repeat, 1))
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), report)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
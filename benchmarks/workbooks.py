@@ -0,0 +1,118 @@
+"""
+Deterministic synthetic statement workbooks. The same (years, extra_rows,
+seed) always gives the same cell values, so no real filings are needed.
+"""
+
+import io
+import random
+
+import openpyxl
+
+FIRST_YEAR = 2010
+
+# (code, description, base value) per statement line of a CF-Export workbook
+CF_BALANCE_SHEET_LINES = [
+    ('ATOT', 'Total Assets', 1e6),
+    ('STCA', 'Total Current Assets', 4e5),
+    ('SCLT', 'Total Current Liabilities', 3e5),
+    ('STLB', 'Total Liabilities', 6e5),
+    ('SPPE', 'Property, Plant & Equipment - Net - Total', 2e5),
+    ('SINN', 'Intangible Assets - Total - Net', 5e4),
+    ('QTEP', "Shareholders' Equity - Attributable to Parent ShHold - Total", 4e5),
+    ('SRED', 'Retained Earnings - Total', 1e5)
+]
+CF_INCOME_STATEMENT_LINES = [
+    ('STLR', 'Revenue from Business Activities - Total', 8e5),
+    ('SIAT', 'Net Income after Tax', 5e4),
+    ('SIBT', 'Income before Taxes', 6e4),
+    ('SEBIT', 'Earnings before Interest & Taxes (EBIT)', 7e4),
+    ('SNII', 'Interest Expense - Net of (Interest Income)', 2e4)
+]
+
+# (label, base value) per statement line of a Vietnamese BCTC workbook
+VN_BALANCE_SHEET_LINES = [
+    ('TỔNG TÀI SẢN', 1e6),
+    ('A. TÀI SẢN NGẮN HẠN', 4e5),
+    ('I. Nợ ngắn hạn', 3e5),
+    ('C. NỢ PHẢI TRẢ', 6e5),
+    ('1. Tài sản cố định hữu hình', 2e5),
+    ('3. Tài sản cố định vô hình', 3e4),
+    ('D. VỐN CHỦ SỞ HỮU', 4e5),
+    ('11. Lợi nhuận sau thuế chưa phân phối', 1e5)
+]
+VN_INCOME_STATEMENT_LINES = [
+    ('1. Doanh thu bán hàng và cung cấp dịch vụ', 8e5),
+    ('4. Doanh thu hoạt động tài chính', 1e4),
+    ('7. Chi phí tài chính', 3e4),
+    ('- Trong đó: Chi phí lãi vay', 2e4),
+    ('11. Lợi nhuận thuần từ hoạt động kinh doanh', 7e4),
+    ('15. Tổng lợi nhuận kế toán trước thuế', 6e4),
+    ('18. Lợi nhuận sau thuế', 5e4)
+]
+
+def _year_values(rnd, base, years, low=0.5, high=1.5):
+    return [round(base * rnd.uniform(low, high), 2) for _ in range(years)]
+
+def _save(wb, name):
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    buffer.name = name
+    return buffer
+
+def cf_export_workbook(years=10, extra_rows=0, seed=0):
+    """
+    CF-Export workbook (Balance Sheet / Income Statement / Cash Flow sheets)
+    with `years` year columns from FIRST_YEAR and `extra_rows` filler lines
+    per statement, as a BytesIO with a .name like an upload
+    """
+    rnd = random.Random(seed)
+    year_header = list(range(FIRST_YEAR, FIRST_YEAR + years))
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Balance Sheet'
+    ws.append(['Company Name', f'Synthetic Corp {seed}'])
+    ws.append(['Scaling', 'Thousands'])
+    ws.append([])
+    ws.append(['FCC', 'Statement Data'] + year_header)
+    for code, desc, base in CF_BALANCE_SHEET_LINES:
+        ws.append([code, desc] + _year_values(rnd, base, years))
+    for i in range(extra_rows):
+        ws.append([f'X{i:05d}', f'Other balance sheet item {i}'] + _year_values(rnd, 1e4, years))
+
+    ws = wb.create_sheet('Income Statement')
+    ws.append(['Company Name', f'Synthetic Corp {seed}'])
+    ws.append(['FCC', 'Statement Data'] + year_header)
+    for code, desc, base in CF_INCOME_STATEMENT_LINES:
+        ws.append([code, desc] + _year_values(rnd, base, years, -0.5))
+    for i in range(extra_rows):
+        ws.append([f'Y{i:05d}', f'Other income statement item {i}'] + _year_values(rnd, 1e4, years, -0.5))
+
+    wb.create_sheet('Cash Flow').append(['Company Name', f'Synthetic Corp {seed}'])
+    return _save(wb, f'cf_export_{years}y_{extra_rows}r_{seed}.xlsx')
+
+def vietnamese_workbook(years=10, extra_rows=0, seed=0):
+    """Vietnamese BCTC workbook (Cân đối kế toán / Kết quả kinh doanh), same shape options as cf_export_workbook"""
+    rnd = random.Random(seed)
+    year_header = list(range(FIRST_YEAR, FIRST_YEAR + years))
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Cân đối kế toán'
+    ws.append([f'CÔNG TY CỔ PHẦN TỔNG HỢP {seed} - Bảng cân đối kế toán'])
+    ws.append(['Đơn vị: Nghìn đồng'])
+    ws.append(['Chỉ tiêu'] + year_header)
+    for label, base in VN_BALANCE_SHEET_LINES:
+        ws.append([label] + _year_values(rnd, base, years))
+    for i in range(extra_rows):
+        ws.append([f'Khoản mục cân đối khác {i}'] + _year_values(rnd, 1e4, years))
+
+    ws = wb.create_sheet('Kết quả kinh doanh')
+    ws.append(['Chỉ tiêu'] + year_header)
+    for label, base in VN_INCOME_STATEMENT_LINES:
+        ws.append([label] + _year_values(rnd, base, years, -0.5))
+    for i in range(extra_rows):
+        ws.append([f'Khoản mục kết quả khác {i}'] + _year_values(rnd, 1e4, years, -0.5))
+
+    return _save(wb, f'vietnamese_{years}y_{extra_rows}r_{seed}.xlsx')
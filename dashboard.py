@@ -1,27 +1,66 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from fpdf import FPDF
 from datetime import datetime
 import io
+import json
+import logging
+import multiprocessing
+import os
+
+from ews import timing
+
+from ews.batch import (
+    ratios_from_scores, scores_from_row, signals_from_scores, build_scoring_table, build_scoring_table_cached
+)
+from ews.cache import (
+    BoundedCache, UPLOAD_CACHE_MAX_ENTRIES, UPLOAD_CACHE_MAX_BYTES, YEAR_CACHE_MAX_ENTRIES, YEAR_CACHE_MAX_BYTES,
+    PORTFOLIO_CACHE_MAX_ENTRIES, PORTFOLIO_CACHE_MAX_BYTES, FIGURE_CACHE_MAX_ENTRIES, FIGURE_CACHE_MAX_BYTES,
+    process_uploaded_file_cached, iter_processed_uploads, portfolio_cache_key, figure_cache_key
+)
+from ews.model import EWS_LEVELS, generate_recommendations, generate_executive_summary
+from ews.panel import (
+    PANEL_COLUMNS, load_panel, panel_version, score_ews_panel, build_panel_history, build_panel_deltas,
+    apply_panel_dtypes, build_panel_index, panel_company_rows, panel_company_year, build_portfolio_cube,
+    portfolio_summary, portfolio_counts
+)
+from ews.colstore import (
+    build_column_store, column_store_is_fresh, open_column_store, column_store_frame, store_company_rows,
+    store_company_year, store_portfolio_cube
+)
+from ews.export import EXPORT_CHUNK_ROWS, export_panel_xlsx, iter_frame_chunks
+from ews.coverage import build_coverage_summary, coverage_point_budget
+from ews.market import build_market_reference, sample_market_ratios, market_reference_from_ratios, market_medians
+from ews.portfolio import PEER_METRICS, portfolio_aggregates
+from ews.report import (
+    REPORT_WORKERS, company_report, render_company_report, render_company_reports, report_archive
+)
+from ews.stream import (
+    use_panel_stream, load_stream_index, stream_company_rows, stream_company_year, iter_panel_chunks, iter_stream_companies
+)
 
 # -----------------------------------------
 # 1. CONFIG
 # -----------------------------------------
-st.set_page_config(
-    page_title="Financial High Risk EWS Dashboard",
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+
+# One JSON line of span timings per rerun while timing is on
+PERF_LOG = logging.getLogger('ews.perf')
+if not PERF_LOG.handlers:
+    _perf_handler = logging.StreamHandler()
+    _perf_handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+    PERF_LOG.addHandler(_perf_handler)
+    PERF_LOG.setLevel(logging.INFO)
+    PERF_LOG.propagate = False
+
+# Years shown by the CSV data mode
+CSV_MODE_YEARS = (2014, 2024)
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
 # -----------------------------------------
 # CUSTOM CSS
 # -----------------------------------------
-st.markdown("""
+APP_CSS = """
 <style>
 /* ========== FADE-IN ANIMATION ========== */
 @keyframes fadeInUp {
@@ -371,793 +410,65 @@ hr {
     padding-bottom: 0.5rem;
 }
 </style>
-""", unsafe_allow_html=True)
-
-# -----------------------------------------
-# 2. MAPPING DICTIONARIES
-# -----------------------------------------
-
-# Mapping for CF-Export format (FCC codes) - Based on CF-Export-07-01-2026 (6) (1).xlsx
-# NOTE: CF-Export files have Scaling=Thousands, values need to be multiplied by 1000
-FCC_MAPPING = {
-    # Balance Sheet
-    'Total Assets': ['ATOT', 'Total Assets'],
-    'Total Current Assets': ['STCA', 'Total Current Assets'],
-    'Total Current Liabilities': ['SCLT', 'Total Current Liabilities'],
-    'Total Liabilities': ['STLB', 'Total Liabilities'],
-    'Total Fixed Assets - Net': ['STNCA', 'Total Fixed Assets - Net'],
-    'PPE Net': ['SPPE', 'Property, Plant & Equipment - Net - Total'],
-    'Intangible Assets Net': ['SINN', 'Intangible Assets - Total - Net'],
-    'Shareholders Equity': ['QTEP', "Shareholders' Equity - Attributable to Parent ShHold - Total",
-                           "Shareholders' Equity - Attributable to Parent Shareholders - Total"],
-    'Total Equity': ['STLE', "Total Shareholders' Equity - including Minority Interest & Hybrid Debt"],
-    'Retained Earnings': ['SRED', 'Retained Earnings - Total'],
-    # Income Statement
-    'Revenue': ['STLR', 'Revenue from Business Activities - Total'],
-    'Net Income after Tax': ['SIAT', 'Net Income after Tax'],
-    'Income before Taxes': ['SIBT', 'Income before Taxes'],
-    'EBIT': ['SEBIT', 'Earnings before Interest & Taxes (EBIT)'],
-    # Interest Expense - Net of (Interest Income) = SNII
-    'Interest Expense': ['SNII', 'Interest Expense - Net of (Interest Income)']
-}
-
-# Mapping for Vietnamese BCTC format - Based on TLG financial statement format
-# NOTE: Vietnamese BCTC files typically use "Nghìn đồng" (thousands) as unit
-VN_MAPPING = {
-    # Balance Sheet (Cân đối kế toán)
-    'Total Assets': ['TỔNG TÀI SẢN', 'TỔNG CỘNG TÀI SẢN', 'Tổng cộng tài sản', 'Tổng tài sản'],
-    'Total Current Assets': ['A. TÀI SẢN NGẮN HẠN', 'TÀI SẢN NGẮN HẠN', 'A. Tài sản ngắn hạn', 'Tài sản ngắn hạn'],
-    'Total Current Liabilities': ['I. Nợ ngắn hạn', 'Nợ ngắn hạn', 'NỢ NGẮN HẠN'],
-    'Total Liabilities': ['C. NỢ PHẢI TRẢ', 'NỢ PHẢI TRẢ', 'C. Nợ phải trả', 'Nợ phải trả', 'Tổng nợ phải trả'],
-    'Total Fixed Assets - Net': ['II. Tài sản cố định', 'Tài sản cố định', 'TÀI SẢN CỐ ĐỊNH'],
-    'Shareholders Equity': ['D. VỐN CHỦ SỞ HỮU', 'VỐN CHỦ SỞ HỮU', 'D. Vốn chủ sở hữu', 'Vốn chủ sở hữu', 'I. Vốn chủ sở hữu'],
-    'Retained Earnings': ['Lợi nhuận sau thuế chưa phân phối', '11. Lợi nhuận sau thuế chưa phân phối', 'LNST chưa phân phối'],
-    # Fixed Assets components for calculation: TSCĐ = TSCĐ hữu hình + TSCĐ thuê tài chính + TSCĐ vô hình
-    'Tangible Fixed Assets Net': ['1. Tài sản cố định hữu hình', 'Tài sản cố định hữu hình', 'TSCĐ hữu hình'],
-    'Leased Fixed Assets Net': ['2. Tài sản cố định thuê tài chính', 'Tài sản cố định thuê tài chính', 'TSCĐ thuê tài chính'],
-    'Intangible Fixed Assets Net': ['3. Tài sản cố định vô hình', 'Tài sản cố định vô hình', 'TSCĐ vô hình'],
-    # Income Statement (Báo cáo thu nhập)
-    'Revenue': ['1. Doanh thu bán hàng và cung cấp dịch vụ', 'Doanh thu bán hàng và cung cấp dịch vụ', 'Doanh thu thuần', 'Doanh thu'],
-    'Net Income after Tax': ['18. Lợi nhuận sau thuế', 'Lợi nhuận sau thuế', '20. Lợi nhuận sau thuế của công ty mẹ', 'LNST'],
-    'Income before Taxes': ['15. Tổng lợi nhuận kế toán trước thuế', 'Tổng lợi nhuận kế toán trước thuế', 'Lợi nhuận trước thuế'],
-    'EBIT': ['11. Lợi nhuận thuần từ hoạt động kinh doanh', 'Lợi nhuận thuần từ hoạt động kinh doanh', 'Lợi nhuận từ HĐKD'],
-    'Interest Expense': ['- Trong đó: Chi phí lãi vay', 'Chi phí lãi vay', 'Lãi vay'],
-    # Components for Net Interest Expense calculation: Chi phí lãi vay (ròng) = Chi phí tài chính - Doanh thu tài chính
-    'Financial Expenses': ['7. Chi phí tài chính', 'Chi phí tài chính', '6. Chi phí tài chính'],
-    'Financial Revenue': ['4. Doanh thu hoạt động tài chính', 'Doanh thu hoạt động tài chính', 'Doanh thu tài chính', '3. Doanh thu hoạt động tài chính']
-}
-
-# Vietnamese sheet name mapping
-VN_SHEET_NAMES = {
-    'balance_sheet': ['Cân đối kế toán', 'CĐKT', 'Balance Sheet', 'Bảng cân đối kế toán'],
-    'income_statement': ['Báo cáo thu nhập', 'BCKQKD', 'Kết quả kinh doanh', 'Income Statement', 'Báo cáo kết quả kinh doanh']
-}
-
-# Required fields for analysis
-REQUIRED_FIELDS = [
-    'Total Assets',
-    'Total Current Assets',
-    'Total Current Liabilities',
-    'Total Liabilities',
-    'Shareholders Equity',
-    'Net Income after Tax',
-    'Revenue'
-]
-
-OPTIONAL_FIELDS = [
-    'Total Fixed Assets - Net',
-    'Retained Earnings',
-    'EBIT',
-    'Income before Taxes',
-    'Interest Expense'
-]
-
-# -----------------------------------------
-# 3. DATA READING FUNCTIONS
-# -----------------------------------------
-
-def detect_file_format(df, sheet_name=None):
-    """Detect if file is CF-Export format or Vietnamese BCTC format"""
-    # Check for FCC codes
-    if 'FCC Code' in df.columns or df.iloc[:, 0].astype(str).str.match(r'^[A-Z]{4}$').any():
-        return 'cf_export'
-
-    # Check for Vietnamese keywords
-    vn_keywords = ['TÀI SẢN', 'NỢ PHẢI TRẢ', 'VỐN CHỦ SỞ HỮU', 'Doanh thu', 'Lợi nhuận']
-    text_content = ' '.join(df.iloc[:30, 0].astype(str).tolist())
-    if any(kw in text_content for kw in vn_keywords):
-        return 'vietnamese'
-
-    return 'unknown'
-
-def find_data_start_row(df):
-    """Find the row where actual data starts"""
-    for idx, row in df.iterrows():
-        # Look for year columns (e.g., 2020, 2021, 2022 or dates)
-        row_str = ' '.join([str(x) for x in row.values])
-        if any(str(year) in row_str for year in range(2010, 2030)):
-            return idx
-    return 0
-
-def extract_years_from_columns(df, start_row):
-    """Extract year columns from dataframe"""
-    years = []
-    year_cols = {}
-
-    header_row = df.iloc[start_row] if start_row < len(df) else df.columns
-
-    for idx, val in enumerate(header_row):
-        val_str = str(val)
-        # Try to extract year
-        for year in range(2010, 2030):
-            if str(year) in val_str:
-                years.append(year)
-                year_cols[year] = idx
-                break
-        # Check for date format
-        if '-12-31' in val_str or '-12-30' in val_str:
-            try:
-                year = int(val_str[:4])
-                if 2010 <= year <= 2030:
-                    years.append(year)
-                    year_cols[year] = idx
-            except:
-                pass
-
-    return sorted(set(years)), year_cols
-
-def read_cf_export_file(file, sheet_name):
-    """Read CF-Export format Excel file"""
-    df = pd.read_excel(file, sheet_name=sheet_name, header=None)
-
-    # Find header row (usually row 14 or 15)
-    header_row = None
-    for idx in range(min(20, len(df))):
-        row_vals = df.iloc[idx].astype(str).tolist()
-        if 'FCC Code' in row_vals or 'Field Name' in row_vals:
-            header_row = idx
-            break
-
-    if header_row is None:
-        header_row = find_data_start_row(df)
-
-    # Set headers
-    df.columns = df.iloc[header_row]
-    df = df.iloc[header_row + 1:].reset_index(drop=True)
-
-    # Clean column names
-    df.columns = [str(c).strip() for c in df.columns]
-
-    return df
-
-def read_vietnamese_bctc(file, sheet_name):
-    """Read Vietnamese BCTC format Excel file"""
-    df = pd.read_excel(file, sheet_name=sheet_name, header=None)
-
-    # Find data start
-    data_start = 0
-    for idx in range(min(10, len(df))):
-        row_str = ' '.join([str(x) for x in df.iloc[idx].values if pd.notna(x)])
-        if any(str(year) in row_str for year in range(2015, 2030)):
-            data_start = idx
-            break
-
-    return df, data_start
-
-def extract_field_value(df, field_name, mapping, year_col, file_format):
-    """Extract a specific field value from dataframe"""
-    search_terms = mapping.get(field_name, [field_name])
-
-    for term in search_terms:
-        # Search in first column (field names)
-        for idx, row in df.iterrows():
-            cell_val = str(row.iloc[0]) if pd.notna(row.iloc[0]) else ''
-
-            if term.lower() in cell_val.lower() or cell_val.lower() in term.lower():
-                # Found the field, get value from year column
-                if isinstance(year_col, int) and year_col < len(row):
-                    val = row.iloc[year_col]
-                    if pd.notna(val):
-                        try:
-                            return float(val)
-                        except:
-                            pass
-    return None
-
-def extract_cf_export_info(df):
-    """Extract company name and scaling factor from CF-Export file header"""
-    company_name = "Unknown Company"
-    scaling_factor = 1000  # Default for CF-Export is Thousands
-
-    for idx in range(min(15, len(df))):
-        for col_idx in range(min(5, len(df.columns))):
-            cell_val = str(df.iloc[idx, col_idx]) if pd.notna(df.iloc[idx, col_idx]) else ''
-
-            # Find Company Name row
-            if 'Company Name' in cell_val:
-                # Company name is in the next column
-                if col_idx + 1 < len(df.columns):
-                    name_val = df.iloc[idx, col_idx + 1]
-                    if pd.notna(name_val):
-                        company_name = str(name_val).strip()
-
-            # Find Scaling row
-            if 'Scaling' in cell_val:
-                if col_idx + 1 < len(df.columns):
-                    scale_val = str(df.iloc[idx, col_idx + 1]).lower() if pd.notna(df.iloc[idx, col_idx + 1]) else ''
-                    if 'thousand' in scale_val:
-                        scaling_factor = 1000
-                    elif 'million' in scale_val:
-                        scaling_factor = 1000000
-                    elif 'billion' in scale_val:
-                        scaling_factor = 1000000000
-                    else:
-                        scaling_factor = 1
-
-    return company_name, scaling_factor
-
-def extract_cf_export_data(df, field_name, mapping, year_col):
-    """Extract data from CF-Export format using FCC codes"""
-    search_terms = mapping.get(field_name, [field_name])
-
-    for idx in range(len(df)):
-        fcc_code = str(df.iloc[idx, 0]) if pd.notna(df.iloc[idx, 0]) else ''
-        field_desc = str(df.iloc[idx, 1]) if len(df.columns) > 1 and pd.notna(df.iloc[idx, 1]) else ''
-
-        # Check if FCC code matches or field description matches
-        for term in search_terms:
-            if fcc_code == term or term.lower() in field_desc.lower():
-                # Found the field, get value from year column
-                if year_col < len(df.columns):
-                    val = df.iloc[idx, year_col]
-                    if pd.notna(val):
-                        try:
-                            return float(val)
-                        except:
-                            pass
-                break
-    return None
-
-def extract_vn_field_value(df, field_name, mapping, year_col):
-    """Extract data from Vietnamese BCTC format using field name matching"""
-    search_terms = mapping.get(field_name, [field_name])
-
-    for idx in range(len(df)):
-        cell_val = str(df.iloc[idx, 0]) if pd.notna(df.iloc[idx, 0]) else ''
-        cell_val_clean = cell_val.strip()
-
-        # Check if any search term matches
-        for term in search_terms:
-            # Exact match or contains match
-            if term == cell_val_clean or term.lower() == cell_val_clean.lower():
-                # Exact match found
-                if year_col < len(df.columns):
-                    val = df.iloc[idx, year_col]
-                    if pd.notna(val):
-                        try:
-                            return float(val)
-                        except:
-                            pass
-                break
-            elif term.lower() in cell_val_clean.lower():
-                # Partial match - be more careful to avoid false positives
-                # Check if it's a close enough match
-                if len(term) > 10 or cell_val_clean.startswith(term) or cell_val_clean.endswith(term):
-                    if year_col < len(df.columns):
-                        val = df.iloc[idx, year_col]
-                        if pd.notna(val):
-                            try:
-                                return float(val)
-                            except:
-                                pass
-                    break
-
-    return None
-
-def process_uploaded_file(uploaded_file):
-    """Process uploaded Excel file and extract financial data"""
-    results = {
-        'success': False,
-        'data': {},
-        'years': [],
-        'missing_fields': [],
-        'company_info': {
-            'name': 'Unknown Company',
-            'file_name': uploaded_file.name if hasattr(uploaded_file, 'name') else 'Unknown'
-        },
-        'errors': []
-    }
-
-    try:
-        # Read Excel file
-        xls = pd.ExcelFile(uploaded_file)
-        sheet_names = xls.sheet_names
-
-        # Detect CF-Export format by checking for typical sheets
-        is_cf_export = any(s.lower() in ['balance sheet', 'income statement', 'financial summary']
-                          for s in sheet_names)
-
-        if is_cf_export:
-            # CF-Export format processing
-            # Read Balance Sheet
-            df_bs = None
-            df_is = None
-            scaling_factor = 1000
-
-            for sheet in sheet_names:
-                if 'balance' in sheet.lower():
-                    df_bs = pd.read_excel(uploaded_file, sheet_name=sheet, header=None)
-                elif 'income' in sheet.lower():
-                    df_is = pd.read_excel(uploaded_file, sheet_name=sheet, header=None)
-
-            if df_bs is None:
-                df_bs = pd.read_excel(uploaded_file, sheet_name=sheet_names[0], header=None)
-
-            # Extract company info and scaling
-            company_name, scaling_factor = extract_cf_export_info(df_bs)
-            results['company_info']['name'] = company_name
-
-            # Find years row (row with "Statement Data" or year values like 2014, 2015...)
-            year_row = None
-            year_cols = {}
-
-            for idx in range(min(20, len(df_bs))):
-                row_vals = [str(df_bs.iloc[idx, c]) for c in range(len(df_bs.columns))]
-                # Check for Statement Data row or FCC header row
-                if 'Statement Data' in row_vals or 'FCC' in row_vals:
-                    year_row = idx
-                    # Next row or same row should have years
-                    for col_idx in range(2, len(df_bs.columns)):
-                        val = df_bs.iloc[idx, col_idx]
-                        if pd.notna(val):
-                            try:
-                                year = int(float(val))
-                                if 2010 <= year <= 2030:
-                                    year_cols[year] = col_idx
-                            except:
-                                pass
-                    break
-
-            results['years'] = sorted(year_cols.keys())
-
-            # Extract data for each year
-            for year in results['years']:
-                year_data = {}
-                year_col = year_cols[year]
-
-                # Extract from Balance Sheet
-                if df_bs is not None:
-                    for field in ['Total Assets', 'Total Current Assets', 'Total Current Liabilities',
-                                 'Total Liabilities', 'Total Fixed Assets - Net', 'Shareholders Equity',
-                                 'Retained Earnings']:
-                        val = extract_cf_export_data(df_bs, field, FCC_MAPPING, year_col)
-                        if val is not None:
-                            year_data[field] = val * scaling_factor
-
-                    # If Total Fixed Assets - Net not found, calculate from PPE + Intangibles
-                    if 'Total Fixed Assets - Net' not in year_data or year_data.get('Total Fixed Assets - Net') is None:
-                        ppe = extract_cf_export_data(df_bs, 'PPE Net', FCC_MAPPING, year_col)
-                        intangibles = extract_cf_export_data(df_bs, 'Intangible Assets Net', FCC_MAPPING, year_col)
-
-                        fixed_assets_total = 0
-                        if ppe is not None:
-                            fixed_assets_total += ppe
-                        if intangibles is not None:
-                            fixed_assets_total += intangibles
-
-                        if fixed_assets_total > 0:
-                            year_data['Total Fixed Assets - Net'] = fixed_assets_total * scaling_factor
-
-                # Extract from Income Statement
-                if df_is is not None:
-                    for field in ['Revenue', 'Net Income after Tax', 'Income before Taxes',
-                                 'EBIT', 'Interest Expense']:
-                        val = extract_cf_export_data(df_is, field, FCC_MAPPING, year_col)
-                        if val is not None:
-                            year_data[field] = val * scaling_factor
-                elif df_bs is not None:
-                    # Try to get from Balance Sheet file if Income Statement not found
-                    for field in ['Revenue', 'Net Income after Tax', 'Income before Taxes',
-                                 'EBIT', 'Interest Expense']:
-                        val = extract_cf_export_data(df_bs, field, FCC_MAPPING, year_col)
-                        if val is not None:
-                            year_data[field] = val * scaling_factor
-
-                # EBIT: Use extracted value if available
-                # Only calculate from formula if EBIT was not extracted
-                if not year_data.get('EBIT'):
-                    income_before_taxes = year_data.get('Income before Taxes', 0)
-                    interest_expense = year_data.get('Interest Expense', 0)
-                    if income_before_taxes and interest_expense:
-                        year_data['EBIT'] = income_before_taxes + interest_expense
-
-                results['data'][year] = year_data
-
-        else:
-            # Vietnamese BCTC format processing
-            # Find Balance Sheet and Income Statement sheets
-            df_bs = None
-            df_is = None
-            scaling_factor = 1000  # Default: "Nghìn đồng" (thousands)
-
-            for sheet in sheet_names:
-                sheet_lower = sheet.lower()
-                # Check for Balance Sheet
-                if any(vn_name.lower() in sheet_lower or sheet_lower in vn_name.lower()
-                       for vn_name in VN_SHEET_NAMES['balance_sheet']):
-                    df_bs = pd.read_excel(uploaded_file, sheet_name=sheet, header=None)
-                # Check for Income Statement
-                elif any(vn_name.lower() in sheet_lower or sheet_lower in vn_name.lower()
-                         for vn_name in VN_SHEET_NAMES['income_statement']):
-                    df_is = pd.read_excel(uploaded_file, sheet_name=sheet, header=None)
-
-            # If no specific sheets found, use first sheet
-            if df_bs is None:
-                df_bs = pd.read_excel(uploaded_file, sheet_name=sheet_names[0], header=None)
-
-            # Extract company name from header (usually in first rows)
-            for idx in range(min(10, len(df_bs))):
-                for col_idx in range(min(5, len(df_bs.columns))):
-                    cell_val = str(df_bs.iloc[idx, col_idx]) if pd.notna(df_bs.iloc[idx, col_idx]) else ''
-                    if 'CÔNG TY' in cell_val.upper() or 'COMPANY' in cell_val.upper():
-                        # Extract company name
-                        company_name = cell_val.split('\n')[0].strip()
-                        if '-' in company_name:
-                            company_name = company_name.split('-')[0].strip()
-                        results['company_info']['name'] = company_name
-                        break
-                    # Also check for unit/scaling
-                    if 'nghìn đồng' in cell_val.lower() or 'nghin dong' in cell_val.lower():
-                        scaling_factor = 1000
-                    elif 'triệu đồng' in cell_val.lower() or 'trieu dong' in cell_val.lower():
-                        scaling_factor = 1000000
-                    elif 'tỷ đồng' in cell_val.lower() or 'ty dong' in cell_val.lower():
-                        scaling_factor = 1000000000
-
-            # Find year row and extract years
-            # Only use first occurrence of each year (avoid percentage columns)
-            years = []
-            year_cols = {}
-
-            for idx in range(min(10, len(df_bs))):
-                row_vals = df_bs.iloc[idx].tolist()
-                for col_idx, val in enumerate(row_vals):
-                    if pd.notna(val):
-                        try:
-                            year_val = int(float(val))
-                            if 2010 <= year_val <= 2030:
-                                # Only add if this year hasn't been found yet
-                                # This ensures we get the FIRST occurrence (actual data columns)
-                                if year_val not in year_cols:
-                                    years.append(year_val)
-                                    year_cols[year_val] = col_idx
-                        except (ValueError, TypeError):
-                            pass
-
-            years = sorted(set(years))
-            results['years'] = years
-
-            # Extract data for each year from Balance Sheet
-            for year in years:
-                year_data = {}
-                year_col = year_cols.get(year, None)
-                if year_col is None:
-                    continue
-
-                # Extract from Balance Sheet
-                if df_bs is not None:
-                    for field in ['Total Assets', 'Total Current Assets', 'Total Current Liabilities',
-                                 'Total Liabilities', 'Total Fixed Assets - Net', 'Shareholders Equity',
-                                 'Retained Earnings']:
-                        val = extract_vn_field_value(df_bs, field, VN_MAPPING, year_col)
-                        if val is not None:
-                            year_data[field] = val * scaling_factor
-
-                    # If Total Fixed Assets - Net not found, calculate from components
-                    # Formula: TSCĐ = TSCĐ hữu hình + TSCĐ thuê tài chính + TSCĐ vô hình
-                    if 'Total Fixed Assets - Net' not in year_data or year_data.get('Total Fixed Assets - Net') is None:
-                        tangible = extract_vn_field_value(df_bs, 'Tangible Fixed Assets Net', VN_MAPPING, year_col)
-                        leased = extract_vn_field_value(df_bs, 'Leased Fixed Assets Net', VN_MAPPING, year_col)
-                        intangible = extract_vn_field_value(df_bs, 'Intangible Fixed Assets Net', VN_MAPPING, year_col)
-
-                        # Sum up components (treat None as 0)
-                        fixed_assets_total = 0
-                        if tangible is not None:
-                            fixed_assets_total += tangible
-                        if leased is not None:
-                            fixed_assets_total += leased
-                        if intangible is not None:
-                            fixed_assets_total += intangible
-
-                        if fixed_assets_total > 0:
-                            year_data['Total Fixed Assets - Net'] = fixed_assets_total * scaling_factor
-
-                # Extract from Income Statement
-                if df_is is not None:
-                    for field in ['Revenue', 'Net Income after Tax', 'Income before Taxes',
-                                 'EBIT', 'Interest Expense', 'Financial Expenses', 'Financial Revenue']:
-                        val = extract_vn_field_value(df_is, field, VN_MAPPING, year_col)
-                        if val is not None:
-                            year_data[field] = val * scaling_factor
-                else:
-                    # Try extracting from Balance Sheet file (some files have all data in one sheet)
-                    for field in ['Revenue', 'Net Income after Tax', 'Income before Taxes',
-                                 'EBIT', 'Interest Expense', 'Financial Expenses', 'Financial Revenue']:
-                        if field not in year_data:
-                            val = extract_vn_field_value(df_bs, field, VN_MAPPING, year_col)
-                            if val is not None:
-                                year_data[field] = val * scaling_factor
-
-                # Interest Expense: Use extracted "Chi phí lãi vay" directly
-                # Only calculate from Financial Expenses - Financial Revenue if not available
-                if not year_data.get('Interest Expense'):
-                    financial_expenses = year_data.get('Financial Expenses', 0)
-                    financial_revenue = year_data.get('Financial Revenue', 0)
-                    if financial_expenses:
-                        year_data['Interest Expense'] = financial_expenses - (financial_revenue or 0)
-
-                # EBIT: Use extracted "Lợi nhuận thuần từ HĐKD" directly
-                # Only calculate from formula if EBIT was not extracted
-                if not year_data.get('EBIT'):
-                    income_before_taxes = year_data.get('Income before Taxes', 0)
-                    interest_expense = year_data.get('Interest Expense', 0)
-                    if income_before_taxes and interest_expense:
-                        year_data['EBIT'] = income_before_taxes + interest_expense
-
-                results['data'][year] = year_data
-
-        # Check for missing required fields
-        if results['years']:
-            latest_year = max(results['years'])
-            latest_data = results['data'].get(latest_year, {})
-            for field in REQUIRED_FIELDS:
-                if field not in latest_data or latest_data[field] is None:
-                    results['missing_fields'].append(field)
-
-        results['success'] = len(results['missing_fields']) < len(REQUIRED_FIELDS) / 2
-
-    except Exception as e:
-        results['errors'].append(str(e))
-        results['success'] = False
-
-    return results
-
-# -----------------------------------------
-# 4. FINANCIAL RATIO CALCULATIONS
-# -----------------------------------------
-
-def calculate_financial_ratios(data):
-    """Calculate financial ratios from extracted data"""
-    ratios = {}
-
-    # Get values with defaults
-    total_assets = data.get('Total Assets', 0)
-    current_assets = data.get('Total Current Assets', 0)
-    current_liabilities = data.get('Total Current Liabilities', 0)
-    total_liabilities = data.get('Total Liabilities', 0)
-    fixed_assets = data.get('Total Fixed Assets - Net', 0)
-    equity = data.get('Shareholders Equity', 0)
-    retained_earnings = data.get('Retained Earnings', 0)
-    net_income = data.get('Net Income after Tax', 0)
-    ebit = data.get('EBIT', 0)
-    revenue = data.get('Revenue', 0)
-    interest_expense = data.get('Interest Expense', 0)
-
-    # Avoid division by zero
-    if total_assets > 0:
-        ratios['ROA'] = net_income / total_assets
-        ratios['LEV'] = total_liabilities / total_assets
-        ratios['FAR'] = fixed_assets / total_assets if fixed_assets else 0
-        ratios['SIZE'] = np.log(total_assets)
-        ratios['Retained_Earnings_to_Assets'] = retained_earnings / total_assets if retained_earnings else 0
-        ratios['WC_Assets'] = (current_assets - current_liabilities) / total_assets
-        ratios['Equity_to_Assets'] = equity / total_assets if equity else 0
-
-    if current_liabilities > 0:
-        ratios['CUR'] = current_assets / current_liabilities
-    else:
-        ratios['CUR'] = 0
-
-    if revenue > 0:
-        ratios['Net_Profit_Margin'] = net_income / revenue
-        ratios['EBIT_Margin'] = ebit / revenue if ebit else 0
-
-    if total_liabilities > 0:
-        ratios['Equity_to_Debt'] = equity / total_liabilities if equity else 0
-
-    if interest_expense and interest_expense > 0:
-        ratios['EBIT_to_Interest'] = ebit / interest_expense if ebit else 0
-        ratios['Interest_Coverage'] = ebit / interest_expense if ebit else 0
-    else:
-        ratios['EBIT_to_Interest'] = None
-        ratios['Interest_Coverage'] = None
+"""
+
+def apply_page_config():
+    """Set the page config and inject the custom CSS; must run before any other Streamlit call"""
+    st.set_page_config(
+        page_title="Financial High Risk EWS Dashboard",
+        page_icon="📊",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    st.markdown(APP_CSS, unsafe_allow_html=True)
 
-    return ratios
 
 # -----------------------------------------
-# 5. FINANCIAL RISK MODELS
+# 2. VISUALIZATION FUNCTIONS
 # -----------------------------------------
 
-def calculate_altman_z_score(data, ratios):
-    """
-    Calculate Altman Z''-Score for non-manufacturing/emerging market firms
-    Z'' = 6.56*X1 + 3.26*X2 + 6.72*X3 + 1.05*X4
-    """
-    total_assets = data.get('Total Assets', 0)
-    current_assets = data.get('Total Current Assets', 0)
-    current_liabilities = data.get('Total Current Liabilities', 0)
-    retained_earnings = data.get('Retained Earnings', 0)
-    ebit = data.get('EBIT', 0)
-    equity = data.get('Shareholders Equity', 0)
-    total_liabilities = data.get('Total Liabilities', 0)
-
-    if total_assets <= 0:
-        return None, "N/A"
+def plot_chart(fig, **kwargs):
+    """st.plotly_chart, timed as the figure serialization span"""
+    with timing.span('st.plotly_chart'):
+        st.plotly_chart(fig, **kwargs)
 
-    # X1 = Working Capital / Total Assets
-    X1 = (current_assets - current_liabilities) / total_assets
+@st.cache_resource
+def get_figure_cache():
+    """Process-wide cache of built chart figures as JSON, shared across reruns and sessions"""
+    return BoundedCache(FIGURE_CACHE_MAX_ENTRIES, FIGURE_CACHE_MAX_BYTES)
 
-    # X2 = Retained Earnings / Total Assets
-    X2 = retained_earnings / total_assets if retained_earnings else 0
-
-    # X3 = EBIT / Total Assets
-    X3 = ebit / total_assets if ebit else ratios.get('ROA', 0)
-
-    # X4 = Book Value of Equity / Total Liabilities
-    X4 = equity / total_liabilities if total_liabilities > 0 and equity else 0
-
-    # Z'' Score
-    z_score = 6.56 * X1 + 3.26 * X2 + 6.72 * X3 + 1.05 * X4
-
-    # Interpretation
-    if z_score > 2.6:
-        zone = "Safe Zone"
-    elif z_score > 1.1:
-        zone = "Grey Zone"
-    else:
-        zone = "High Risk Zone"
-
-    return z_score, zone
-
-def calculate_s_score(data, _ratios=None):
+def cached_chart(chart, inputs, build):
     """
-    Calculate S-Score using Springate (1978) model
-    S = 1.03*A + 3.07*B + 0.66*C + 0.40*D
-    A = Working Capital / Total Assets
-    B = EBIT / Total Assets
-    C = Income before Taxes / Total Current Liabilities
-    D = Revenue / Total Assets
-    Cutoff: S < 0.862 => High Risk
+    build() through the figure cache, keyed by the chart name and a fingerprint
+    of `inputs` (everything the figure depends on). The figure, or the 'fig'
+    of a chart dict such as create_interest_coverage_chart returns, is kept
+    as JSON and the caller always gets a new figure made from that JSON, so
+    the chart spec sent to the browser is the same on a miss and on a hit.
     """
-    total_assets = data.get('Total Assets', 0)
-    total_current_assets = data.get('Total Current Assets', 0)
-    total_current_liabilities = data.get('Total Current Liabilities', 0)
-    ebit = data.get('EBIT', 0)
-    income_before_taxes = data.get('Income before Taxes', 0)
-    revenue = data.get('Revenue', 0)
-
-    if total_assets == 0 or total_current_liabilities == 0:
-        return None, "N/A"
-
-    a = (total_current_assets - total_current_liabilities) / total_assets
-    b = ebit / total_assets
-    c = income_before_taxes / total_current_liabilities
-    d = revenue / total_assets
-
-    s_score = 1.03 * a + 3.07 * b + 0.66 * c + 0.40 * d
-
-    # Interpretation (Springate cutoff = 0.862)
-    if s_score >= 0.862:
-        zone = "Safe"
-    else:
-        zone = "High Risk"
-
-    return s_score, zone
-
-def calculate_ews_signals(data, ratios):
-    """Calculate Early Warning System signals"""
-    signals = {
-        'signal_ebit': 0,
-        'signal_z': 0,
-        'signal_s': 0,
-        'n_signals': 0,
-        'ews_level': 'Safe',
-        'drivers': []
-    }
-
-    # Signal 1: EBIT < Interest Expense
-    ebit = data.get('EBIT', 0)
-    interest = data.get('Interest Expense', 0)
-    if interest and interest > 0 and ebit:
-        if ebit < interest:
-            signals['signal_ebit'] = 1
-            signals['drivers'].append("EBIT lower than Interest Expense - Weak interest coverage")
-
-    # Signal 2: Z-Score
-    z_score, z_zone = calculate_altman_z_score(data, ratios)
-    if z_score is not None and z_zone == "High Risk Zone":
-        signals['signal_z'] = 1
-        signals['drivers'].append(f"Altman Z-Score = {z_score:.2f} - High risk zone")
-
-    # Signal 3: S-Score (Springate 1978, cutoff = 0.862)
-    s_score, s_zone = calculate_s_score(data, ratios)
-    if s_score is not None and s_score < 0.862:
-        signals['signal_s'] = 1
-        signals['drivers'].append(f"S-Score = {s_score:.2f} - High risk")
-
-    # Additional warning signals
-    # Low Current Ratio
-    if ratios.get('CUR', 0) < 1:
-        signals['drivers'].append(f"Current Ratio = {ratios.get('CUR', 0):.2f} < 1 - Liquidity risk")
-
-    # High Leverage
-    if ratios.get('LEV', 0) > 0.7:
-        signals['drivers'].append(f"Leverage = {ratios.get('LEV', 0):.2%} > 70% - High debt risk")
-
-    # Negative ROA
-    if ratios.get('ROA', 0) < 0:
-        signals['drivers'].append(f"ROA = {ratios.get('ROA', 0):.2%} < 0 - Operating loss")
-
-    # Count signals
-    signals['n_signals'] = signals['signal_ebit'] + signals['signal_z'] + signals['signal_s']
-
-    # Determine EWS Level
-    if signals['n_signals'] == 0:
-        signals['ews_level'] = 'Safe'
-    elif signals['n_signals'] == 1:
-        signals['ews_level'] = 'Watchlist'
-    else:
-        signals['ews_level'] = 'High Risk'
-
-    return signals
-
-def generate_recommendations(signals, ratios, data):
-    """Generate management recommendations based on analysis"""
-    recommendations = []
-
-    ews_level = signals.get('ews_level', 'Safe')
-
-    if ews_level == 'Safe':
-        recommendations.append("Financial condition is stable. Continue maintaining current indicators.")
-        recommendations.append("Investment opportunities may be considered, subject to further strategic evaluation.")
-
-    elif ews_level == 'Watchlist':
-        recommendations.append("Close monitoring of financial indicators in subsequent periods is required.")
-
-        if signals.get('signal_ebit') == 1:
-            recommendations.append("Improve operating profit margin to enhance interest coverage.")
-
-        if ratios.get('CUR', 0) < 1.2:
-            recommendations.append("Strengthen working capital management to ensure liquidity.")
-
-        if ratios.get('LEV', 0) > 0.6:
-            recommendations.append("Consider debt restructuring or increasing equity capital.")
-
-    else:  # High Risk
-        recommendations.append("WARNING: The company shows strong signs of financial high risk.")
-        recommendations.append("Urgent action is required:")
-
-        if signals.get('signal_ebit') == 1:
-            recommendations.append("- Renegotiate debt terms with creditors.")
-            recommendations.append("- Cut unnecessary operating expenses.")
-
-        if signals.get('signal_z') == 1:
-            recommendations.append("- Consider selling non-performing assets.")
-            recommendations.append("- Seek additional capital from shareholders.")
-
-        if ratios.get('CUR', 0) < 0.8:
-            recommendations.append("- Prioritize settlement of maturing short-term debts.")
-
-        recommendations.append("- Engage restructuring consultants if necessary.")
-
-    return recommendations
-
-# -----------------------------------------
-# 6. VISUALIZATION FUNCTIONS
-# -----------------------------------------
-
+    import plotly.graph_objects as go
+
+    cache = get_figure_cache()
+    key = figure_cache_key(chart, *inputs)
+    entry = cache.get(key)
+    if entry is None:
+        result = build()
+        fig = result['fig'] if isinstance(result, dict) else result
+        fig_json = fig.to_json() if fig is not None else None
+        extras = {k: v for k, v in result.items() if k != 'fig'} if isinstance(result, dict) else None
+        entry = (fig_json, extras)
+        cache.put(key, entry, nbytes=len(fig_json or '') + len(repr(extras)))
+
+    with timing.span('chart.from_json'):
+        fig_json, extras = entry
+        # Validated when first built; st.plotly_chart validates it again anyway
+        fig = go.Figure(json.loads(fig_json), _validate=False) if fig_json is not None else None
+    return fig if extras is None else {**extras, 'fig': fig}
+
+@timing.timed('chart.gauge')
 def create_gauge_chart(value, title, min_val, max_val, thresholds):
     """Create a gauge chart for displaying metrics"""
+    import plotly.graph_objects as go
+
     fig = go.Figure(go.Indicator(
         mode="gauge+number",
         value=value,
@@ -1185,35 +496,15 @@ def create_gauge_chart(value, title, min_val, max_val, thresholds):
     )
     return fig
 
-def create_ratio_comparison_chart(ratios, year):
+@timing.timed('chart.ratio_comparison')
+def create_ratio_comparison_chart(ratios, year, median_ref):
     """
-    Compare company ratios with pre-computed market medians (reference only).
-    Market medians are calculated from the research sample by year.
+    Compare company ratios with the market medians of the year (reference only).
+    median_ref maps ratio -> median, as given by market_medians.
     """
+    import plotly.graph_objects as go
 
-    ratio_names = ['ROA', 'CUR', 'LEV', 'FAR','WC_Assets']
-
-    # ===== PRE-COMPUTED MARKET MEDIANS (FROM RESEARCH SAMPLE) =====
-    market_median_by_year = {
-      2014: {'ROA': 0.052769, 'CUR': 1.510826, 'LEV': 0.502633, 'FAR': 0.360363, 'WC_Assets': 0.187950},
-        2015: {'ROA': 0.052414, 'CUR': 1.606347, 'LEV': 0.504608, 'FAR': 0.337595, 'WC_Assets': 0.210579},
-        2016: {'ROA': 0.054283, 'CUR': 1.641246, 'LEV': 0.500153, 'FAR': 0.360917, 'WC_Assets': 0.211378},
-        2017: {'ROA': 0.059779, 'CUR': 1.589761, 'LEV': 0.493173, 'FAR': 0.374649, 'WC_Assets': 0.202941},
-        2018: {'ROA': 0.059748, 'CUR': 1.604579, 'LEV': 0.476176, 'FAR': 0.358879, 'WC_Assets': 0.200405},
-        2019: {'ROA': 0.050066, 'CUR': 1.563973, 'LEV': 0.474889, 'FAR': 0.367471, 'WC_Assets': 0.214203},
-        2020: {'ROA': 0.046377, 'CUR': 1.557456, 'LEV': 0.467699, 'FAR': 0.371910, 'WC_Assets': 0.185982},
-        2021: {'ROA': 0.050660, 'CUR': 1.653436, 'LEV': 0.464749, 'FAR': 0.333126, 'WC_Assets': 0.216935},
-        2022: {'ROA': 0.045701, 'CUR': 1.677991, 'LEV': 0.454609, 'FAR': 0.324720, 'WC_Assets': 0.226708},
-        2023: {'ROA': 0.033380, 'CUR': 1.671736, 'LEV': 0.452314, 'FAR': 0.323718, 'WC_Assets': 0.220284},
-        2024: {'ROA': 0.038895, 'CUR': 1.677622, 'LEV': 0.455929, 'FAR': 0.317569, 'WC_Assets': 0.228293},
-        2025: {'ROA': 0.030631, 'CUR': 1.446915, 'LEV': 0.432996, 'FAR': 0.309996, 'WC_Assets': 0.232440},
-    }
-
-    median_ref = market_median_by_year.get(year, {})
-
-    # Nếu năm không có median (fallback an toàn)
-    if median_ref is None:
-        median_ref = {r: None for r in ratio_names}
+    ratio_names = ['ROA', 'CUR', 'LEV', 'FAR', 'WC_Assets']
 
     values = [ratios.get(r, None) for r in ratio_names]
     median_values = [median_ref.get(r, None) for r in ratio_names]
@@ -1279,8 +570,11 @@ def apply_interest_coverage_layout(fig):
     )
     return fig
 
+@timing.timed('chart.interest_coverage')
 def create_interest_coverage_chart(df_input, interest_col, ebit_col, year_col="Year", ews_col="ews_level", marker_size=11):
     """Create EBIT vs Interest scatter chart with 1x/2x coverage reference lines."""
+    import plotly.graph_objects as go
+
     ews_levels = ['Safe', 'Watchlist', 'High Risk']
     ews_colors = {'Safe': '#2ECC71', 'Watchlist': '#F1C40F', 'High Risk': '#E74C3C'}
 
@@ -1339,8 +633,22 @@ def create_interest_coverage_chart(df_input, interest_col, ebit_col, year_col="Y
             showlegend=True
         ))
 
-    x_min = df_plot[interest_col].min() * 0.5
-    x_max = df_plot[interest_col].max() * 2
+    add_coverage_reference_lines(fig, df_plot[interest_col].min(), df_plot[interest_col].max())
+
+    fig = apply_interest_coverage_layout(fig)
+    return {
+        "fig": fig,
+        "n_interest_non_positive": len(df_interest_non_positive),
+        "n_ebit_non_positive": len(df_ebit_non_positive),
+        "high_risk_interest_non_positive_years": df_high_risk_interest_non_positive[year_col].astype(str).tolist()
+    }
+
+def add_coverage_reference_lines(fig, interest_min, interest_max):
+    """Add the 1x / 2x coverage lines, labelled, across the plotted Interest range"""
+    import plotly.graph_objects as go
+
+    x_min = interest_min * 0.5
+    x_max = interest_max * 2
     x_range = [x_min, x_max]
 
     fig.add_trace(go.Scatter(
@@ -1378,34 +686,128 @@ def create_interest_coverage_chart(df_input, interest_col, ebit_col, year_col="Y
         yanchor="bottom",
         font=dict(size=11, color="#2ECC71")
     )
+    return fig
+
+@timing.timed('chart.portfolio_coverage')
+def create_portfolio_coverage_chart(summary, marker_size=5):
+    """
+    EBIT vs Interest of many firm-years (a build_coverage_summary) with WebGL
+    markers: one per firm-year while the summary holds the points, otherwise
+    one per occupied log-space bin, sized by its firm-year count. Keeps the
+    1x/2x coverage lines and the coverage chart layout. None if nothing is plottable.
+    """
+    import plotly.graph_objects as go
+
+    ews_colors = {'Safe': '#2ECC71', 'Watchlist': '#F1C40F', 'High Risk': '#E74C3C'}
+    if summary['n_points'] == 0:
+        return None
+
+    fig = go.Figure()
+    points = summary['points']
+    bins = summary['bins']
+    max_count = bins['count'].max()
 
+    # Keep all three EWS levels visible in legend even when one group has no points.
+    for level in EWS_LEVELS:
+        if points is not None:
+            df_lev = points[points['ews_level'] == level]
+            trace = dict(
+                x=df_lev['Interest'],
+                y=df_lev['EBIT'],
+                marker=dict(color=ews_colors[level], size=marker_size, opacity=0.6),
+                text=df_lev['Name'].astype(str) + " (" + df_lev['Year'].astype(str) + ")",
+                customdata=df_lev['EBIT'] / df_lev['Interest'],
+                hovertemplate=(
+                    "%{text}<br>"
+                    "Interest: %{x:,.0f}<br>"
+                    "EBIT: %{y:,.0f}<br>"
+                    "Coverage: %{customdata:.2f}x<extra></extra>"
+                )
+            )
+        else:
+            df_lev = bins[bins['ews_level'] == level]
+            # Marker at the geometric centre of the bin; area grows with the count
+            trace = dict(
+                x=10 ** ((df_lev['ix'] + 0.5) * summary['width']),
+                y=10 ** ((df_lev['iy'] + 0.5) * summary['width']),
+                marker=dict(color=ews_colors[level], size=marker_size + 20 * np.sqrt(df_lev['count'] / max_count),
+                            opacity=0.55, line=dict(width=0)),
+                customdata=df_lev['count'],
+                hovertemplate=(
+                    "Interest: ~%{x:,.0f}<br>"
+                    "EBIT: ~%{y:,.0f}<br>"
+                    "Firm-years: %{customdata:,}<extra></extra>"
+                )
+            )
+        if df_lev.empty:
+            trace.update(x=[None], y=[None], customdata=[None], text=None)
+
+        fig.add_trace(go.Scattergl(mode='markers', name=level, showlegend=True, **trace))
+
+    add_coverage_reference_lines(fig, summary['x_min'], summary['x_max'])
     fig = apply_interest_coverage_layout(fig)
-    return {
-        "fig": fig,
-        "n_interest_non_positive": len(df_interest_non_positive),
-        "n_ebit_non_positive": len(df_ebit_non_positive),
-        "high_risk_interest_non_positive_years": df_high_risk_interest_non_positive[year_col].astype(str).tolist()
-    }
+    fig.update_layout(title_text="EBIT vs Interest Expense (Interest Coverage), All Companies")
+    return fig
 
 # -----------------------------------------
-# 7. MAIN APPLICATION
+# 3. MAIN APPLICATION
 # -----------------------------------------
 
 def main():
-    st.title("Financial Risk Early Warning System (EWS)")
-    st.caption("Early Warning System for Financial Risk | Upload Financial Statements for Analysis")
-
-    # Sidebar
-    st.sidebar.header("Data Input Method")
-    input_mode = st.sidebar.radio(
-        "Select data source:",
-        ["Upload Financial Statements", "Sample Data (CSV)"]
-    )
+    apply_page_config()
 
-    if input_mode == "Upload Financial Statements":
-        render_upload_mode()
-    else:
-        render_csv_mode()
+    # Span timing runs while the Performance panel is shown, or on every rerun with EWS_TIMING=1
+    if st.session_state.get('show_performance') or os.environ.get('EWS_TIMING') == '1':
+        timing.start()
+
+    try:
+        with timing.span('rerun'):
+            st.title("Financial Risk Early Warning System (EWS)")
+            st.caption("Early Warning System for Financial Risk | Upload Financial Statements for Analysis")
+
+            # Sidebar
+            st.sidebar.header("Data Input Method")
+            input_mode = st.sidebar.radio(
+                "Select data source:",
+                ["Upload Financial Statements", "Portfolio Comparison (Upload)", "Sample Data (CSV)"]
+            )
+
+            if input_mode == "Upload Financial Statements":
+                render_upload_mode()
+            elif input_mode == "Portfolio Comparison (Upload)":
+                render_portfolio_mode()
+            else:
+                render_csv_mode()
+    finally:
+        records = timing.stop()
+        if records:
+            PERF_LOG.info(timing.log_line(records, event='rerun'))
+
+    st.sidebar.checkbox("Show performance panel", key='show_performance',
+                        help="Time parsing, scoring, charts and rendering on each rerun")
+    if st.session_state.get('show_performance') and records:
+        render_performance_panel(records)
+
+def render_performance_panel(records):
+    """Sidebar table of the span timings of this rerun"""
+    summary = timing.summarize(records)
+    with st.sidebar.expander("Performance", expanded=True):
+        rerun = next((entry for entry in summary if entry['name'] == 'rerun'), None)
+        if rerun is not None:
+            st.caption(f"Rerun: {rerun['total_ms']:.1f} ms")
+        figures = get_figure_cache().stats()
+        st.caption(f"Figure cache: {figures['hits']} hits, {figures['misses']} misses, "
+                   f"{figures['entries']} figures ({figures['bytes'] / 2 ** 20:.1f} MB)")
+        st.dataframe(
+            pd.DataFrame([{
+                'Span': entry['name'],
+                'Calls': entry['calls'],
+                'Total (ms)': round(entry['total_ms'], 2),
+                'Max (ms)': round(entry['max_ms'], 2)
+            } for entry in summary]),
+            hide_index=True,
+            use_container_width=True
+        )
 
 def generate_sample_csv():
     """Generate sample CSV template for users to download"""
@@ -1469,6 +871,7 @@ def generate_sample_csv():
     }
     return pd.DataFrame(sample_data)
 
+@timing.timed('render.sample_csv')
 def render_sample_csv_section():
     """Render the sample CSV download section"""
     st.markdown("---")
@@ -1510,6 +913,7 @@ def render_sample_csv_section():
         with col_info:
             st.info("Unit: VND | Format: UTF-8")
 
+@timing.timed('render.upload')
 def render_upload_section():
     """Render the file upload section"""
     # =========================================
@@ -1519,69 +923,22 @@ def render_upload_section():
     st.markdown('<p class="section-title">1. Upload File</p>', unsafe_allow_html=True)
 
     with st.container(border=True):
-        uploaded_file = st.file_uploader(
+        uploaded_files = st.file_uploader(
             "Select Financial Statement File (Excel)",
             type=['xlsx', 'xls'],
-            help="Supports CF-Export format or Vietnamese BCTC format"
+            accept_multiple_files=True,
+            help="Supports CF-Export format or Vietnamese BCTC format. Select several files to compare companies."
         )
 
-        if uploaded_file is not None:
-            with st.spinner("Reading and processing data..."):
-                results = process_uploaded_file(uploaded_file)
-
-            if results['success']:
-                # Display company info
-                col_info1, col_info2, col_year = st.columns([2, 2, 1])
-
-                with col_info1:
-                    company_name = results['company_info'].get('name', 'Unknown')
-                    st.markdown(f"**Company:** {company_name}")
-
-                with col_info2:
-                    sorted_years = sorted(results['years'])
-                    if len(sorted_years) > 1:
-                        years_str = f"{sorted_years[0]} - {sorted_years[-1]}"
-                    else:
-                        years_str = str(sorted_years[0])
-                    st.markdown(f"**Reporting Period:** {years_str} ({len(results['years'])} years)")
-
-                with col_year:
-                    if results['years']:
-                        selected_year = st.selectbox(
-                            "Analysis Year:",
-                            options=sorted(results['years'], reverse=True),
-                            label_visibility="collapsed"
-                        )
-
-                # Status message
-                if results['missing_fields']:
-                    st.warning(f"Insufficient data for analysis. Missing: {', '.join(results['missing_fields'][:3])}")
-                else:
-                    st.success("Data loaded successfully!")
-
-                # Process if year selected
-                if results['years']:
-                    year_data = results['data'].get(selected_year, {})
-
-                    if year_data:
-                        # Store in session state
-                        st.session_state['year_data'] = year_data
-                        st.session_state['all_data'] = results['data']
-                        st.session_state['selected_year'] = selected_year
-                        st.session_state['num_years'] = len(results['years'])
-                        st.session_state['company_info'] = results['company_info']
-
-                        # Continue with analysis
-                        render_analysis(year_data, results['data'], selected_year)
-                    else:
-                        st.error("No data available for the selected year.")
+        if uploaded_files:
+            if len(uploaded_files) == 1:
+                with st.spinner("Reading and processing data..."):
+                    results = process_uploaded_file_cached(uploaded_files[0], get_upload_cache(), get_year_cache())
             else:
-                st.error("Unable to read data from file. Please check the format.")
-                if results['errors']:
-                    for err in results['errors']:
-                        st.error(err)
-                if results['missing_fields']:
-                    st.warning(f"Insufficient data for analysis. Missing: {', '.join(results['missing_fields'])}")
+                results = render_upload_batch(uploaded_files)
+
+            if results is not None:
+                render_upload_results(results)
         else:
             st.info("Please upload an Excel file containing Financial Statements to begin analysis.")
 
@@ -1606,76 +963,420 @@ def render_upload_section():
                 - Revenue
                 """)
 
+def upload_status_row(file_name, results=None):
+    """One row of the multi-file upload table; no results yet means the file is still being parsed"""
+    row = {'File': file_name, 'Company': '', 'Status': 'Processing...', 'Years': '', 'Latest year': '',
+           'EWS level': '', 'Signals': ''}
+    if results is None:
+        return row
+
+    row['Company'] = results['company_info'].get('name', 'Unknown')
+    if not results['success']:
+        row['Status'] = 'Failed'
+        return row
+
+    row['Status'] = 'Missing fields' if results['missing_fields'] else 'OK'
+    years = sorted(results['years'])
+    if years:
+        row['Years'] = f"{years[0]} - {years[-1]}" if len(years) > 1 else str(years[0])
+        scores = get_scoring_table(results['data'])
+        latest = scores.loc[years[-1]]
+        row['Latest year'] = str(years[-1])
+        row['EWS level'] = latest['ews_level']
+        row['Signals'] = str(int(latest['n_signals']))
+    return row
+
+@timing.timed('render.upload_batch')
+def render_upload_batch(uploaded_files):
+    """
+    Parse several uploads concurrently, filling a live table as each one
+    finishes, then let the user pick the company to analyse. Returns the
+    picked upload's results, or None if no upload could be read.
+    """
+    n_files = len(uploaded_files)
+    rows = [upload_status_row(uploaded_file.name) for uploaded_file in uploaded_files]
+    all_results = [None] * n_files
+
+    table = st.empty()
+    progress = st.progress(0.0, text=f"Processing {n_files} files...")
+    table.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+    uploads = iter_processed_uploads(uploaded_files, get_upload_cache(), get_year_cache())
+    for done, (position, results) in enumerate(uploads, start=1):
+        all_results[position] = results
+        rows[position] = upload_status_row(uploaded_files[position].name, results)
+        table.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        progress.progress(done / n_files, text=f"Processed {done} of {n_files} files")
+    progress.empty()
+
+    readable = [i for i, results in enumerate(all_results) if results['success']]
+    for i, results in enumerate(all_results):
+        if not results['success']:
+            st.error(f"{uploaded_files[i].name}: unable to read data from file. "
+                     + "; ".join(results['errors']))
+    if not readable:
+        return None
+
+    selected = st.selectbox(
+        "Company to analyse:",
+        options=readable,
+        format_func=lambda i: f"{rows[i]['Company']} ({uploaded_files[i].name})"
+    )
+    return all_results[selected]
+
+def render_upload_results(results):
+    """Company info, year picker and analysis of one processed upload"""
+    if results['success']:
+        # Display company info
+        col_info1, col_info2, col_year = st.columns([2, 2, 1])
+
+        with col_info1:
+            company_name = results['company_info'].get('name', 'Unknown')
+            st.markdown(f"**Company:** {company_name}")
+
+        with col_info2:
+            sorted_years = sorted(results['years'])
+            if len(sorted_years) > 1:
+                years_str = f"{sorted_years[0]} - {sorted_years[-1]}"
+            else:
+                years_str = str(sorted_years[0])
+            st.markdown(f"**Reporting Period:** {years_str} ({len(results['years'])} years)")
+
+        with col_year:
+            if results['years']:
+                selected_year = st.selectbox(
+                    "Analysis Year:",
+                    options=sorted(results['years'], reverse=True),
+                    label_visibility="collapsed"
+                )
+
+        # Status message
+        if results['missing_fields']:
+            st.warning(f"Insufficient data for analysis. Missing: {', '.join(results['missing_fields'][:3])}")
+        else:
+            st.success("Data loaded successfully!")
+
+        # Process if year selected
+        if results['years']:
+            year_data = results['data'].get(selected_year, {})
+
+            if year_data:
+                # Store in session state
+                st.session_state['year_data'] = year_data
+                st.session_state['all_data'] = results['data']
+                st.session_state['selected_year'] = selected_year
+                st.session_state['num_years'] = len(results['years'])
+                st.session_state['company_info'] = results['company_info']
+
+                # Continue with analysis
+                scores = get_scoring_table(results['data'])
+                render_analysis(year_data, results['data'], selected_year, scores)
+            else:
+                st.error("No data available for the selected year.")
+    else:
+        st.error("Unable to read data from file. Please check the format.")
+        if results['errors']:
+            for err in results['errors']:
+                st.error(err)
+        if results['missing_fields']:
+            st.warning(f"Insufficient data for analysis. Missing: {', '.join(results['missing_fields'])}")
+
+@st.cache_resource
+def get_upload_cache():
+    """Process-wide cache of parsed uploads, shared across reruns and sessions"""
+    return BoundedCache(UPLOAD_CACHE_MAX_ENTRIES, UPLOAD_CACHE_MAX_BYTES)
+
+@st.cache_resource
+def get_year_cache():
+    """Process-wide cache of per-year fields, scores and trends, so a corrected re-upload only redoes changed years"""
+    return BoundedCache(YEAR_CACHE_MAX_ENTRIES, YEAR_CACHE_MAX_BYTES)
+
+def get_scoring_table(all_data):
+    """Scoring table of one upload, rescoring only the years not seen before"""
+    return build_scoring_table_cached(all_data, get_year_cache())
+
 def render_upload_mode():
     """Render the upload mode - only upload section"""
+    if st.sidebar.button("Clear cached uploads", help="Force uploaded files to be parsed again"):
+        get_upload_cache().clear()
+        get_year_cache().clear()
+
     render_upload_section()
 
-def render_analysis(year_data, all_data, selected_year):
-    """Render the analysis dashboard for uploaded BCTC"""
+@st.cache_resource
+def get_portfolio_cache():
+    """Process-wide cache of scored upload portfolios and their aggregates, keyed by the uploaded files"""
+    return BoundedCache(PORTFOLIO_CACHE_MAX_ENTRIES, PORTFOLIO_CACHE_MAX_BYTES)
 
-    # ===== Market median by year (pre-computed, reference only) =====
-    market_median_by_year = {
-        2014: {'ROA': 0.052769, 'CUR': 1.510826, 'LEV': 0.502633, 'FAR': 0.360363, 'WC_Assets': 0.187950},
-        2015: {'ROA': 0.052414, 'CUR': 1.606347, 'LEV': 0.504608, 'FAR': 0.337595, 'WC_Assets': 0.210579},
-        2016: {'ROA': 0.054283, 'CUR': 1.641246, 'LEV': 0.500153, 'FAR': 0.360917, 'WC_Assets': 0.211378},
-        2017: {'ROA': 0.059779, 'CUR': 1.589761, 'LEV': 0.493173, 'FAR': 0.374649, 'WC_Assets': 0.202941},
-        2018: {'ROA': 0.059748, 'CUR': 1.604579, 'LEV': 0.476176, 'FAR': 0.358879, 'WC_Assets': 0.200405},
-        2019: {'ROA': 0.050066, 'CUR': 1.563973, 'LEV': 0.474889, 'FAR': 0.367471, 'WC_Assets': 0.214203},
-        2020: {'ROA': 0.046377, 'CUR': 1.557456, 'LEV': 0.467699, 'FAR': 0.371910, 'WC_Assets': 0.185982},
-        2021: {'ROA': 0.050660, 'CUR': 1.653436, 'LEV': 0.464749, 'FAR': 0.333126, 'WC_Assets': 0.216935},
-        2022: {'ROA': 0.045701, 'CUR': 1.677991, 'LEV': 0.454609, 'FAR': 0.324720, 'WC_Assets': 0.226708},
-        2023: {'ROA': 0.033380, 'CUR': 1.671736, 'LEV': 0.452314, 'FAR': 0.323718, 'WC_Assets': 0.220284},
-        2024: {'ROA': 0.038895, 'CUR': 1.677622, 'LEV': 0.455929, 'FAR': 0.317569, 'WC_Assets': 0.228293},
-        2025: {'ROA': 0.030631, 'CUR': 1.446915, 'LEV': 0.432996, 'FAR': 0.309996, 'WC_Assets': 0.232440},
-    }
+def load_upload_portfolio(uploaded_files):
+    """
+    Aggregates of a batch of uploads: from the portfolio cache, or parsed
+    concurrently and scored in one batch on the first rerun that sees them
+    """
+    cache = get_portfolio_cache()
+    key = portfolio_cache_key(uploaded_files)
+    aggregates = cache.get(key)
+    if aggregates is None:
+        n_files = len(uploaded_files)
+        uploads = [None] * n_files
+        progress = st.progress(0.0, text=f"Processing {n_files} files...")
+        for done, (position, results) in enumerate(
+                iter_processed_uploads(uploaded_files, get_upload_cache(), get_year_cache()), start=1):
+            uploads[position] = (uploaded_files[position].name, results)
+            progress.progress(done / n_files, text=f"Processed {done} of {n_files} files")
+        progress.empty()
+
+        with st.spinner("Scoring portfolio..."):
+            aggregates = portfolio_aggregates(uploads)
+        cache.put(key, aggregates)
+    return aggregates
+
+@timing.timed('render.portfolio_mode')
+def render_portfolio_mode():
+    """Render the portfolio mode: many uploaded companies scored and compared side by side"""
+    st.markdown("---")
+    st.markdown('<p class="section-title">1. Upload Portfolio</p>', unsafe_allow_html=True)
+
+    with st.container(border=True):
+        uploaded_files = st.file_uploader(
+            "Select Financial Statement Files (Excel)",
+            type=['xlsx', 'xls'],
+            accept_multiple_files=True,
+            key='portfolio_files',
+            help="One workbook per company, in CF-Export or Vietnamese BCTC format"
+        )
+
+        if not uploaded_files:
+            st.info("Please upload the Financial Statements of the companies to compare.")
+            return
+
+        aggregates = load_upload_portfolio(uploaded_files)
+        for file_name, errors in aggregates['failed']:
+            st.error(f"{file_name}: unable to read data from file. " + "; ".join(errors))
+        if not aggregates['companies']:
+            return
+
+        years = aggregates['years']
+        years_str = f"{years[0]} - {years[-1]}" if len(years) > 1 else str(years[0])
+        st.markdown(f"**Companies:** {len(aggregates['companies'])} | **Reporting Period:** {years_str}")
+
+    render_upload_portfolio(aggregates)
+
+@timing.timed('render.portfolio')
+def render_upload_portfolio(aggregates):
+    """EWS distribution, league table and peer percentiles of an upload portfolio"""
+    import plotly.express as px
+
+    # =========================================
+    # SECTION 2: EWS DISTRIBUTION
+    # =========================================
+    st.markdown("---")
+    st.markdown('<p class="section-title">2. EWS Distribution</p>', unsafe_allow_html=True)
 
-    median_ref = market_median_by_year.get(selected_year, {})
+    with st.container(border=True):
+        col_filter, col_chart = st.columns([1, 4])
+
+        with col_filter:
+            period = st.selectbox(
+                "Year",
+                options=["Latest year"] + aggregates['years'][::-1],
+                key='portfolio_year',
+                help="Latest year compares each company on its most recent statements"
+            )
+            year = None if period == "Latest year" else period
+            league = aggregates['league'][year]
 
+            levels = league['ews_level'].value_counts()
+            st.markdown("**Summary**")
+            st.markdown(f"Companies: {len(league)}")
+            if levels.get('Safe', 0) > 0:
+                st.success(f"Safe: {levels['Safe']}")
+            if levels.get('Watchlist', 0) > 0:
+                st.warning(f"Watchlist: {levels['Watchlist']}")
+            if levels.get('High Risk', 0) > 0:
+                st.error(f"High Risk: {levels['High Risk']}")
+            st.markdown(f"Priority: {int(league['priority_flag'].sum())}")
+
+        with col_chart:
+            ews_colors = {
+                "Safe": "#2ECC71",
+                "Watchlist": "#F1C40F",
+                "High Risk": "#E74C3C"
+            }
+            ews_count = portfolio_counts(aggregates['cube'])
+            fig_ews = cached_chart(
+                'ews_distribution', (ews_count,),
+                lambda: px.bar(
+                    ews_count,
+                    x="Year",
+                    y="count",
+                    color="ews_level",
+                    color_discrete_map=ews_colors
+                ).update_layout(barmode="stack", height=400)
+            )
+            plot_chart(fig_ews, use_container_width=True)
+
+    # =========================================
+    # SECTION 3: INTEREST COVERAGE
+    # =========================================
+    st.markdown("---")
+    st.markdown('<p class="section-title">3. Interest Coverage</p>', unsafe_allow_html=True)
+
+    with st.container(border=True):
+        coverage = build_coverage_summary(iter_frame_chunks(aggregates['panel']), year=year,
+                                          budget=coverage_point_budget())
+        render_portfolio_coverage(coverage, "all years" if year is None else year)
+
+    # =========================================
+    # SECTION 4: LEAGUE TABLE
+    # =========================================
+    st.markdown("---")
+    st.markdown('<p class="section-title">4. Priority League Table</p>', unsafe_allow_html=True)
+
+    with st.container(border=True):
+        flagged_only = st.checkbox("Only priority and High Risk companies", key='portfolio_flagged_only')
+        table = league
+        if flagged_only:
+            table = table[(table['priority_flag'] == 1) | (table['ews_level'] == 'High Risk')]
+        st.caption("Click a column header to sort.")
+        st.dataframe(
+            table.round({'Z_Score': 2, 'S_Score': 2, 'ROA': 3, 'LEV': 3, 'CUR': 2}),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    # =========================================
+    # SECTION 5: PEER PERCENTILES
+    # =========================================
+    st.markdown("---")
+    st.markdown('<p class="section-title">5. Peer Percentiles</p>', unsafe_allow_html=True)
+
+    with st.container(border=True):
+        company = st.selectbox("Company", options=aggregates['companies'], key='portfolio_company')
+        percentiles = aggregates['percentiles'][year]
+
+        if company not in percentiles.index:
+            st.info(f"No statements for {company} in {period}.")
+        else:
+            render_peer_percentiles(league, percentiles, company)
+
+    # =========================================
+    # SECTION 6: REPORTS AND EXPORT
+    # =========================================
+    st.markdown("---")
+    st.markdown('<p class="section-title">6. Reports and Export</p>', unsafe_allow_html=True)
+
+    with st.container(border=True):
+        names = league['Name'].tolist()
+        scope = "each company's latest year" if year is None else year
+        col_pdf, col_xlsx = st.columns(2)
+        with col_pdf:
+            st.markdown(f"One PDF report per company ({len(names)} companies), for {scope}.")
+            st.download_button(
+                label="Download PDF reports (ZIP)",
+                data=lambda: render_portfolio_reports(aggregates, names, year),
+                file_name=f"ews_reports_{year or 'latest'}.zip",
+                mime="application/zip",
+                on_click='ignore'
+            )
+        with col_xlsx:
+            st.markdown("Scored panel of every year, with the EWS summary and risk drivers.")
+            st.download_button(
+                label="Download Excel (XLSX)",
+                data=lambda: xlsx_download(iter_frame_chunks(aggregates['panel'])),
+                file_name="ews_portfolio.xlsx",
+                mime=XLSX_MIME,
+                on_click='ignore'
+            )
+
+def xlsx_download(chunks):
+    """
+    XLSX export of scored panel chunks as bytes. Streamlit keeps every
+    download in memory as bytes (it reads file-like data out in full too), so
+    the finished file is always held once. The spooled temporary file only
+    keeps a second, in-progress copy on disk for exports past EXPORT_SPOOL_BYTES.
+    """
+    with export_panel_xlsx(chunks) as f:
+        return f.read()
+
+def render_peer_percentiles(league, percentiles, company):
+    """Peer table and percentile bars of one portfolio company"""
+    import plotly.express as px
+
+    row = league[league['Name'] == company].iloc[0]
+    peer_rows = pd.DataFrame({
+        'Metric': PEER_METRICS,
+        'Value': [round(float(row[metric]), 3) for metric in PEER_METRICS],
+        'Peer median': [round(float(league[metric].median()), 3) for metric in PEER_METRICS],
+        'Percentile': [round(float(percentiles.at[company, metric]), 1) for metric in PEER_METRICS]
+    })
+
+    col_table, col_bar = st.columns([2, 3])
+    with col_table:
+        st.dataframe(peer_rows, use_container_width=True, hide_index=True)
+        st.caption(f"Percentile: share of the {len(league)} companies at or below the company's value.")
+    with col_bar:
+        fig_peers = cached_chart(
+            'peer_percentiles', (peer_rows[['Metric', 'Percentile']],),
+            lambda: px.bar(peer_rows, x='Percentile', y='Metric', orientation='h', range_x=[0, 100])
+            .update_layout(height=300, margin=dict(l=0, r=0, t=10, b=0))
+        )
+        plot_chart(fig_peers, use_container_width=True)
+
+def render_portfolio_coverage(coverage, period):
+    """Portfolio EBIT vs Interest scatter of a build_coverage_summary, with what it leaves out"""
+    st.markdown(f"**EBIT vs Interest Expense, all companies ({period})**")
+    fig = cached_chart(
+        'portfolio_coverage', (coverage['points'], coverage['bins'], coverage['x_min'], coverage['x_max']),
+        lambda: create_portfolio_coverage_chart(coverage)
+    )
+    if fig is None:
+        st.info("Insufficient positive EBIT and Interest values for coverage scatter chart.")
+        return
+
+    plot_chart(fig, use_container_width=True)
+    if coverage['points'] is None:
+        st.caption(
+            f"{coverage['n_points']:,} firm-years exceed the {coverage['budget']:,}-point budget: each marker is "
+            "a bin of similar Interest and EBIT, sized by its number of firm-years."
+        )
+    n_excluded = coverage['n_interest_non_positive'] + coverage['n_ebit_non_positive']
+    if n_excluded > 0:
+        st.info(f"{n_excluded} firm-year(s) with Interest or EBIT <= 0 are excluded from the log-scale scatter.")
+
+def render_portfolio_reports(aggregates, names, year):
+    """ZIP of the PDF reports of the named portfolio companies, rendered in a process pool"""
+    items = []
+    for name in names:
+        all_data, company_info = aggregates['statements'][name]
+        items.append((all_data, {**company_info, 'name': name}, year))
+    # Spawned, not forked: the server process is multi-threaded
+    pdfs = render_company_reports(items, REPORT_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return report_archive(zip(names, pdfs))
+
+@timing.timed('render.analysis')
+def render_analysis(year_data, all_data, selected_year, scores=None):
+    """Render the analysis dashboard for uploaded BCTC"""
+    import plotly.express as px
 
     # Get number of years
     num_years = len(all_data)
 
+    # Per-year scoring table (ratios, scores, signals, trend and YoY)
+    if scores is None:
+        scores = build_scoring_table(all_data)
+    year_scores = scores.loc[selected_year]
+
     # Calculate ratios and signals
-    ratios = calculate_financial_ratios(year_data)
-    signals = calculate_ews_signals(year_data, ratios)
-    z_score, z_zone = calculate_altman_z_score(year_data, ratios)
-    s_score, s_zone = calculate_s_score(year_data, ratios)
+    ratios = ratios_from_scores(year_scores)
+    signals = signals_from_scores(year_scores)
+    z_score, z_zone, s_score, s_zone = scores_from_row(year_scores)
     recommendations = generate_recommendations(signals, ratios, year_data)
 
-    # Calculate priority flag
-    priority_flag = 1 if signals['n_signals'] >= 2 or signals['ews_level'] == 'High Risk' else 0
-
-    # Calculate risk trend and YoY changes
-    risk_trend = "Stable"
-    ebit_yoy = None
-    signal_delta = 0
-
-    if num_years > 1:
-        years_sorted = sorted(all_data.keys())
-        current_idx = years_sorted.index(selected_year) if selected_year in years_sorted else -1
-
-        if current_idx > 0:
-            prev_year = years_sorted[current_idx - 1]
-            prev_data = all_data[prev_year]
-            prev_ratios = calculate_financial_ratios(prev_data)
-            prev_signals = calculate_ews_signals(prev_data, prev_ratios)
-
-            # Calculate signal delta
-            signal_delta = signals['n_signals'] - prev_signals['n_signals']
-
-            # Determine risk trend
-            if signals['n_signals'] > prev_signals['n_signals']:
-                risk_trend = "Worsening"
-            elif signals['n_signals'] < prev_signals['n_signals']:
-                risk_trend = "Improving"
-            else:
-                risk_trend = "Stable"
-
-            # Calculate EBIT YoY change
-            curr_ebit = year_data.get('EBIT', 0)
-            prev_ebit = prev_data.get('EBIT', 0)
-            if prev_ebit and prev_ebit != 0:
-                ebit_yoy = ((curr_ebit - prev_ebit) / abs(prev_ebit)) * 100
+    # Priority flag, risk trend and YoY changes against the previous year
+    priority_flag = int(year_scores['priority_flag'])
+    risk_trend = year_scores['risk_trend']
+    signal_delta = int(year_scores['signal_delta'])
+    ebit_yoy = year_scores['EBIT_yoy'] if pd.notna(year_scores['EBIT_yoy']) else None
 
     # Get company name from session state
     company_name = st.session_state.get('company_info', {}).get('name', 'Company')
@@ -1794,26 +1495,30 @@ def render_analysis(year_data, all_data, selected_year):
 
             with gauge_col1:
                 if z_score is not None:
-                    fig_z = create_gauge_chart(
-                        z_score,
-                        f"Altman Z''-Score",
-                        -2, 5, [1.1, 2.6]
+                    fig_z = cached_chart(
+                        'gauge', (z_score, "Altman Z''-Score", -2, 5, [1.1, 2.6], 220),
+                        lambda: create_gauge_chart(
+                            z_score,
+                            f"Altman Z''-Score",
+                            -2, 5, [1.1, 2.6]
+                        ).update_layout(height=220)
                     )
-                    fig_z.update_layout(height=220)
-                    st.plotly_chart(fig_z, use_container_width=True)
+                    plot_chart(fig_z, use_container_width=True)
                     zone_color = "#2ECC71" if z_zone == "Safe Zone" else ("#F1C40F" if z_zone == "Grey Zone" else "#E74C3C")
                     st.markdown(f'<p style="text-align:center; color:{zone_color}; font-weight:600;">{z_zone}</p>', unsafe_allow_html=True)
                 else:
                     st.info("Insufficient data for Z-Score calculation")
 
             with gauge_col2:
-                fig_s = create_gauge_chart(
-                    s_score,
-                    f"S-Score (Springate)",
-                    -1, 3, [0.862, 0.862]
+                fig_s = cached_chart(
+                    'gauge', (s_score, "S-Score (Springate)", -1, 3, [0.862, 0.862], 220),
+                    lambda: create_gauge_chart(
+                        s_score,
+                        f"S-Score (Springate)",
+                        -1, 3, [0.862, 0.862]
+                    ).update_layout(height=220)
                 )
-                fig_s.update_layout(height=220)
-                st.plotly_chart(fig_s, use_container_width=True)
+                plot_chart(fig_s, use_container_width=True)
                 zone_color = "#2ECC71" if s_zone == "Safe" else "#E74C3C"
                 st.markdown(f'<p style="text-align:center; color:{zone_color}; font-weight:600;">{s_zone}</p>', unsafe_allow_html=True)
 
@@ -1828,12 +1533,25 @@ def render_analysis(year_data, all_data, selected_year):
         tab1, tab2 = st.tabs(["Financial Ratios", "EBIT vs Interest"])
 
         with tab1:
+            market_peers = st.radio(
+                "Market reference:",
+                ["All companies", "Similar size"],
+                horizontal=True,
+                help="Medians of all panel companies in the year, or of the third of them closest in total assets"
+            )
+            median_ref = market_medians(
+                get_market_reference(), selected_year,
+                size=ratios.get('SIZE') if market_peers == "Similar size" else None
+            )
+
             col_chart, col_table = st.columns([3, 2])
 
             with col_chart:
-                fig_compare = create_ratio_comparison_chart(ratios, selected_year)
-                fig_compare.update_layout(height=380)
-                st.plotly_chart(fig_compare, use_container_width=True)
+                fig_compare = cached_chart(
+                    'ratio_comparison', (ratios, selected_year, median_ref, 380),
+                    lambda: create_ratio_comparison_chart(ratios, selected_year, median_ref).update_layout(height=380)
+                )
+                plot_chart(fig_compare, use_container_width=True)
 
             with col_table:
                 st.markdown("**Ratio Details:**")
@@ -1845,7 +1563,9 @@ def render_analysis(year_data, all_data, selected_year):
                     'Ratio': 'ROA',
                     'Value': f"{roa*100:.2f}%" if roa is not None else "N/A",
                     'Market Median': f"{roa_med*100:.2f}%" if roa_med is not None else "N/A",
-                    'Relative Position': "Above median" if roa >= roa_med else "Below median"
+                    'Relative Position': (
+                        "N/A" if roa_med is None else "Above median" if roa >= roa_med else "Below median"
+                    )
                 })
 
                 cur = ratios.get('CUR', None)
@@ -1854,7 +1574,9 @@ def render_analysis(year_data, all_data, selected_year):
                     'Ratio': 'Current Ratio',
                     'Value': f"{cur:.2f}" if cur is not None else "N/A",
                     'Market Median': f"{cur_med:.2f}" if cur_med is not None else "N/A",
-                    'Relative Position': "Above median" if cur >= cur_med else "Below median"
+                    'Relative Position': (
+                        "N/A" if cur_med is None else "Above median" if cur >= cur_med else "Below median"
+                    )
                 })
 
                 lev = ratios.get('LEV', None)
@@ -1863,7 +1585,9 @@ def render_analysis(year_data, all_data, selected_year):
                     'Ratio': 'Leverage',
                     'Value': f"{lev*100:.1f}%" if lev is not None else "N/A",
                     'Market Median': f"{lev_med*100:.1f}%" if lev_med is not None else "N/A",
-                    'Relative Position': "Lower than median" if lev <= lev_med else "Higher than median"
+                    'Relative Position': (
+                        "N/A" if lev_med is None else "Lower than median" if lev <= lev_med else "Higher than median"
+                    )
                 })
 
                 far = ratios.get('FAR', None)
@@ -1872,7 +1596,9 @@ def render_analysis(year_data, all_data, selected_year):
                     'Ratio': 'Fixed Asset Ratio (FAR)',
                     'Value': f"{far*100:.1f}%" if far is not None else "N/A",
                     'Market Median': f"{far_med*100:.1f}%" if far_med is not None else "N/A",
-                    'Relative Position': "Lower than median" if far <= far_med else "Higher than median"
+                    'Relative Position': (
+                        "N/A" if far_med is None else "Lower than median" if far <= far_med else "Higher than median"
+                    )
                 })
 
                 wc = ratios.get('WC_Assets', None)
@@ -1884,15 +1610,14 @@ def render_analysis(year_data, all_data, selected_year):
                         'Value': f"{wc*100:.1f}%" if wc is not None else "N/A",
                         'Market Median': f"{wc_med*100:.1f}%" if wc_med is not None else "N/A",
                         'Relative Position': (
-                            "Above median" if wc_med is not None and wc >= wc_med
-                            else "Below median"
+                            "N/A" if wc_med is None else "Above median" if wc >= wc_med else "Below median"
                         )
                     })
 
                 df_ratios = pd.DataFrame(ratio_data)
                 st.dataframe(df_ratios, use_container_width=True, hide_index=True)
                 st.caption(
-                    "Market median values are pre-computed from the research sample and used for "
+                    "Market median values are computed by year from the sample panel and used for "
                     "relative interpretation only. They do not affect the signal-based early warning classification."
                 )
 
@@ -1901,27 +1626,28 @@ def render_analysis(year_data, all_data, selected_year):
             scatter_rows = []
             for year in sorted(all_data.keys()):
                 yr_data = all_data[year]
-                yr_ratios = calculate_financial_ratios(yr_data)
-                yr_signals = calculate_ews_signals(yr_data, yr_ratios)
                 scatter_rows.append({
                     'Year': str(year),
                     'EBIT': yr_data.get('EBIT', 0),
                     'Interest': yr_data.get('Interest Expense', 0),
-                    'ews_level': yr_signals.get('ews_level', 'Safe')
+                    'ews_level': scores.loc[year, 'ews_level']
                 })
 
             df_scatter = pd.DataFrame(scatter_rows)
-            coverage_chart = create_interest_coverage_chart(
-                df_input=df_scatter,
-                interest_col='Interest',
-                ebit_col='EBIT',
-                year_col='Year',
-                ews_col='ews_level',
-                marker_size=12
+            coverage_chart = cached_chart(
+                'interest_coverage', (df_scatter, 12),
+                lambda: create_interest_coverage_chart(
+                    df_input=df_scatter,
+                    interest_col='Interest',
+                    ebit_col='EBIT',
+                    year_col='Year',
+                    ews_col='ews_level',
+                    marker_size=12
+                )
             )
 
             if coverage_chart["fig"] is not None:
-                st.plotly_chart(coverage_chart["fig"], use_container_width=True)
+                plot_chart(coverage_chart["fig"], use_container_width=True)
                 st.caption(
                     "Above 2x line: strong interest-paying buffer. "
                     "Between 1x and 2x: moderate buffer. "
@@ -1964,42 +1690,36 @@ def render_analysis(year_data, all_data, selected_year):
             col_chart1, col_chart2 = st.columns(2)
 
             # Prepare trend data
-            trend_data = []
-            for year in sorted(all_data.keys()):
-                data = all_data[year]
-                yr_ratios = calculate_financial_ratios(data)
-                yr_signals = calculate_ews_signals(data, yr_ratios)
-                trend_data.append({
-                    'Year': year,
-                    'n_signals': yr_signals['n_signals'],
-                    'ews_level': yr_signals['ews_level'],
-                    'ROA': yr_ratios.get('ROA', 0),
-                    'CUR': yr_ratios.get('CUR', 0),
-                    'LEV': yr_ratios.get('LEV', 0),
-                    'FAR': yr_ratios.get('FAR', 0)
-                })
-            df_trend = pd.DataFrame(trend_data)
+            df_trend = scores[['n_signals', 'ews_level', 'ROA', 'CUR', 'LEV', 'FAR']].fillna(0)
+            df_trend = df_trend.rename_axis('Year').reset_index()
 
             with col_chart1:
                 st.markdown("**Warning Signals Over Time**")
-                fig_trend = px.line(
-                    df_trend,
-                    x="Year",
-                    y="n_signals",
-                    markers=True,
-                    title="Number of warning signals over time"
-                )
-                # Add annotation for selected year
-                selected_row = df_trend[df_trend['Year'] == selected_year]
-                if not selected_row.empty:
-                    fig_trend.add_annotation(
-                        x=selected_year,
-                        y=selected_row['n_signals'].values[0],
-                        text=f"EWS: {selected_row['ews_level'].values[0]}",
-                        showarrow=True,
-                        arrowhead=1
+
+                def build_trend():
+                    fig_trend = px.line(
+                        df_trend,
+                        x="Year",
+                        y="n_signals",
+                        markers=True,
+                        title="Number of warning signals over time"
                     )
-                st.plotly_chart(fig_trend, use_container_width=True)
+                    # Add annotation for selected year
+                    selected_row = df_trend[df_trend['Year'] == selected_year]
+                    if not selected_row.empty:
+                        fig_trend.add_annotation(
+                            x=selected_year,
+                            y=selected_row['n_signals'].values[0],
+                            text=f"EWS: {selected_row['ews_level'].values[0]}",
+                            showarrow=True,
+                            arrowhead=1
+                        )
+                    return fig_trend
+
+                fig_trend = cached_chart(
+                    'upload_signal_trend', (df_trend[['Year', 'n_signals', 'ews_level']], selected_year), build_trend
+                )
+                plot_chart(fig_trend, use_container_width=True)
 
             with col_chart2:
                 st.markdown("**Financial Ratios**")
@@ -2009,14 +1729,17 @@ def render_analysis(year_data, all_data, selected_year):
                     key="upload_ratio_selector",
                     label_visibility="collapsed"
                 )
-                fig_ratio = px.line(
-                    df_trend,
-                    x="Year",
-                    y=ratio_option,
-                    markers=True,
-                    title=f"{ratio_option} over time"
+                fig_ratio = cached_chart(
+                    'ratio_trend', (df_trend[['Year', ratio_option]],),
+                    lambda: px.line(
+                        df_trend,
+                        x="Year",
+                        y=ratio_option,
+                        markers=True,
+                        title=f"{ratio_option} over time"
+                    )
                 )
-                st.plotly_chart(fig_ratio, use_container_width=True)
+                plot_chart(fig_ratio, use_container_width=True)
     else:
         with st.container(border=True):
             st.info("Trend analysis requires multiple years of data. Upload financial statements for multiple years to enable this feature.")
@@ -2075,7 +1798,7 @@ def render_analysis(year_data, all_data, selected_year):
     st.markdown('<p class="section-title">7. Executive Summary</p>', unsafe_allow_html=True)
 
     # Generate executive summary based on EWS level and number of years
-    summary = generate_executive_summary(signals, ratios, num_years, all_data, selected_year)
+    summary = generate_executive_summary(signals, ratios, num_years, all_data, selected_year, scores)
 
     st.markdown(f"""
     <div style="background: rgba(49, 130, 206, 0.1); border-left: 4px solid #3182ce; padding: 1.2rem; border-radius: 0 10px 10px 0;">
@@ -2083,6 +1806,17 @@ def render_analysis(year_data, all_data, selected_year):
     </div>
     """, unsafe_allow_html=True)
 
+    # PDF report, rendered only when the button is clicked
+    company_info = st.session_state.get('company_info', {})
+    st.download_button(
+        label="Download PDF report",
+        data=lambda: render_company_report(company_report(all_data, company_info, selected_year, scores)),
+        file_name=f"{os.path.splitext(os.path.basename(company_info.get('file_name') or 'company'))[0]}"
+                  f"_{selected_year}_ews_report.pdf",
+        mime="application/pdf",
+        on_click='ignore'
+    )
+
     # Raw Data Expander
     st.markdown("---")
     with st.expander("View Raw Data"):
@@ -2094,79 +1828,6 @@ def render_analysis(year_data, all_data, selected_year):
             st.markdown("**Calculated Ratios:**")
             st.dataframe(pd.DataFrame([ratios]).T.rename(columns={0: 'Value'}), use_container_width=True)
 
-def generate_executive_summary(signals, ratios, num_years, all_data, selected_year):
-    """
-    Generate Executive Summary based on EWS level and number of years
-    Answers 3 questions:
-    1. Current situation?
-    2. Main causes?
-    3. What should user do next?
-    """
-    ews_level = signals['ews_level']
-    n_signals = signals['n_signals']
-
-    # Check for worsening trend if multiple years
-    worsening_trend = False
-    if num_years > 1:
-        years_sorted = sorted(all_data.keys())
-        if len(years_sorted) >= 2:
-            prev_year = years_sorted[-2]
-            prev_data = all_data[prev_year]
-            prev_ratios = calculate_financial_ratios(prev_data)
-            prev_signals = calculate_ews_signals(prev_data, prev_ratios)
-            if signals['n_signals'] > prev_signals['n_signals']:
-                worsening_trend = True
-
-    # Template selection based on EWS level
-    if ews_level == 'Safe':
-        if num_years == 1:
-            summary = (
-                "Based on the uploaded financial statements, the firm is currently classified as <strong>financially stable</strong>. "
-                "No major financial risk signals are triggered in the reporting period. "
-                "Key profitability and liquidity indicators remain within acceptable ranges. "
-                "However, regular monitoring is recommended to ensure that any potential deterioration in operating performance is detected early."
-            )
-        else:
-            summary = (
-                "Based on the uploaded financial statements, the firm is currently assessed as <strong>financially stable</strong> based on the early warning signals. "
-                "While no immediate financial risk is identified in the most recent year, certain financial indicators show signs of fluctuation over time. "
-                "Continued monitoring of profitability and liquidity trends is recommended to prevent potential risk accumulation."
-            )
-
-    elif ews_level == 'Watchlist':
-        if worsening_trend and num_years > 1:
-            # Template 3: Watchlist + Worsening trend
-            summary = (
-                "The firm is currently classified as <strong>Watchlist</strong> based on the uploaded financial statements. "
-                "Although the firm has not entered financial high risk, the number of warning signals has increased compared to the previous period. "
-                "This suggests a deterioration in financial conditions, and proactive risk management actions are advised, "
-                "particularly in areas showing declining performance."
-            )
-        else:
-            # Template 2: Standard Watchlist
-            summary = (
-                "Based on the uploaded financial statements, the firm is classified under the <strong>Watchlist</strong> category. "
-                "One or more early warning signals are triggered, indicating potential weaknesses in profitability or liquidity. "
-                "While no immediate financial risk is identified, closer monitoring of key financial indicators is recommended "
-                "to prevent further risk escalation."
-            )
-
-    else:  # High Risk
-        # Template 4: High Risk
-        summary = (
-            "The analysis of the uploaded financial statements indicates that the firm exhibits multiple <strong>financial high risk</strong> warning signals. "
-            "Multiple financial indicators exceed risk thresholds, reflecting pressure on profitability, liquidity, or capital structure. "
-            "Immediate attention and corrective actions are recommended to mitigate financial risk and stabilize operations."
-        )
-
-    # Add specific drivers if any
-    if signals['drivers']:
-        main_drivers = signals['drivers'][:2]  # Top 2 drivers
-        drivers_text = " The primary concerns include: " + "; ".join(main_drivers) + "."
-        summary += drivers_text
-
-    return summary
-
 def generate_ai_summary(data, ratios, signals, z_score, z_zone, s_score, s_zone, year):
     """Generate AI executive summary - kept for CSV mode compatibility"""
     summary_parts = []
@@ -2233,23 +1894,118 @@ def generate_ai_summary(data, ratios, signals, z_score, z_zone, s_score, s_zone,
 
     return " ".join(summary_parts)
 
+def csv_mode_panel():
+    """
+    Panel (2014-2024) with every CSV column, its model and trend columns
+    recomputed from the statement columns, and its year-over-year columns
+    """
+    # History over every year, so 2014 still sees its earlier lags
+    df = apply_panel_dtypes(build_panel_history(score_ews_panel(load_panel())))
+    df = df[(df["Year"] >= CSV_MODE_YEARS[0]) & (df["Year"] <= CSV_MODE_YEARS[1])]
+    return build_panel_deltas(df)
+
+@st.cache_resource(max_entries=2)
+def load_panel_store(version):
+    """
+    Memory-mapped column store of the CSV-mode panel, written on first use
+    per panel version and shared by every session and worker process; None
+    when the store cannot be written
+    """
+    if not column_store_is_fresh(version=version):
+        try:
+            build_column_store(build_panel_index(csv_mode_panel()), version=version)
+        except OSError:
+            return None
+    return open_column_store()
+
+@st.cache_resource(max_entries=2)
+def load_panel_index(version):
+    """Indexed CSV-mode panel held in memory, for when no column store can be written"""
+    return build_panel_index(csv_mode_panel())
+
+@st.cache_resource(max_entries=2)
+def load_portfolio_cube(version):
+    """Year x ews_level counts of the CSV-mode panel, built once per panel version"""
+    store = load_panel_store(version)
+    if store is not None:
+        return store_portfolio_cube(store)
+    return build_portfolio_cube(load_panel_index(version)['frame'])
+
+@st.cache_resource(max_entries=2)
+def load_market_reference(version):
+    """
+    Market ratio quantiles of the panel, computed in one grouped pass per
+    panel version; a streamed panel contributes at most MARKET_SAMPLE_ROWS rows per year
+    """
+    if use_panel_stream():
+        return market_reference_from_ratios(sample_market_ratios(iter_panel_chunks()))
+    return build_market_reference(load_panel(PANEL_COLUMNS))
+
+def get_market_reference():
+    """Market reference of the current panel, or None when there is no panel to compute it from"""
+    try:
+        return load_market_reference(panel_version())
+    except FileNotFoundError:
+        return None
+
+@st.cache_resource(max_entries=16)
+def load_panel_coverage(version, year, budget):
+    """EBIT vs Interest coverage summary of the panel's firm-years (of `year`, or all), from one chunked pass"""
+    streaming = use_panel_stream()
+    store = None
+    if streaming:
+        index = load_panel_stream(version)
+    else:
+        store = load_panel_store(version)
+        index = store if store is not None else load_panel_index(version)
+    return build_coverage_summary(csv_panel_chunks(streaming, store, index), year=year, budget=budget)
+
+@st.cache_resource(max_entries=2)
+def load_panel_stream(version):
+    """Offset index and portfolio cube of a panel too large to load, from one chunked scan per panel version"""
+    return load_stream_index(year_range=CSV_MODE_YEARS)
+
+@st.cache_resource(max_entries=32)
+def load_stream_company(version, name):
+    """One company's rows of a streamed panel, read on demand"""
+    return stream_company_rows(load_panel_stream(version), name)
+
+def csv_panel_chunks(streaming, store, index):
+    """
+    The CSV-mode panel in chunks, with the same columns however it is served:
+    slices of the mapped column store, of the loaded panel, or (when
+    streaming) batches of whole companies read through the offset index
+    """
+    if streaming:
+        yield from iter_stream_companies(index)
+    elif store is not None:
+        for start in range(0, store['rows'], EXPORT_CHUNK_ROWS):
+            yield column_store_frame(store, slice(start, start + EXPORT_CHUNK_ROWS))
+    else:
+        yield from iter_frame_chunks(index['frame'])
+
+@timing.timed('render.csv_mode')
 def render_csv_mode():
     """Render the CSV data mode (original functionality)"""
-    @st.cache_data
-    def load_data():
-        return pd.read_csv("05_ews_application.csv")
-
     try:
-        df = load_data()
-        df = df[(df["Year"] >= 2014) & (df["Year"] <= 2024)]
+        version = panel_version()
+        streaming = use_panel_stream()
+        store = None
+        if streaming:
+            index = load_panel_stream(version)
+            portfolio_cube = index['cube']
+        else:
+            store = load_panel_store(version)
+            index = store if store is not None else load_panel_index(version)
+            portfolio_cube = load_portfolio_cube(version)
 
         # Original dashboard code
         st.sidebar.header("Filters")
 
-        code_list = sorted(df["Name"].unique())
+        code_list = index['companies']
         selected_code = st.sidebar.selectbox("Select company name", code_list)
 
-        year_min, year_max = int(df["Year"].min()), int(df["Year"].max())
+        year_min, year_max = index['years'][0], index['years'][-1]
         selected_year = st.sidebar.slider(
             "Select year",
             min_value=year_min,
@@ -2257,23 +2013,38 @@ def render_csv_mode():
             value=year_max
         )
 
-        df_company = df[df["Name"] == selected_code].sort_values("Year")
-        df_year = df_company[df_company["Year"] == selected_year]
+        if streaming:
+            df_company = load_stream_company(version, selected_code)
+            df_year = stream_company_year(df_company, selected_year)
+        elif store is not None:
+            df_company = store_company_rows(store, selected_code)
+            df_year = store_company_year(store, selected_code, selected_year)
+        else:
+            df_company = panel_company_rows(index, selected_code)
+            df_year = panel_company_year(index, selected_code, selected_year)
+
+        st.sidebar.download_button(
+            label="Download scored panel (XLSX)",
+            data=lambda: xlsx_download(csv_panel_chunks(streaming, store, index)),
+            file_name="ews_panel.xlsx",
+            mime=XLSX_MIME,
+            on_click='ignore'
+        )
 
         # Continue with original analysis...
-        render_csv_analysis(df, df_company, df_year, selected_code, selected_year)
+        render_csv_analysis(portfolio_cube, df_company, df_year, selected_code, selected_year, version)
 
     except FileNotFoundError:
         st.error("Sample data file '05_ews_application.csv' not found.")
         st.info("Please switch to 'Upload Financial Statements' mode for analysis.")
 
-def render_csv_analysis(df, df_company, df_year, selected_code, selected_year):
+@timing.timed('render.csv_analysis')
+def render_csv_analysis(portfolio_cube, df_company, df_year, selected_code, selected_year, version=None):
     """Render analysis for CSV data"""
+    import plotly.express as px
 
-    # Calculate metrics
+    # EBIT_yoy and signal_delta are precomputed for the whole panel
     df_company = df_company.sort_values("Year")
-    df_company["EBIT_yoy"] = df_company["Earnings before Interest & Taxes (EBIT)"].pct_change() * 100
-    df_company["signal_delta"] = df_company["n_signals"].diff()
     latest = df_company[df_company["Year"] == selected_year]
 
     # Helper function
@@ -2366,23 +2137,32 @@ def render_csv_analysis(df, df_company, df_year, selected_code, selected_year):
 
             with col_chart1:
                 st.markdown("**Warning Signals Over Time**")
-                fig_trend = px.line(
-                    df_company,
-                    x="Year",
-                    y="n_signals",
-                    markers=True,
-                    title="Number of warning signals over time"
-                )
 
-                if not latest.empty:
-                    fig_trend.add_annotation(
-                        x=latest["Year"].values[0],
-                        y=latest["n_signals"].values[0],
-                        text=f"EWS: {latest['ews_level'].values[0]}",
-                        showarrow=True,
-                        arrowhead=1
+                def build_trend():
+                    fig_trend = px.line(
+                        df_company,
+                        x="Year",
+                        y="n_signals",
+                        markers=True,
+                        title="Number of warning signals over time"
                     )
-                st.plotly_chart(fig_trend, use_container_width=True)
+
+                    if not latest.empty:
+                        fig_trend.add_annotation(
+                            x=latest["Year"].values[0],
+                            y=latest["n_signals"].values[0],
+                            text=f"EWS: {latest['ews_level'].values[0]}",
+                            showarrow=True,
+                            arrowhead=1
+                        )
+                    return fig_trend
+
+                fig_trend = cached_chart(
+                    'csv_signal_trend',
+                    (df_company[['Year', 'n_signals']], latest[['Year', 'n_signals', 'ews_level']]),
+                    build_trend
+                )
+                plot_chart(fig_trend, use_container_width=True)
 
             with col_chart2:
                 st.markdown("**Financial Ratios**")
@@ -2393,14 +2173,17 @@ def render_csv_analysis(df, df_company, df_year, selected_code, selected_year):
                     label_visibility="collapsed"
                 )
 
-                fig_ratio = px.line(
-                    df_company,
-                    x="Year",
-                    y=ratio_option,
-                    markers=True,
-                    title=f"{ratio_option} over time"
+                fig_ratio = cached_chart(
+                    'ratio_trend', (df_company[['Year', ratio_option]],),
+                    lambda: px.line(
+                        df_company,
+                        x="Year",
+                        y=ratio_option,
+                        markers=True,
+                        title=f"{ratio_option} over time"
+                    )
                 )
-                st.plotly_chart(fig_ratio, use_container_width=True)
+                plot_chart(fig_ratio, use_container_width=True)
 
     # =========================================
     # SECTION 4: DETAILED ANALYSIS
@@ -2416,17 +2199,20 @@ def render_csv_analysis(df, df_company, df_year, selected_code, selected_year):
             ebit_col = "Earnings before Interest & Taxes (EBIT)"
 
             if interest_col in df_company.columns and ebit_col in df_company.columns:
-                coverage_chart = create_interest_coverage_chart(
-                    df_input=df_company,
-                    interest_col=interest_col,
-                    ebit_col=ebit_col,
-                    year_col='Year',
-                    ews_col='ews_level',
-                    marker_size=10
+                coverage_chart = cached_chart(
+                    'interest_coverage', (df_company[[interest_col, ebit_col, 'Year', 'ews_level']], 10),
+                    lambda: create_interest_coverage_chart(
+                        df_input=df_company,
+                        interest_col=interest_col,
+                        ebit_col=ebit_col,
+                        year_col='Year',
+                        ews_col='ews_level',
+                        marker_size=10
+                    )
                 )
 
                 if coverage_chart["fig"] is not None:
-                    st.plotly_chart(coverage_chart["fig"], use_container_width=True)
+                    plot_chart(coverage_chart["fig"], use_container_width=True)
                     st.caption(
                         "Above 2x line: strong interest-paying buffer. "
                         "Between 1x and 2x: moderate buffer. "
@@ -2472,31 +2258,21 @@ def render_csv_analysis(df, df_company, df_year, selected_code, selected_year):
         with col_filter:
             ews_year = st.selectbox(
                 "Year",
-                options=["All years"] + sorted(df["Year"].dropna().unique().tolist())
+                options=["All years"] + [int(y) for y in portfolio_cube.index]
             )
 
-            if ews_year == "All years":
-                df_dist = df.copy()
-            else:
-                df_dist = df[df["Year"] == ews_year]
-
-            ews_summary = df_dist["ews_level"].value_counts()
+            ews_summary = portfolio_summary(portfolio_cube, None if ews_year == "All years" else ews_year)
 
             st.markdown("**Summary**")
-            if "Safe" in ews_summary:
-                st.success(f"Safe: {ews_summary.get('Safe', 0)}")
-            if "Watchlist" in ews_summary:
-                st.warning(f"Watchlist: {ews_summary.get('Watchlist', 0)}")
-            if "High Risk" in ews_summary:
-                st.error(f"High Risk: {ews_summary.get('High Risk', 0)}")
+            if ews_summary['Safe'] > 0:
+                st.success(f"Safe: {ews_summary['Safe']}")
+            if ews_summary['Watchlist'] > 0:
+                st.warning(f"Watchlist: {ews_summary['Watchlist']}")
+            if ews_summary['High Risk'] > 0:
+                st.error(f"High Risk: {ews_summary['High Risk']}")
 
         with col_chart:
-            ews_count = (
-                df_dist
-                .groupby(["Year", "ews_level"])
-                .size()
-                .reset_index(name="count")
-            )
+            ews_count = portfolio_counts(portfolio_cube, None if ews_year == "All years" else ews_year)
 
             ews_colors = {
                 "Safe": "#2ECC71",
@@ -2504,15 +2280,22 @@ def render_csv_analysis(df, df_company, df_year, selected_code, selected_year):
                 "High Risk": "#E74C3C"
             }
 
-            fig_ews = px.bar(
-                ews_count,
-                x="Year",
-                y="count",
-                color="ews_level",
-                color_discrete_map=ews_colors
+            fig_ews = cached_chart(
+                'ews_distribution', (ews_count,),
+                lambda: px.bar(
+                    ews_count,
+                    x="Year",
+                    y="count",
+                    color="ews_level",
+                    color_discrete_map=ews_colors
+                ).update_layout(barmode="stack", height=400)
             )
-            fig_ews.update_layout(barmode="stack", height=400)
-            st.plotly_chart(fig_ews, use_container_width=True)
+            plot_chart(fig_ews, use_container_width=True)
+
+    with st.container(border=True):
+        coverage = load_panel_coverage(version, None if ews_year == "All years" else ews_year,
+                                       coverage_point_budget())
+        render_portfolio_coverage(coverage, "All years" if ews_year == "All years" else ews_year)
 
     # Raw Data
     st.markdown("---")
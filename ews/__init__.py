@@ -0,0 +1,52 @@
+"""
+Early warning system (EWS) for corporate financial distress: extraction,
+scoring and panel tools. Nothing here imports Streamlit or Plotly, FPDF only
+when a PDF report is rendered, and submodules load on first use:
+`from ews import calculate_ews_signals` pulls in only the scalar model.
+"""
+
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    'calculate_financial_ratios': 'model',
+    'calculate_altman_z_score': 'model',
+    'calculate_s_score': 'model',
+    'calculate_ews_signals': 'model',
+    'generate_recommendations': 'model',
+    'generate_executive_summary': 'model',
+    'EWS_LEVELS': 'model',
+    'calculate_ews_batch': 'batch',
+    'build_scoring_table': 'batch',
+    'process_uploaded_file': 'extraction',
+    'BoundedCache': 'cache',
+    'process_uploaded_file_cached': 'cache',
+    'load_panel': 'panel',
+    'score_ews_panel': 'panel',
+    'build_panel_history': 'panel',
+    'build_column_store': 'colstore',
+    'open_column_store': 'colstore',
+    'load_stream_index': 'stream',
+    'stream_company_rows': 'stream',
+    'build_market_reference': 'market',
+    'market_medians': 'market',
+    'portfolio_aggregates': 'portfolio',
+    'build_coverage_summary': 'coverage',
+    'export_panel_xlsx': 'export',
+    'company_report': 'report',
+    'render_company_report': 'report',
+    'score_directory': 'cli',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,257 @@
+"""Vectorized EWS model: ratios, scores and signals for many firm-years at once"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from .mappings import REQUIRED_FIELDS, OPTIONAL_FIELDS
+from .timing import timed
+
+# Fields read by the EWS model, one column each in a batch scoring frame
+MODEL_FIELDS = REQUIRED_FIELDS + OPTIONAL_FIELDS
+
+# Ratio columns in the key order of calculate_financial_ratios
+RATIO_COLUMNS = [
+    'ROA', 'LEV', 'FAR', 'SIZE', 'Retained_Earnings_to_Assets', 'WC_Assets', 'Equity_to_Assets',
+    'CUR', 'Net_Profit_Margin', 'EBIT_Margin', 'Equity_to_Debt', 'EBIT_to_Interest', 'Interest_Coverage'
+]
+
+# Ratios that calculate_financial_ratios sets to None instead of leaving out
+NULLABLE_RATIOS = ['EBIT_to_Interest', 'Interest_Coverage']
+
+def build_fields_frame(all_data):
+    """Stack per-year field dicts ({year: {field: value}}) into a batch scoring frame"""
+    years = sorted(all_data.keys())
+    return pd.DataFrame([all_data[year] for year in years], index=years, columns=MODEL_FIELDS)
+
+@timed('model.ews_batch')
+def calculate_ews_batch(frame):
+    """
+    Vectorized calculate_financial_ratios, calculate_altman_z_score, calculate_s_score
+    and calculate_ews_signals over a frame with one row per firm-year and one column
+    per model field. Missing columns and NaN values count as absent dict keys (0).
+    Ratios or scores the scalar functions leave out or return as None are NaN.
+    """
+    fields = frame.reindex(columns=MODEL_FIELDS).apply(pd.to_numeric, errors='coerce').fillna(0.0)
+    v = {field: fields[field].to_numpy(dtype=float) for field in MODEL_FIELDS}
+
+    total_assets = v['Total Assets']
+    current_assets = v['Total Current Assets']
+    current_liabilities = v['Total Current Liabilities']
+    total_liabilities = v['Total Liabilities']
+    fixed_assets = v['Total Fixed Assets - Net']
+    equity = v['Shareholders Equity']
+    retained_earnings = v['Retained Earnings']
+    net_income = v['Net Income after Tax']
+    ebit = v['EBIT']
+    income_before_taxes = v['Income before Taxes']
+    revenue = v['Revenue']
+    interest_expense = v['Interest Expense']
+
+    out = pd.DataFrame(index=frame.index)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Ratios (same guards as calculate_financial_ratios)
+        has_assets = total_assets > 0
+        roa = np.where(has_assets, net_income / total_assets, np.nan)
+        out['ROA'] = roa
+        out['LEV'] = np.where(has_assets, total_liabilities / total_assets, np.nan)
+        out['FAR'] = np.where(has_assets, fixed_assets / total_assets, np.nan)
+        out['SIZE'] = np.where(has_assets, np.log(np.where(has_assets, total_assets, 1.0)), np.nan)
+        out['Retained_Earnings_to_Assets'] = np.where(has_assets, retained_earnings / total_assets, np.nan)
+        out['WC_Assets'] = np.where(has_assets, (current_assets - current_liabilities) / total_assets, np.nan)
+        out['Equity_to_Assets'] = np.where(has_assets, equity / total_assets, np.nan)
+        out['CUR'] = np.where(current_liabilities > 0, current_assets / current_liabilities, 0.0)
+        out['Net_Profit_Margin'] = np.where(revenue > 0, net_income / revenue, np.nan)
+        out['EBIT_Margin'] = np.where(revenue > 0, ebit / revenue, np.nan)
+        out['Equity_to_Debt'] = np.where(total_liabilities > 0, equity / total_liabilities, np.nan)
+        coverage = np.where(interest_expense > 0, ebit / interest_expense, np.nan)
+        out['EBIT_to_Interest'] = coverage
+        out['Interest_Coverage'] = coverage
+
+        # Altman Z''-Score
+        x1 = (current_assets - current_liabilities) / total_assets
+        x2 = retained_earnings / total_assets
+        x3 = np.where(ebit != 0, ebit / total_assets, roa)
+        x4 = np.where((total_liabilities > 0) & (equity != 0), equity / total_liabilities, 0.0)
+        z_score = np.where(has_assets, 6.56 * x1 + 3.26 * x2 + 6.72 * x3 + 1.05 * x4, np.nan)
+
+        # Springate S-Score
+        has_s = (total_assets != 0) & (current_liabilities != 0)
+        a = (current_assets - current_liabilities) / total_assets
+        b = ebit / total_assets
+        c = income_before_taxes / current_liabilities
+        d = revenue / total_assets
+        s_score = np.where(has_s, 1.03 * a + 3.07 * b + 0.66 * c + 0.40 * d, np.nan)
+
+    out['Z_Score'] = z_score
+    out['z_zone'] = np.select(
+        [~has_assets, z_score > 2.6, z_score > 1.1],
+        ["N/A", "Safe Zone", "Grey Zone"],
+        default="High Risk Zone"
+    )
+    out['S_Score'] = s_score
+    out['s_zone'] = np.select([~has_s, s_score >= 0.862], ["N/A", "Safe"], default="High Risk")
+
+    # EWS signals
+    out['signal_ebit'] = ((interest_expense > 0) & (ebit != 0) & (ebit < interest_expense)).astype(np.int64)
+    out['signal_z'] = (out['z_zone'] == "High Risk Zone").astype(np.int64)
+    out['signal_s'] = (has_s & (s_score < 0.862)).astype(np.int64)
+    n_signals = out['signal_ebit'] + out['signal_z'] + out['signal_s']
+    out['n_signals'] = n_signals
+    out['ews_level'] = np.select([n_signals == 0, n_signals == 1], ['Safe', 'Watchlist'], default='High Risk')
+
+    return out
+
+def ratios_from_scores(row):
+    """Rebuild the calculate_financial_ratios dict from one calculate_ews_batch row"""
+    ratios = {}
+    for name in RATIO_COLUMNS:
+        value = row[name]
+        if pd.notna(value):
+            ratios[name] = value
+        elif name in NULLABLE_RATIOS:
+            ratios[name] = None
+    return ratios
+
+def scores_from_row(row):
+    """Return (z_score, z_zone, s_score, s_zone) from one calculate_ews_batch row"""
+    z_score = row['Z_Score'] if pd.notna(row['Z_Score']) else None
+    s_score = row['S_Score'] if pd.notna(row['S_Score']) else None
+    return z_score, row['z_zone'], s_score, row['s_zone']
+
+def signals_from_scores(row):
+    """Rebuild the calculate_ews_signals dict (including drivers) from one calculate_ews_batch row"""
+    signals = {
+        'signal_ebit': int(row['signal_ebit']),
+        'signal_z': int(row['signal_z']),
+        'signal_s': int(row['signal_s']),
+        'n_signals': int(row['n_signals']),
+        'ews_level': row['ews_level'],
+        'drivers': []
+    }
+
+    if signals['signal_ebit'] == 1:
+        signals['drivers'].append("EBIT lower than Interest Expense - Weak interest coverage")
+    if signals['signal_z'] == 1:
+        signals['drivers'].append(f"Altman Z-Score = {row['Z_Score']:.2f} - High risk zone")
+    if signals['signal_s'] == 1:
+        signals['drivers'].append(f"S-Score = {row['S_Score']:.2f} - High risk")
+
+    cur = row['CUR']
+    lev = row['LEV'] if pd.notna(row['LEV']) else 0
+    roa = row['ROA'] if pd.notna(row['ROA']) else 0
+    if cur < 1:
+        signals['drivers'].append(f"Current Ratio = {cur:.2f} < 1 - Liquidity risk")
+    if lev > 0.7:
+        signals['drivers'].append(f"Leverage = {lev:.2%} > 70% - High debt risk")
+    if roa < 0:
+        signals['drivers'].append(f"ROA = {roa:.2%} < 0 - Operating loss")
+
+    return signals
+
+@timed('model.scoring_table')
+def build_scoring_table(all_data):
+    """
+    Score every year of one company in a single batch pass. Adds to the
+    calculate_ews_batch columns the priority_flag plus, against the previous
+    year, risk_trend, signal_delta and EBIT_yoy (%).
+    """
+    fields = build_fields_frame(all_data)
+    table = calculate_ews_batch(fields)
+
+    n_signals = table['n_signals']
+    prev_n_signals = n_signals.shift(1)
+    table['priority_flag'] = ((n_signals >= 2) | (table['ews_level'] == 'High Risk')).astype(np.int64)
+    table['risk_trend'] = np.select(
+        [n_signals > prev_n_signals, n_signals < prev_n_signals],
+        ["Worsening", "Improving"],
+        default="Stable"
+    )
+    table['signal_delta'] = (n_signals - prev_n_signals).fillna(0).astype(np.int64)
+
+    ebit = pd.to_numeric(fields['EBIT'], errors='coerce').fillna(0.0)
+    prev_ebit = ebit.shift(1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['EBIT_yoy'] = np.where(
+            prev_ebit.notna() & (prev_ebit != 0),
+            ((ebit - prev_ebit) / prev_ebit.abs()) * 100,
+            np.nan
+        )
+
+    return table
+
+def year_fields_key(year_data):
+    """Content hash of the model fields of one year"""
+    values = tuple((field, year_data.get(field)) for field in MODEL_FIELDS)
+    return hashlib.sha256(repr(values).encode('utf-8')).hexdigest()
+
+def _ebit_value(year_data):
+    """EBIT as build_scoring_table reads it for EBIT_yoy: numeric, 0.0 when missing"""
+    try:
+        value = float(year_data.get('EBIT'))
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if np.isnan(value) else value
+
+def year_trend(scores, prev_scores, ebit, prev_ebit):
+    """risk_trend, signal_delta and EBIT_yoy of one year against the previous one (None for the first year)"""
+    if prev_scores is None:
+        return {'risk_trend': "Stable", 'signal_delta': 0, 'EBIT_yoy': np.nan}
+
+    n_signals = scores['n_signals']
+    prev_n_signals = prev_scores['n_signals']
+    if n_signals > prev_n_signals:
+        risk_trend = "Worsening"
+    elif n_signals < prev_n_signals:
+        risk_trend = "Improving"
+    else:
+        risk_trend = "Stable"
+
+    return {
+        'risk_trend': risk_trend,
+        'signal_delta': int(n_signals - prev_n_signals),
+        'EBIT_yoy': ((ebit - prev_ebit) / abs(prev_ebit)) * 100 if prev_ebit != 0 else np.nan
+    }
+
+@timed('model.scoring_table_cached')
+def build_scoring_table_cached(all_data, cache):
+    """
+    build_scoring_table, incrementally. Each year's scores are kept in cache
+    (a BoundedCache) under the hash of its fields, and its trend columns under
+    its own and the previous year's hash. After a corrected re-upload only
+    the changed years are rescored, and only they and the year after each
+    get their trend refreshed.
+    """
+    years = sorted(all_data.keys())
+    if not years:
+        return build_scoring_table(all_data)
+
+    keys = [year_fields_key(all_data[year]) for year in years]
+    scores = [cache.get(('year_scores', key)) for key in keys]
+
+    missing = [i for i, row in enumerate(scores) if row is None]
+    if missing:
+        table = calculate_ews_batch(build_fields_frame({years[i]: all_data[years[i]] for i in missing}))
+        table['priority_flag'] = ((table['n_signals'] >= 2) | (table['ews_level'] == 'High Risk')).astype(np.int64)
+        for i, row in zip(missing, table.to_dict('records')):
+            scores[i] = row
+            cache.put(('year_scores', keys[i]), row)
+
+    rows = []
+    for i, year in enumerate(years):
+        prev_key = keys[i - 1] if i else None
+        trend = cache.get(('year_trend', keys[i], prev_key))
+        if trend is None:
+            trend = year_trend(
+                scores[i],
+                scores[i - 1] if i else None,
+                _ebit_value(all_data[year]),
+                _ebit_value(all_data[years[i - 1]]) if i else None
+            )
+            cache.put(('year_trend', keys[i], prev_key), trend)
+        rows.append({**scores[i], **trend})
+
+    return pd.DataFrame(rows, index=years)
+
@@ -0,0 +1,204 @@
+"""Bounded in-process caches of processed uploads, scored portfolios and chart figures"""
+
+import hashlib
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .mappings import MAPPING_VERSION
+from .timing import capture, is_enabled, merge
+
+UPLOAD_CACHE_MAX_ENTRIES = 32
+UPLOAD_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Per-year extracted fields, scores and trends (see extract_year_cached, build_scoring_table_cached)
+YEAR_CACHE_MAX_ENTRIES = 4096
+YEAR_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Uploads parsed at once by iter_processed_uploads
+UPLOAD_WORKERS = 4
+
+# Scored upload portfolios and their aggregates (see ews.portfolio.portfolio_aggregates)
+PORTFOLIO_CACHE_MAX_ENTRIES = 8
+PORTFOLIO_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+# Built chart figures, as Plotly JSON (see figure_cache_key)
+FIGURE_CACHE_MAX_ENTRIES = 256
+FIGURE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+class BoundedCache:
+    """
+    Thread-safe LRU cache bounded by entry count and by the estimated size of
+    the stored values. Values are shared, so callers must treat them as read-only.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """Return the cached value and mark it most recently used"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value, nbytes=None):
+        """Store a value, evicting least recently used entries to stay within bounds"""
+        if nbytes is None:
+            nbytes = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+
+    def invalidate(self, key):
+        """Drop one entry; returns True if it was cached"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._bytes -= self._entries.pop(key)[1]
+            return True
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Entry count, size and hit/miss counters"""
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+def upload_cache_key(uploaded_file):
+    """Hash the uploaded bytes together with the mapping version"""
+    if hasattr(uploaded_file, 'getvalue'):
+        content = uploaded_file.getvalue()
+    else:
+        uploaded_file.seek(0)
+        content = uploaded_file.read()
+        uploaded_file.seek(0)
+
+    digest = hashlib.sha256(content)
+    digest.update(MAPPING_VERSION.encode('utf-8'))
+    return digest.hexdigest()
+
+def portfolio_cache_key(uploaded_files):
+    """Hash the names and contents of a batch of uploads, in order"""
+    digest = hashlib.sha256()
+    for uploaded_file in uploaded_files:
+        digest.update(getattr(uploaded_file, 'name', '').encode('utf-8'))
+        digest.update(upload_cache_key(uploaded_file).encode('ascii'))
+    return digest.hexdigest()
+
+def _update_fingerprint(digest, value):
+    """Feed one chart input to digest: frames and arrays by content, containers item by item"""
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        columns = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+        dtypes = value.dtypes.astype(str).tolist() if isinstance(value, pd.DataFrame) else [str(value.dtype)]
+        digest.update(repr((type(value).__name__, columns, dtypes, len(value))).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr(('ndarray', value.dtype.str, value.shape)).encode('utf-8'))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        # In insertion order: charts draw a dict's items in that order
+        digest.update(b'{')
+        for key in value:
+            _update_fingerprint(digest, key)
+            _update_fingerprint(digest, value[key])
+        digest.update(b'}')
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'[')
+        for item in value:
+            _update_fingerprint(digest, item)
+        digest.update(b']')
+    else:
+        digest.update(repr(value).encode('utf-8'))
+        digest.update(b'\x00')
+
+def figure_cache_key(chart, *inputs):
+    """
+    Fingerprint of a chart: its name and everything its figure is built from
+    (data frames, values, titles, sizes), so equal inputs share one figure
+    """
+    digest = hashlib.sha256(chart.encode('utf-8'))
+    for value in inputs:
+        _update_fingerprint(digest, value)
+    return digest.hexdigest()
+
+def process_uploaded_file_cached(uploaded_file, cache, year_cache=None):
+    """
+    process_uploaded_file, reusing the results of identical uploads from cache
+    and, for a changed upload, the unchanged years from year_cache
+    """
+    from .extraction import process_uploaded_file
+
+    key = upload_cache_key(uploaded_file)
+    results = cache.get(key)
+    if results is None:
+        results = process_uploaded_file(uploaded_file, year_cache)
+        cache.put(key, results)
+    return results
+
+def iter_processed_uploads(uploaded_files, cache, year_cache=None, max_workers=UPLOAD_WORKERS):
+    """
+    process_uploaded_file_cached on several uploads in a thread pool, off the
+    calling thread. Yields (position, results) as each upload finishes, so
+    one slow workbook does not hold back the others.
+    """
+    if not uploaded_files:
+        return
+    # Spans are recorded per thread: the workers capture theirs, merged into the caller's as they finish
+    record = is_enabled()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(uploaded_files)),
+                            thread_name_prefix='ews-upload') as executor:
+        task = (capture, process_uploaded_file_cached) if record else (process_uploaded_file_cached,)
+        futures = {
+            executor.submit(*task, uploaded_file, cache, year_cache): position
+            for position, uploaded_file in enumerate(uploaded_files)
+        }
+        try:
+            for future in as_completed(futures):
+                if record:
+                    results, records = future.result()
+                    merge(records)
+                else:
+                    results = future.result()
+                yield futures[future], results
+        finally:
+            # Stopped early (e.g. a Streamlit rerun): drop the uploads not yet started
+            for future in futures:
+                future.cancel()
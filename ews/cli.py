@@ -0,0 +1,221 @@
+"""Headless batch scoring: score a directory of statement workbooks into an EWS panel
+
+Usage:
+    python -m ews.cli INPUT_DIR [--output ews_panel.csv] [--errors ews_errors.csv] [--name file|company]
+                                [--workers N] [--chunksize N] [--timeout SECONDS]
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from .extraction import process_uploaded_file
+from .batch import calculate_ews_batch
+from .panel import PANEL_FIELD_COLUMNS, PANEL_MODEL_COLUMNS, PANEL_SCHEMA, build_panel_history
+
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+
+# Columns of the per-file error report
+ERROR_REPORT_COLUMNS = ['file', 'name', 'status', 'years', 'missing_fields', 'errors']
+
+def find_workbooks(directory):
+    """Sorted paths of the workbooks under directory, skipping Excel lock files (~$...)"""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for file_name in sorted(files):
+            if file_name.lower().endswith(WORKBOOK_EXTENSIONS) and not file_name.startswith('~$'):
+                paths.append(os.path.join(root, file_name))
+    return paths
+
+def process_workbook(path):
+    """process_uploaded_file on a workbook on disk"""
+    with open(path, 'rb') as f:
+        return process_uploaded_file(f)
+
+class WorkbookTimeout(BaseException):
+    """
+    Raised by the per-file alarm. A BaseException so that the catch-all
+    handlers of the extraction code do not turn it into a parse error.
+    """
+
+def _raise_timeout(signum, frame):
+    raise WorkbookTimeout()
+
+def failed_results(path, error):
+    """process_uploaded_file-style results for a workbook that could not be processed"""
+    return {
+        'success': False,
+        'data': {},
+        'years': [],
+        'missing_fields': [],
+        'company_info': {'name': 'Unknown Company', 'file_name': path},
+        'errors': [error]
+    }
+
+def process_workbook_guarded(path, timeout=None):
+    """
+    process_workbook that reports failures in its results instead of raising.
+    With a timeout (seconds), gives up on the file once it is exceeded; this
+    uses SIGALRM and so applies on Unix, in the main thread of a process.
+    """
+    use_alarm = (bool(timeout) and hasattr(signal, 'SIGALRM')
+                 and threading.current_thread() is threading.main_thread())
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        # Keep re-firing in case a bare except swallows the first alarm
+        signal.setitimer(signal.ITIMER_REAL, timeout, 0.1)
+    try:
+        try:
+            return process_workbook(path)
+        finally:
+            # Disarmed before anything else; an alarm firing until then is caught below
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except WorkbookTimeout:
+        return failed_results(path, f"timed out after {timeout:g}s")
+    except OSError as e:
+        return failed_results(path, str(e))
+    finally:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, previous)
+
+def _run_chunk(fn, chunk, args):
+    return [fn(item, *args) for item in chunk]
+
+def pool_map_guarded(executor, fn, items, args=(), chunksize=1, failed=None):
+    """
+    fn(item, *args) for each item, run in the executor chunksize items per
+    task, in input order. The items of a task that raises, or whose worker
+    died, get failed(item, error) instead, so one bad task never aborts the rest.
+    """
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+    futures = [executor.submit(_run_chunk, fn, chunk, args) for chunk in chunks]
+    results = []
+    for chunk, future in zip(chunks, futures):
+        try:
+            results.extend(future.result())
+        except BrokenProcessPool as e:
+            # A worker died (e.g. killed for memory)
+            results.extend(failed(item, f"worker process died: {e}") for item in chunk)
+        except (Exception, WorkbookTimeout) as e:
+            results.extend(failed(item, f"worker task failed: {e!r}") for item in chunk)
+    return results
+
+def process_workbooks(paths, workers=1, chunksize=1, timeout=None):
+    """
+    Results of process_workbook_guarded for each path, in input order. With
+    workers > 1 the files are parsed in a process pool, chunksize files per task.
+    """
+    if workers <= 1 or len(paths) <= 1:
+        return [process_workbook_guarded(path, timeout) for path in paths]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+        return pool_map_guarded(executor, process_workbook_guarded, paths, (timeout,), chunksize, failed_results)
+
+def panel_name(path, results, name_from='file'):
+    """Panel Name of a workbook: its file name without extension, or the company name found in it"""
+    if name_from == 'company':
+        company = results['company_info'].get('name')
+        if company and company != 'Unknown Company':
+            return company
+    return os.path.splitext(os.path.basename(path))[0]
+
+def workbook_panel_rows(results, name):
+    """Panel rows (Name, Date, Year and the model's statement columns) of one processed workbook"""
+    rows = []
+    for year in sorted(results['data']):
+        year_data = results['data'][year]
+        row = {'Name': name, 'Date': f"{year}-12-31", 'Year': year}
+        for field, col in PANEL_FIELD_COLUMNS.items():
+            row[col] = year_data.get(field)
+        rows.append(row)
+    return rows
+
+def build_scored_panel(rows):
+    """Score stacked workbook rows and lay them out in the 05_ews_application.csv schema"""
+    panel = pd.DataFrame(rows, columns=['Name', 'Date', 'Year'] + list(PANEL_FIELD_COLUMNS.values()))
+    panel = panel.sort_values(['Name', 'Year'], kind='stable').reset_index(drop=True)
+
+    fields = pd.DataFrame({field: panel[col] for field, col in PANEL_FIELD_COLUMNS.items()}, index=panel.index)
+    scores = calculate_ews_batch(fields)
+    for col in PANEL_MODEL_COLUMNS:
+        panel[col] = scores[col]
+
+    return build_panel_history(panel).reindex(columns=PANEL_SCHEMA)
+
+def error_record(path, name, results):
+    """One error report row for a processed workbook"""
+    if not results['success']:
+        status = 'failed'
+    elif results['missing_fields']:
+        status = 'partial'
+    else:
+        status = 'ok'
+    return {
+        'file': path,
+        'name': name,
+        'status': status,
+        'years': len(results['data']),
+        'missing_fields': "; ".join(results['missing_fields']),
+        'errors': "; ".join(results['errors'])
+    }
+
+def score_directory(directory, name_from='file', workers=1, chunksize=1, timeout=None):
+    """
+    Score every workbook under directory. Returns the scored panel and the
+    per-file error report; workbooks that fail to process add no panel rows.
+    """
+    paths = find_workbooks(directory)
+    rows = []
+    report = []
+    for path, results in zip(paths, process_workbooks(paths, workers, chunksize, timeout)):
+        name = panel_name(path, results, name_from)
+        report.append(error_record(path, name, results))
+        if results['success']:
+            rows.extend(workbook_panel_rows(results, name))
+
+    return build_scored_panel(rows), pd.DataFrame(report, columns=ERROR_REPORT_COLUMNS)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m ews.cli',
+        description="Score every financial statement workbook under a directory into an EWS panel."
+    )
+    parser.add_argument('input_dir', help="directory searched recursively for .xlsx/.xlsm/.xls workbooks")
+    parser.add_argument('--output', default='ews_panel.csv', help="scored panel CSV (default: ews_panel.csv)")
+    parser.add_argument('--errors', default='ews_errors.csv', help="per-file report CSV (default: ews_errors.csv)")
+    parser.add_argument('--name', choices=['file', 'company'], default='file', dest='name_from',
+                        help="take the panel Name from the file name or from the company name in the workbook")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="worker processes parsing workbooks in parallel; 0 uses every CPU (default: 1)")
+    parser.add_argument('--chunksize', type=int, default=1,
+                        help="workbooks handed to a worker per task (default: 1)")
+    parser.add_argument('--timeout', type=float, default=None,
+                        help="seconds after which a single workbook is abandoned and reported as failed")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"not a directory: {args.input_dir}")
+
+    if args.workers < 0 or args.chunksize < 1:
+        parser.error("--workers must be >= 0 and --chunksize >= 1")
+    workers = args.workers or os.cpu_count() or 1
+
+    panel, report = score_directory(args.input_dir, args.name_from, workers, args.chunksize, args.timeout)
+    panel.to_csv(args.output, index=False)
+    report.to_csv(args.errors, index=False)
+
+    n_failed = int((report['status'] == 'failed').sum())
+    print(f"Scored {len(report) - n_failed} of {len(report)} workbooks "
+          f"({len(panel)} firm-years) -> {args.output}; report -> {args.errors}", file=sys.stderr)
+    return 0 if len(report) > n_failed else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
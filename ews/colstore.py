@@ -0,0 +1,200 @@
+"""
+On-disk column store of an indexed panel: one fixed-width .npy array per
+column, categorical codes for string columns and a per-company offsets table,
+opened as np.memmap. Processes serving the same store share one page-cache
+copy, and a company's rows are zero-copy slices of the mapped columns.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from .model import EWS_LEVELS
+
+PANEL_COLUMN_STORE_PATH = "05_ews_application.npcols"
+# Bumped when the on-disk layout changes
+COLUMN_STORE_LAYOUT = 1
+
+def _code_dtype(n_categories):
+    for dtype in [np.int8, np.int16, np.int32]:
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+def build_column_store(index, path=PANEL_COLUMN_STORE_PATH, version=None):
+    """
+    Write the frame of a build_panel_index index as a column store at `path`
+    (a directory), replacing any previous store there. String and categorical
+    columns are stored as codes, nullable integers as values plus a mask.
+    """
+    df = index['frame']
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        file_name = f"col{i}.npy"
+        entry = {'name': col, 'file': file_name}
+        if isinstance(series.dtype, pd.CategoricalDtype) or not (
+                pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype)):
+            categorical = series.astype('category').array
+            categories = categorical.categories
+            entry.update(kind='category', categories=categories.tolist(),
+                         categories_dtype=str(categories.dtype))
+            values = categorical.codes.astype(_code_dtype(len(categories)))
+        elif isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+            numpy_dtype = series.dtype.numpy_dtype
+            entry.update(kind='masked', dtype=str(series.dtype), mask=f"col{i}.mask.npy")
+            mask = series.isna().to_numpy()
+            np.save(os.path.join(tmp_path, entry['mask']), mask)
+            values = series.to_numpy(dtype=numpy_dtype, na_value=0)
+        else:
+            entry.update(kind='numpy')
+            values = series.to_numpy()
+        np.save(os.path.join(tmp_path, file_name), values)
+        columns.append(entry)
+
+    slices = [index['company_slices'][name] for name in index['companies']]
+    np.save(os.path.join(tmp_path, 'company_offsets.npy'),
+            np.array([start for start, _ in slices] + [len(df)], dtype=np.int64))
+    np.save(os.path.join(tmp_path, 'year_order.npy'), np.asarray(index['year_order'], dtype=np.int64))
+
+    meta = {
+        'layout': COLUMN_STORE_LAYOUT,
+        'version': version,
+        'rows': len(df),
+        'columns': columns,
+        'companies': index['companies'],
+        'years': index['years'],
+        'year_ranges': {str(y): list(r) for y, r in index['year_ranges'].items()}
+    }
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    try:
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another process replaced the store first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return path
+
+def read_column_store_meta(path=PANEL_COLUMN_STORE_PATH):
+    """meta.json of a column store, or None if there is no readable store at path"""
+    try:
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('layout') == COLUMN_STORE_LAYOUT else None
+
+def column_store_is_fresh(path=PANEL_COLUMN_STORE_PATH, version=None):
+    """True if a column store of the current layout (and of `version`, if given) exists at path"""
+    meta = read_column_store_meta(path)
+    return meta is not None and (version is None or meta['version'] == version)
+
+def open_column_store(path=PANEL_COLUMN_STORE_PATH):
+    """
+    Memory-map a column store read-only. Returns a dict with the same
+    'companies', 'company_slices', 'years', 'year_order' and 'year_ranges'
+    keys as build_panel_index, plus the mapped columns.
+    """
+    meta = read_column_store_meta(path)
+    if meta is None:
+        raise FileNotFoundError(path)
+
+    def mapped(file_name):
+        # Plain ndarray views of the np.memmap, so frames built on them look like any other
+        return np.load(os.path.join(path, file_name), mmap_mode='r').view(np.ndarray)
+
+    columns = []
+    for entry in meta['columns']:
+        column = {'name': entry['name'], 'kind': entry['kind'], 'values': mapped(entry['file'])}
+        if entry['kind'] == 'category':
+            column['dtype'] = pd.CategoricalDtype(pd.Index(entry['categories'], dtype=entry['categories_dtype']))
+        elif entry['kind'] == 'masked':
+            column['dtype'] = pd.api.types.pandas_dtype(entry['dtype'])
+            column['mask'] = mapped(entry['mask'])
+        columns.append(column)
+
+    offsets = mapped('company_offsets.npy')
+    companies = meta['companies']
+    return {
+        'path': path,
+        'version': meta['version'],
+        'rows': meta['rows'],
+        'columns': columns,
+        'companies': companies,
+        'company_slices': {name: (int(offsets[i]), int(offsets[i + 1])) for i, name in enumerate(companies)},
+        'years': meta['years'],
+        'year_order': mapped('year_order.npy'),
+        'year_ranges': {int(y): tuple(r) for y, r in meta['year_ranges'].items()}
+    }
+
+def column_store_frame(store, rows=slice(None), columns=None):
+    """
+    DataFrame of the given rows (a slice, or an array of positions) of the
+    store. With a slice, numeric columns are zero-copy views of the mapped files.
+    """
+    data = {}
+    for column in store['columns']:
+        if columns is not None and column['name'] not in columns:
+            continue
+        values = column['values'][rows]
+        if column['kind'] == 'category':
+            data[column['name']] = pd.Categorical.from_codes(values, dtype=column['dtype'])
+        elif column['kind'] == 'masked':
+            data[column['name']] = column['dtype'].construct_array_type()(values, column['mask'][rows])
+        else:
+            data[column['name']] = values
+    if isinstance(rows, slice):
+        index = pd.RangeIndex(store['rows'])[rows]
+    else:
+        index = pd.Index(np.asarray(rows))
+    return pd.DataFrame(data, index=index, copy=False)
+
+def store_company_rows(store, name):
+    """All rows of one company, ordered by Year"""
+    start, stop = store['company_slices'].get(name, (0, 0))
+    return column_store_frame(store, slice(start, stop))
+
+def store_company_year(store, name, year):
+    """Rows of one company for one year"""
+    start, stop = store['company_slices'].get(name, (0, 0))
+    years = store_column(store, 'Year')[start:stop]
+    lo, hi = np.searchsorted(years, [year, year + 1])
+    return column_store_frame(store, slice(start + int(lo), start + int(hi)))
+
+def store_year_rows(store, year):
+    """Rows of every company for one year"""
+    lo, hi = store['year_ranges'].get(year, (0, 0))
+    return column_store_frame(store, np.asarray(store['year_order'][lo:hi]))
+
+def store_column(store, name):
+    """Mapped values (codes for categorical columns) of one column"""
+    for column in store['columns']:
+        if column['name'] == name:
+            return column['values']
+    raise KeyError(name)
+
+def store_portfolio_cube(store):
+    """Firm counts per Year and ews_level, as build_portfolio_cube, counted from the mapped codes"""
+    years = np.asarray(store_column(store, 'Year'))
+    level_column = next(column for column in store['columns'] if column['name'] == 'ews_level')
+    categories = [str(c) for c in level_column['dtype'].categories]
+    codes = np.asarray(level_column['values'])
+
+    distinct_years, year_codes = np.unique(years, return_inverse=True)
+    valid = codes >= 0
+    counts = np.zeros((len(distinct_years), len(categories)), dtype=np.int64)
+    np.add.at(counts, (year_codes[valid], codes[valid]), 1)
+
+    cube = pd.DataFrame(counts, index=pd.Index(distinct_years, name='Year'), columns=categories)
+    cube = cube.loc[cube.sum(axis=1) > 0]
+    return cube.reindex(columns=EWS_LEVELS, fill_value=0)
@@ -0,0 +1,102 @@
+"""
+EBIT vs interest coverage of a whole panel, for the portfolio scatter: the
+positive firm-years themselves while they fit a point budget, and in any case
+their counts in log-space bins per ews_level, accumulated chunk by chunk
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .panel import PANEL_FIELD_COLUMNS
+
+COVERAGE_INTEREST_COLUMN = PANEL_FIELD_COLUMNS['Interest Expense']
+COVERAGE_EBIT_COLUMN = PANEL_FIELD_COLUMNS['EBIT']
+
+# Firm-years drawn as individual points at most; EWS_COVERAGE_POINTS overrides it
+COVERAGE_POINT_BUDGET = 20000
+# Bin width of the density view, in decades (powers of ten) of Interest and EBIT
+COVERAGE_BIN_DECADES = 0.1
+
+COVERAGE_POINT_COLUMNS = ['Interest', 'EBIT', 'ews_level', 'Name', 'Year']
+COVERAGE_BIN_COLUMNS = ['ews_level', 'ix', 'iy', 'count']
+
+def coverage_point_budget():
+    """Point budget of the portfolio coverage chart: EWS_COVERAGE_POINTS, or COVERAGE_POINT_BUDGET"""
+    setting = os.environ.get('EWS_COVERAGE_POINTS')
+    try:
+        return int(setting) if setting else COVERAGE_POINT_BUDGET
+    except ValueError:
+        return COVERAGE_POINT_BUDGET
+
+def coverage_rows(df, interest_col=COVERAGE_INTEREST_COLUMN, ebit_col=COVERAGE_EBIT_COLUMN, ews_col='ews_level',
+                  year=None):
+    """Interest, EBIT, ews_level, Name and Year of the rows (of `year`, if given) with the first three present"""
+    if year is not None:
+        df = df[df['Year'] == year]
+    rows = pd.DataFrame({
+        'Interest': pd.to_numeric(df[interest_col], errors='coerce').to_numpy(dtype=float),
+        'EBIT': pd.to_numeric(df[ebit_col], errors='coerce').to_numpy(dtype=float),
+        'ews_level': df[ews_col].to_numpy(dtype=object),
+        'Name': df['Name'].to_numpy(dtype=object),
+        'Year': df['Year'].to_numpy()
+    })
+    return rows.dropna(subset=['Interest', 'EBIT', 'ews_level'])
+
+def coverage_bins(points, width=COVERAGE_BIN_DECADES):
+    """
+    Firm-years per ews_level and log-space bin of positive points: bin (ix, iy)
+    spans Interest in [10**(ix*width), 10**((ix+1)*width)), EBIT likewise with iy
+    """
+    ix = np.floor(np.log10(points['Interest'].to_numpy()) / width).astype(np.int64)
+    iy = np.floor(np.log10(points['EBIT'].to_numpy()) / width).astype(np.int64)
+    keyed = pd.DataFrame({'ews_level': points['ews_level'].to_numpy(), 'ix': ix, 'iy': iy})
+    return keyed.groupby(['ews_level', 'ix', 'iy']).size().rename('count').reset_index()
+
+def build_coverage_summary(chunks, interest_col=COVERAGE_INTEREST_COLUMN, ebit_col=COVERAGE_EBIT_COLUMN,
+                           ews_col='ews_level', year=None, budget=None, width=COVERAGE_BIN_DECADES):
+    """
+    One pass over panel chunks (frames with Name, Year, ews_level and the
+    interest and EBIT columns). Returns:
+    - 'points': the firm-years with positive Interest and EBIT, or None once more than `budget`
+    - 'bins': their counts per ews_level and log-space bin (COVERAGE_BIN_COLUMNS)
+    - 'n_points', 'x_min', 'x_max': their number and Interest range
+    - 'n_interest_non_positive', 'n_ebit_non_positive': the rows left out, as create_interest_coverage_chart counts them
+    Memory is bounded by the budget and the number of occupied bins, not by the panel size.
+    """
+    budget = coverage_point_budget() if budget is None else budget
+    points = []
+    bins = pd.DataFrame(columns=COVERAGE_BIN_COLUMNS)
+    summary = {'n_points': 0, 'n_interest_non_positive': 0, 'n_ebit_non_positive': 0,
+               'x_min': None, 'x_max': None, 'width': width, 'budget': budget}
+
+    for chunk in chunks:
+        rows = coverage_rows(chunk, interest_col, ebit_col, ews_col, year)
+        summary['n_interest_non_positive'] += int((rows['Interest'] <= 0).sum())
+        summary['n_ebit_non_positive'] += int((rows['EBIT'] <= 0).sum())
+        positive = rows[(rows['Interest'] > 0) & (rows['EBIT'] > 0)]
+        if positive.empty:
+            continue
+
+        summary['n_points'] += len(positive)
+        x_min, x_max = float(positive['Interest'].min()), float(positive['Interest'].max())
+        summary['x_min'] = x_min if summary['x_min'] is None else min(summary['x_min'], x_min)
+        summary['x_max'] = x_max if summary['x_max'] is None else max(summary['x_max'], x_max)
+
+        chunk_bins = coverage_bins(positive, width)
+        bins = chunk_bins if bins.empty else (
+            pd.concat([bins, chunk_bins]).groupby(['ews_level', 'ix', 'iy'], as_index=False)['count'].sum()
+        )
+        if points is not None:
+            points.append(positive)
+            if summary['n_points'] > budget:
+                points = None
+
+    if points is not None:
+        summary['points'] = (pd.concat(points, ignore_index=True) if points
+                             else pd.DataFrame(columns=COVERAGE_POINT_COLUMNS))
+    else:
+        summary['points'] = None
+    summary['bins'] = bins.astype({'ix': np.int64, 'iy': np.int64, 'count': np.int64})
+    return summary
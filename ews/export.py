@@ -0,0 +1,115 @@
+"""
+Excel export of a scored panel: per-company rows, the Year x ews_level summary
+and each firm-year's risk drivers, written chunk by chunk with openpyxl's
+write-only workbook so memory does not grow with the number of rows
+"""
+
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from .model import EWS_LEVELS
+from .panel import build_portfolio_cube
+from .timing import timed
+
+# Panel rows converted and written per chunk
+EXPORT_CHUNK_ROWS = 5000
+# Exports larger than this spill from memory to a temporary file
+EXPORT_SPOOL_BYTES = 16 * 2 ** 20
+
+EXPORT_SHEETS = ['Companies', 'Summary', 'Drivers']
+DRIVER_COLUMNS = ['Name', 'Year', 'ews_level', 'driver']
+
+def iter_frame_chunks(df, rows=EXPORT_CHUNK_ROWS):
+    """Consecutive row slices of a frame"""
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+def _flag(series):
+    return pd.to_numeric(series, errors='coerce').eq(1).to_numpy()
+
+def panel_drivers(df):
+    """
+    Long frame (DRIVER_COLUMNS) of the risk drivers of each scored panel row,
+    in the wording and order of signals_from_scores
+    """
+    z_score = pd.to_numeric(df['Z_Score'], errors='coerce')
+    s_score = pd.to_numeric(df['S_Score'], errors='coerce')
+    cur = pd.to_numeric(df['CUR'], errors='coerce')
+    lev = pd.to_numeric(df['LEV'], errors='coerce').fillna(0)
+    roa = pd.to_numeric(df['ROA'], errors='coerce').fillna(0)
+    rules = [
+        (_flag(df['signal_ebit']), pd.Series("EBIT lower than Interest Expense - Weak interest coverage",
+                                             index=df.index)),
+        (_flag(df['signal_z']), z_score.map("Altman Z-Score = {:.2f} - High risk zone".format)),
+        (_flag(df['signal_s']), s_score.map("S-Score = {:.2f} - High risk".format)),
+        ((cur < 1).to_numpy(), cur.map("Current Ratio = {:.2f} < 1 - Liquidity risk".format)),
+        ((lev > 0.7).to_numpy(), lev.map("Leverage = {:.2%} > 70% - High debt risk".format)),
+        ((roa < 0).to_numpy(), roa.map("ROA = {:.2%} < 0 - Operating loss".format)),
+    ]
+
+    positions = np.arange(len(df))
+    parts = []
+    for order, (mask, text) in enumerate(rules):
+        if mask.any():
+            part = df.loc[mask, ['Name', 'Year', 'ews_level']]
+            parts.append(part.assign(driver=text[mask].to_numpy(), _row=positions[mask], _order=order))
+    if not parts:
+        return pd.DataFrame(columns=DRIVER_COLUMNS)
+    drivers = pd.concat(parts).sort_values(['_row', '_order'], kind='stable')
+    return drivers[DRIVER_COLUMNS]
+
+def sheet_rows(df):
+    """Rows of a frame as lists of plain Python values, missing values as empty cells"""
+    values = df.astype(object).where(df.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+@timed('export.xlsx')
+def write_panel_workbook(chunks, target):
+    """
+    Write the scored panel, given as an iterable of frames with the same
+    columns, to `target` (a path or a binary file) as an XLSX with the
+    EXPORT_SHEETS. Each chunk is appended and dropped before the next is read.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    companies, summary, drivers = (workbook.create_sheet(title) for title in EXPORT_SHEETS)
+    drivers.append(DRIVER_COLUMNS)
+
+    cube = None
+    header = None
+    for chunk in chunks:
+        if header is None:
+            header = list(chunk.columns)
+            companies.append(header)
+        for row in sheet_rows(chunk):
+            companies.append(row)
+        for row in sheet_rows(panel_drivers(chunk)):
+            drivers.append(row)
+        counts = build_portfolio_cube(chunk)
+        cube = counts if cube is None else cube.add(counts, fill_value=0)
+
+    summary.append(['Year'] + EWS_LEVELS + ['Total'])
+    if cube is not None:
+        cube = cube.sort_index().astype(np.int64)
+        for year, counts in cube.iterrows():
+            summary.append([int(year)] + [int(counts[level]) for level in EWS_LEVELS] + [int(counts.sum())])
+
+    workbook.save(target)
+    return target
+
+def export_panel_xlsx(chunks):
+    """
+    write_panel_workbook into a SpooledTemporaryFile (on disk past
+    EXPORT_SPOOL_BYTES), rewound for reading. The caller closes it.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES, suffix='.xlsx')
+    try:
+        write_panel_workbook(chunks, spool)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
@@ -0,0 +1,887 @@
+"""Reading uploaded financial statement workbooks into per-year field values"""
+
+import hashlib
+import zipfile
+from itertools import chain, islice
+
+import numpy as np
+import pandas as pd
+import openpyxl
+# The xlsx package parse (open_xlsx_package, read_xlsx_statements) uses openpyxl
+# internals, hence the <3.2 pin in requirements.txt: ExcelReader's
+# read_manifest/read_workbook/parser.find_sheets/valid_files/package.find,
+# apply_stylesheet, WorkSheetParser and the cell dicts its parse() yields,
+# wb.epoch/_date_formats/_timedelta_formats, and the shared strings' <si>
+# elements read with Text as read_string_table reads them
+from openpyxl.cell.cell import ERROR_CODES
+from openpyxl.cell.text import Text
+from openpyxl.reader.excel import ExcelReader
+from openpyxl.styles.stylesheet import apply_stylesheet
+from openpyxl.utils.exceptions import InvalidFileException
+from openpyxl.worksheet._reader import WorkSheetParser
+from openpyxl.xml.constants import SHARED_STRINGS, SHEET_MAIN_NS
+from openpyxl.xml.functions import iterparse
+
+from .mappings import FCC_MAPPING, VN_MAPPING, VN_SHEET_NAMES, REQUIRED_FIELDS, MAPPING_VERSION
+from .timing import timed
+
+# Rows read to sniff a statement sheet's header (company name, unit and year row)
+SNIFF_ROWS = 30
+
+# What the package parse raises for a package it cannot read or an openpyxl
+# whose internals moved (XML parse errors are SyntaxErrors); load_statement_workbook
+# then falls back to load_workbook
+XLSX_PACKAGE_ERRORS = (AttributeError, IndexError, KeyError, SyntaxError, TypeError, ValueError,
+                       zipfile.BadZipFile)
+
+def detect_file_format(df, sheet_name=None):
+    """Detect if file is CF-Export format or Vietnamese BCTC format"""
+    # Check for FCC codes
+    if 'FCC Code' in df.columns or df.iloc[:, 0].astype(str).str.match(r'^[A-Z]{4}$').any():
+        return 'cf_export'
+
+    # Check for Vietnamese keywords
+    vn_keywords = ['TÀI SẢN', 'NỢ PHẢI TRẢ', 'VỐN CHỦ SỞ HỮU', 'Doanh thu', 'Lợi nhuận']
+    text_content = ' '.join(df.iloc[:30, 0].astype(str).tolist())
+    if any(kw in text_content for kw in vn_keywords):
+        return 'vietnamese'
+
+    return 'unknown'
+
+def find_data_start_row(df):
+    """Find the row where actual data starts"""
+    for idx, row in df.iterrows():
+        # Look for year columns (e.g., 2020, 2021, 2022 or dates)
+        row_str = ' '.join([str(x) for x in row.values])
+        if any(str(year) in row_str for year in range(2010, 2030)):
+            return idx
+    return 0
+
+def extract_years_from_columns(df, start_row):
+    """Extract year columns from dataframe"""
+    years = []
+    year_cols = {}
+
+    header_row = df.iloc[start_row] if start_row < len(df) else df.columns
+
+    for idx, val in enumerate(header_row):
+        val_str = str(val)
+        # Try to extract year
+        for year in range(2010, 2030):
+            if str(year) in val_str:
+                years.append(year)
+                year_cols[year] = idx
+                break
+        # Check for date format
+        if '-12-31' in val_str or '-12-30' in val_str:
+            try:
+                year = int(val_str[:4])
+                if 2010 <= year <= 2030:
+                    years.append(year)
+                    year_cols[year] = idx
+            except:
+                pass
+
+    return sorted(set(years)), year_cols
+
+def read_cf_export_file(file, sheet_name):
+    """Read CF-Export format Excel file"""
+    df = pd.read_excel(file, sheet_name=sheet_name, header=None)
+
+    # Find header row (usually row 14 or 15)
+    header_row = None
+    for idx in range(min(20, len(df))):
+        row_vals = df.iloc[idx].astype(str).tolist()
+        if 'FCC Code' in row_vals or 'Field Name' in row_vals:
+            header_row = idx
+            break
+
+    if header_row is None:
+        header_row = find_data_start_row(df)
+
+    # Set headers
+    df.columns = df.iloc[header_row]
+    df = df.iloc[header_row + 1:].reset_index(drop=True)
+
+    # Clean column names
+    df.columns = [str(c).strip() for c in df.columns]
+
+    return df
+
+def read_vietnamese_bctc(file, sheet_name):
+    """Read Vietnamese BCTC format Excel file"""
+    df = pd.read_excel(file, sheet_name=sheet_name, header=None)
+
+    # Find data start
+    data_start = 0
+    for idx in range(min(10, len(df))):
+        row_str = ' '.join([str(x) for x in df.iloc[idx].values if pd.notna(x)])
+        if any(str(year) in row_str for year in range(2015, 2030)):
+            data_start = idx
+            break
+
+    return df, data_start
+
+@timed('extract.cf_export_info')
+def extract_cf_export_info(df):
+    """Extract company name and scaling factor from CF-Export file header"""
+    company_name = "Unknown Company"
+    scaling_factor = 1000  # Default for CF-Export is Thousands
+
+    for idx in range(min(15, len(df))):
+        for col_idx in range(min(5, len(df.columns))):
+            cell_val = str(df.iloc[idx, col_idx]) if pd.notna(df.iloc[idx, col_idx]) else ''
+
+            # Find Company Name row
+            if 'Company Name' in cell_val:
+                # Company name is in the next column
+                if col_idx + 1 < len(df.columns):
+                    name_val = df.iloc[idx, col_idx + 1]
+                    if pd.notna(name_val):
+                        company_name = str(name_val).strip()
+
+            # Find Scaling row
+            if 'Scaling' in cell_val:
+                if col_idx + 1 < len(df.columns):
+                    scale_val = str(df.iloc[idx, col_idx + 1]).lower() if pd.notna(df.iloc[idx, col_idx + 1]) else ''
+                    if 'thousand' in scale_val:
+                        scaling_factor = 1000
+                    elif 'million' in scale_val:
+                        scaling_factor = 1000000
+                    elif 'billion' in scale_val:
+                        scaling_factor = 1000000000
+                    else:
+                        scaling_factor = 1
+
+    return company_name, scaling_factor
+
+def _cell_to_float(val):
+    """Convert a sheet cell to float, NaN when empty or not numeric"""
+    if pd.notna(val):
+        try:
+            return float(val)
+        except:
+            pass
+    return np.nan
+
+@timed('extract.label_index')
+def build_label_index(df, mapping, file_format):
+    """
+    Index the label column(s) of a statement sheet once so that each field/year
+    lookup is an array read instead of a scan over every row.
+    file_format selects the matching rules:
+    - 'cf_export': FCC code equals a term or description contains it
+    - 'vietnamese': exact label match or close partial match
+    - 'generic': label contains a term or is contained in it
+    """
+    first_col = [str(v) if pd.notna(v) else '' for v in df.iloc[:, 0]] if len(df.columns) else []
+
+    index = {
+        'format': file_format,
+        'mapping': mapping,
+        'frame': df,
+        'n_cols': len(df.columns),
+        'label_rows': {},
+        'desc_rows': {},
+        'rows': {},
+        'columns': {}
+    }
+
+    if file_format == 'cf_export':
+        # FCC code -> rows and lowercase description -> rows
+        for idx, code in enumerate(first_col):
+            index['label_rows'].setdefault(code, []).append(idx)
+        if len(df.columns) > 1:
+            for idx, val in enumerate(df.iloc[:, 1]):
+                desc = str(val).lower() if pd.notna(val) else ''
+                index['desc_rows'].setdefault(desc, []).append(idx)
+    elif file_format == 'vietnamese':
+        # Stripped label -> rows
+        for idx, label in enumerate(first_col):
+            index['label_rows'].setdefault(label.strip(), []).append(idx)
+    else:
+        # Lowercase label -> rows
+        for idx, label in enumerate(first_col):
+            index['label_rows'].setdefault(label.lower(), []).append(idx)
+
+    return index
+
+def _match_label_rows(index, field_name):
+    """Row positions whose label matches field_name, in the order the scan visited them"""
+    search_terms = index['mapping'].get(field_name, [field_name])
+    file_format = index['format']
+
+    if file_format == 'cf_export':
+        rows = set()
+        for term in search_terms:
+            rows.update(index['label_rows'].get(term, []))
+            term_lower = term.lower()
+            for desc, desc_rows in index['desc_rows'].items():
+                if term_lower in desc:
+                    rows.update(desc_rows)
+        return sorted(rows)
+
+    if file_format == 'vietnamese':
+        rows = set()
+        for label, label_rows in index['label_rows'].items():
+            label_lower = label.lower()
+            for term in search_terms:
+                term_lower = term.lower()
+                if term == label or term_lower == label_lower:
+                    rows.update(label_rows)
+                    break
+                if term_lower in label_lower and (len(term) > 10 or label.startswith(term) or label.endswith(term)):
+                    rows.update(label_rows)
+                    break
+        return sorted(rows)
+
+    # Generic rules scan term by term, so earlier terms take precedence
+    rows = []
+    for term in search_terms:
+        term_lower = term.lower()
+        term_rows = set()
+        for label, label_rows in index['label_rows'].items():
+            if term_lower in label or label in term_lower:
+                term_rows.update(label_rows)
+        rows.extend(sorted(term_rows))
+    return rows
+
+def _label_index_column(index, year_col):
+    """Float values of one column of an indexed sheet, parsed once and kept in the index"""
+    values = index['columns'].get(year_col)
+    if values is None:
+        values = index['columns'][year_col] = np.array(
+            [_cell_to_float(v) for v in index['frame'].iloc[:, year_col]], dtype=float
+        )
+    return values
+
+@timed('extract.lookup')
+def lookup_label_index(index, field_name, year_col):
+    """Return the first numeric value of field_name in year_col, or None"""
+    if not isinstance(year_col, (int, np.integer)) or year_col >= index['n_cols']:
+        return None
+
+    rows = index['rows'].get(field_name)
+    if rows is None:
+        rows = index['rows'][field_name] = _match_label_rows(index, field_name)
+    if not rows:
+        return None
+
+    values = _label_index_column(index, year_col)
+    for row in rows:
+        if not np.isnan(values[row]):
+            return float(values[row])
+    return None
+
+def extraction_context(file_format, scaling_factor, indexes):
+    """
+    Digest of the inputs shared by every year of a workbook: mapping version,
+    format, scaling and the label columns of each indexed sheet (None for a
+    missing sheet)
+    """
+    digest = hashlib.sha256(f"{MAPPING_VERSION}|{file_format}|{scaling_factor}".encode('utf-8'))
+    for index in indexes:
+        if index is None:
+            digest.update(b'\x00')
+            continue
+        df = index['frame']
+        for col in range(min(2, index['n_cols'])):
+            labels = [str(v) if pd.notna(v) else '' for v in df.iloc[:, col]]
+            digest.update(repr(labels).encode('utf-8'))
+        digest.update(b'\x01')
+    return digest.digest()
+
+def year_content_key(context, indexes, year_col):
+    """Content hash of one year's inputs: the workbook context plus that year's column of each sheet"""
+    digest = hashlib.sha256(context)
+    for index in indexes:
+        if index is None or not isinstance(year_col, (int, np.integer)) or year_col >= index['n_cols']:
+            digest.update(b'\x00')
+        else:
+            digest.update(_label_index_column(index, year_col).tobytes())
+    return ('year_fields', digest.hexdigest())
+
+def extract_year_cached(year_cache, context, indexes, year_col, extract):
+    """
+    extract(year_col), or the fields extracted earlier from a year column with
+    the same content when year_cache (a BoundedCache) holds them
+    """
+    if year_cache is None:
+        return extract(year_col)
+
+    key = year_content_key(context, indexes, year_col)
+    year_data = year_cache.get(key)
+    if year_data is None:
+        year_data = extract(year_col)
+        year_cache.put(key, dict(year_data))
+        return year_data
+    return dict(year_data)
+
+@timed('extract.field_value')
+def extract_field_value(df, field_name, mapping, year_col, file_format):
+    """Extract a specific field value from dataframe"""
+    return lookup_label_index(build_label_index(df, mapping, 'generic'), field_name, year_col)
+
+@timed('extract.field_value')
+def extract_cf_export_data(df, field_name, mapping, year_col):
+    """Extract data from CF-Export format using FCC codes"""
+    return lookup_label_index(build_label_index(df, mapping, 'cf_export'), field_name, year_col)
+
+@timed('extract.field_value')
+def extract_vn_field_value(df, field_name, mapping, year_col):
+    """Extract data from Vietnamese BCTC format using field name matching"""
+    return lookup_label_index(build_label_index(df, mapping, 'vietnamese'), field_name, year_col)
+
+def select_statement_sheets(sheet_names):
+    """
+    Pick the file format and the balance sheet / income statement sheets from
+    the workbook's sheet names. When several sheets match, the last one wins.
+    """
+    # Detect CF-Export format by checking for typical sheets
+    is_cf_export = any(s.lower() in ['balance sheet', 'income statement', 'financial summary']
+                      for s in sheet_names)
+
+    bs_sheet = None
+    is_sheet = None
+
+    if is_cf_export:
+        file_format = 'cf_export'
+        for sheet in sheet_names:
+            if 'balance' in sheet.lower():
+                bs_sheet = sheet
+            elif 'income' in sheet.lower():
+                is_sheet = sheet
+    else:
+        file_format = 'vietnamese'
+        for sheet in sheet_names:
+            sheet_lower = sheet.lower()
+            # Check for Balance Sheet
+            if any(vn_name.lower() in sheet_lower or sheet_lower in vn_name.lower()
+                   for vn_name in VN_SHEET_NAMES['balance_sheet']):
+                bs_sheet = sheet
+            # Check for Income Statement
+            elif any(vn_name.lower() in sheet_lower or sheet_lower in vn_name.lower()
+                     for vn_name in VN_SHEET_NAMES['income_statement']):
+                is_sheet = sheet
+
+    # If no specific balance sheet found, use first sheet
+    if bs_sheet is None and sheet_names:
+        bs_sheet = sheet_names[0]
+
+    return file_format, bs_sheet, is_sheet
+
+def _excel_cell_value(val):
+    """Normalize a streamed cell value the way pd.read_excel does"""
+    if val is None or val == '':
+        return np.nan
+    if isinstance(val, float) and val.is_integer():
+        return int(val)
+    if isinstance(val, str) and val in ERROR_CODES:
+        return np.nan
+    return val
+
+def worksheet_rows_frame(raw_rows):
+    """Frame shaped like pd.read_excel(header=None) from a worksheet's rows of cell values"""
+    rows = []
+    n_rows = 0
+    width = 0
+    for row in raw_rows:
+        row = list(row)
+        # Trim trailing empty cells (error values count as data, as they do
+        # for pd.read_excel) and remember the last non-empty row
+        while row and (row[-1] is None or row[-1] == ''):
+            row.pop()
+        row = [_excel_cell_value(v) for v in row]
+        rows.append(row)
+        if row:
+            n_rows = len(rows)
+            width = max(width, len(row))
+
+    rows = [row + [np.nan] * (width - len(row)) for row in rows[:n_rows]]
+    return pd.DataFrame(rows)
+
+def read_worksheet_frame(ws, nrows=None):
+    """
+    Stream a read-only worksheet (its first nrows rows, if given) into a frame
+    shaped like pd.read_excel(header=None, nrows=nrows)
+    """
+    if hasattr(ws, 'reset_dimensions'):
+        ws.reset_dimensions()
+    return worksheet_rows_frame(ws.iter_rows(max_row=nrows, values_only=True))
+
+class SharedStringPrefix:
+    """
+    An xlsx's shared string table parsed lazily, only as far as the highest
+    index looked up, as openpyxl's read_string_table would read it
+    """
+
+    def __init__(self, source):
+        self._nodes = iterparse(source) if source is not None else iter(())
+        self._strings = []
+
+    def __getitem__(self, index):
+        while len(self._strings) <= index:
+            try:
+                _, node = next(self._nodes)
+            except StopIteration:
+                raise IndexError(index)
+            if node.tag == '{%s}si' % SHEET_MAIN_NS:
+                self._strings.append(Text.from_tree(node).content.replace('x005F_', ''))
+                node.clear()
+        return self._strings[index]
+
+def iter_xlsx_rows(reader, sheet_path, shared_strings):
+    """
+    Cell values of an xlsx worksheet part, row by row as a read-only
+    worksheet's iter_rows(values_only=True) yields them, parsed straight from
+    the package of an ExcelReader whose workbook and styles are read
+    """
+    with reader.archive.open(sheet_path) as source:
+        parser = WorkSheetParser(source, shared_strings, data_only=True,
+                                 epoch=reader.wb.epoch, date_formats=reader.wb._date_formats,
+                                 timedelta_formats=reader.wb._timedelta_formats)
+        n_rows = 0
+        for idx, cells in parser.parse():
+            # Missing rows are empty, repeated ones are skipped as openpyxl does
+            while n_rows < idx - 1:
+                n_rows += 1
+                yield []
+            if idx <= n_rows:
+                continue
+            values = [None] * max((cell['column'] for cell in cells), default=0)
+            for cell in cells:
+                values[cell['column'] - 1] = cell['value']
+            n_rows += 1
+            yield values
+
+def cf_export_header(df):
+    """Company name, scaling factor and year columns ({year: column}) from a CF-Export balance sheet's header rows"""
+    company_name, scaling_factor = extract_cf_export_info(df)
+
+    # Find years row (row with "Statement Data" or year values like 2014, 2015...)
+    year_cols = {}
+
+    for idx in range(min(20, len(df))):
+        row_vals = [str(df.iloc[idx, c]) for c in range(len(df.columns))]
+        # Check for Statement Data row or FCC header row
+        if 'Statement Data' in row_vals or 'FCC' in row_vals:
+            # Next row or same row should have years
+            for col_idx in range(2, len(df.columns)):
+                val = df.iloc[idx, col_idx]
+                if pd.notna(val):
+                    try:
+                        year = int(float(val))
+                        if 2010 <= year <= 2030:
+                            year_cols[year] = col_idx
+                    except:
+                        pass
+            break
+
+    return {'company_name': company_name, 'scaling_factor': scaling_factor, 'year_cols': year_cols}
+
+def vietnamese_header(df):
+    """
+    Company name (None if not found), scaling factor and year columns
+    ({year: column}) from a Vietnamese BCTC balance sheet's header rows
+    """
+    company_name = None
+    scaling_factor = 1000  # Default: "Nghìn đồng" (thousands)
+
+    # Extract company name from header (usually in first rows)
+    for idx in range(min(10, len(df))):
+        for col_idx in range(min(5, len(df.columns))):
+            cell_val = str(df.iloc[idx, col_idx]) if pd.notna(df.iloc[idx, col_idx]) else ''
+            if 'CÔNG TY' in cell_val.upper() or 'COMPANY' in cell_val.upper():
+                # Extract company name
+                company_name = cell_val.split('\n')[0].strip()
+                if '-' in company_name:
+                    company_name = company_name.split('-')[0].strip()
+                break
+            # Also check for unit/scaling
+            if 'nghìn đồng' in cell_val.lower() or 'nghin dong' in cell_val.lower():
+                scaling_factor = 1000
+            elif 'triệu đồng' in cell_val.lower() or 'trieu dong' in cell_val.lower():
+                scaling_factor = 1000000
+            elif 'tỷ đồng' in cell_val.lower() or 'ty dong' in cell_val.lower():
+                scaling_factor = 1000000000
+
+    # Find year row and extract years
+    # Only use first occurrence of each year (avoid percentage columns)
+    year_cols = {}
+
+    for idx in range(min(10, len(df))):
+        row_vals = df.iloc[idx].tolist()
+        for col_idx, val in enumerate(row_vals):
+            if pd.notna(val):
+                try:
+                    year_val = int(float(val))
+                    if 2010 <= year_val <= 2030:
+                        # Only add if this year hasn't been found yet
+                        # This ensures we get the FIRST occurrence (actual data columns)
+                        if year_val not in year_cols:
+                            year_cols[year_val] = col_idx
+                except (ValueError, TypeError):
+                    pass
+
+    return {'company_name': company_name, 'scaling_factor': scaling_factor, 'year_cols': year_cols}
+
+@timed('extract.sniff_header')
+def sniff_statement_header(df_head, file_format):
+    """Header of a balance sheet (cf_export_header / vietnamese_header) from its first SNIFF_ROWS rows"""
+    if file_format == 'cf_export':
+        return cf_export_header(df_head)
+    return vietnamese_header(df_head)
+
+def open_xlsx_package(uploaded_file):
+    """
+    ExcelReader over an xlsx with its manifest, workbook and styles read, or
+    None if the file is not an xlsx (e.g. legacy .xls)
+    """
+    if hasattr(uploaded_file, 'seek'):
+        uploaded_file.seek(0)
+
+    try:
+        reader = ExcelReader(uploaded_file, read_only=True, data_only=True, keep_links=False)
+    except (InvalidFileException, zipfile.BadZipFile):
+        return None
+
+    try:
+        reader.read_manifest()
+        reader.read_workbook()
+        apply_stylesheet(reader.archive, reader.wb)
+    except BaseException:
+        reader.archive.close()
+        raise
+    return reader
+
+def read_xlsx_statements(reader):
+    """
+    load_statement_workbook for an xlsx package opened by open_xlsx_package.
+    The balance sheet is parsed once: its first SNIFF_ROWS rows give the
+    header and, if that has a year row, the same parse carries on through
+    the rest of the sheet. No other sheet is scanned, and the shared strings
+    are read only as far as the statement rows use them.
+    """
+    # Sheets in wb.sheetnames order, as load_workbook would list them
+    sheet_paths = {sheet.name: rel.target for sheet, rel in reader.parser.find_sheets()
+                   if rel.target in reader.valid_files}
+    sheet_names = list(sheet_paths)
+    file_format, bs_sheet, is_sheet = select_statement_sheets(sheet_names)
+
+    strings_part = reader.package.find(SHARED_STRINGS)
+    strings_source = reader.archive.open(strings_part.PartName[1:]) if strings_part is not None else None
+    header = None
+    frames = {}
+    try:
+        shared_strings = SharedStringPrefix(strings_source)
+        if bs_sheet is not None:
+            rows = iter_xlsx_rows(reader, sheet_paths[bs_sheet], shared_strings)
+            head = list(islice(rows, SNIFF_ROWS))
+            header = sniff_statement_header(worksheet_rows_frame(head), file_format)
+            if has_year_row(header):
+                frames[bs_sheet] = worksheet_rows_frame(chain(head, rows))
+                if is_sheet is not None and is_sheet not in frames:
+                    frames[is_sheet] = worksheet_rows_frame(
+                        iter_xlsx_rows(reader, sheet_paths[is_sheet], shared_strings))
+            rows.close()
+    finally:
+        if strings_source is not None:
+            strings_source.close()
+
+    return {
+        'format': file_format,
+        'sheet_names': sheet_names,
+        'balance_sheet_name': bs_sheet,
+        'header': header,
+        'balance_sheet': frames.get(bs_sheet),
+        'income_statement': frames.get(is_sheet)
+    }
+
+def has_year_row(header):
+    return header is not None and bool(header['year_cols'])
+
+@timed('extract.read_workbook')
+def load_statement_workbook(uploaded_file):
+    """
+    Pick the statement sheets by name and read the balance sheet's header
+    from its first SNIFF_ROWS rows. Only if that header has a year row are
+    the balance sheet and income statement parsed in full; other sheets are
+    never read. xlsx files are parsed straight from their package
+    (read_xlsx_statements), falling back to openpyxl's read-only, values-only
+    load_workbook if that fails; other formats go through a single pd.ExcelFile.
+    Returns {'format', 'sheet_names', 'balance_sheet_name', 'header', 'balance_sheet', 'income_statement'}.
+    """
+    try:
+        reader = open_xlsx_package(uploaded_file)
+    except XLSX_PACKAGE_ERRORS:
+        reader = None
+    if reader is not None:
+        try:
+            return read_xlsx_statements(reader)
+        except XLSX_PACKAGE_ERRORS:
+            pass
+        finally:
+            reader.archive.close()
+
+    if hasattr(uploaded_file, 'seek'):
+        uploaded_file.seek(0)
+
+    try:
+        wb = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True, keep_links=False)
+    except (InvalidFileException, zipfile.BadZipFile):
+        # Not an OOXML workbook (e.g. legacy .xls)
+        wb = None
+
+    if wb is not None:
+        sheet_names = wb.sheetnames
+        read_sheet = lambda name, nrows=None: read_worksheet_frame(wb[name], nrows)
+    else:
+        if hasattr(uploaded_file, 'seek'):
+            uploaded_file.seek(0)
+        xls = pd.ExcelFile(uploaded_file)
+        sheet_names = xls.sheet_names
+        read_sheet = lambda name, nrows=None: xls.parse(name, header=None, nrows=nrows)
+
+    try:
+        file_format, bs_sheet, is_sheet = select_statement_sheets(sheet_names)
+        header = sniff_statement_header(read_sheet(bs_sheet, SNIFF_ROWS), file_format) if bs_sheet else None
+        frames = {}
+        if has_year_row(header):
+            for sheet in [bs_sheet, is_sheet]:
+                if sheet is not None and sheet not in frames:
+                    frames[sheet] = read_sheet(sheet)
+    finally:
+        if wb is not None:
+            wb.close()
+
+    return {
+        'format': file_format,
+        'sheet_names': sheet_names,
+        'balance_sheet_name': bs_sheet,
+        'header': header,
+        'balance_sheet': frames.get(bs_sheet),
+        'income_statement': frames.get(is_sheet)
+    }
+
+@timed('extract.cf_export_sheets')
+def extract_cf_export_year(bs_index, is_index, year_col, scaling_factor):
+    """Fields of one year (sheet column year_col) of a CF-Export workbook"""
+    year_data = {}
+
+    # Extract from Balance Sheet
+    if bs_index is not None:
+        for field in ['Total Assets', 'Total Current Assets', 'Total Current Liabilities',
+                     'Total Liabilities', 'Total Fixed Assets - Net', 'Shareholders Equity',
+                     'Retained Earnings']:
+            val = lookup_label_index(bs_index, field, year_col)
+            if val is not None:
+                year_data[field] = val * scaling_factor
+
+        # If Total Fixed Assets - Net not found, calculate from PPE + Intangibles
+        if 'Total Fixed Assets - Net' not in year_data or year_data.get('Total Fixed Assets - Net') is None:
+            ppe = lookup_label_index(bs_index, 'PPE Net', year_col)
+            intangibles = lookup_label_index(bs_index, 'Intangible Assets Net', year_col)
+
+            fixed_assets_total = 0
+            if ppe is not None:
+                fixed_assets_total += ppe
+            if intangibles is not None:
+                fixed_assets_total += intangibles
+
+            if fixed_assets_total > 0:
+                year_data['Total Fixed Assets - Net'] = fixed_assets_total * scaling_factor
+
+    # Extract from Income Statement
+    if is_index is not None:
+        for field in ['Revenue', 'Net Income after Tax', 'Income before Taxes',
+                     'EBIT', 'Interest Expense']:
+            val = lookup_label_index(is_index, field, year_col)
+            if val is not None:
+                year_data[field] = val * scaling_factor
+    elif bs_index is not None:
+        # Try to get from Balance Sheet file if Income Statement not found
+        for field in ['Revenue', 'Net Income after Tax', 'Income before Taxes',
+                     'EBIT', 'Interest Expense']:
+            val = lookup_label_index(bs_index, field, year_col)
+            if val is not None:
+                year_data[field] = val * scaling_factor
+
+    # EBIT: Use extracted value if available
+    # Only calculate from formula if EBIT was not extracted
+    if not year_data.get('EBIT'):
+        income_before_taxes = year_data.get('Income before Taxes', 0)
+        interest_expense = year_data.get('Interest Expense', 0)
+        if income_before_taxes and interest_expense:
+            year_data['EBIT'] = income_before_taxes + interest_expense
+
+    return year_data
+
+def process_cf_export_sheets(df_bs, df_is, results, year_cache=None, header=None):
+    """
+    Extract per-year fields from CF-Export balance sheet / income statement
+    frames into results. header (cf_export_header) is read from df_bs if not given.
+    """
+    header = header or cf_export_header(df_bs)
+    results['company_info']['name'] = header['company_name']
+    scaling_factor = header['scaling_factor']
+    year_cols = header['year_cols']
+
+    results['years'] = sorted(year_cols.keys())
+
+    # Index each sheet's labels once for all years
+    bs_index = build_label_index(df_bs, FCC_MAPPING, 'cf_export')
+    is_index = build_label_index(df_is, FCC_MAPPING, 'cf_export') if df_is is not None else None
+
+    # Extract data for each year, reusing years whose inputs are unchanged
+    context = extraction_context('cf_export', scaling_factor, [bs_index, is_index]) if year_cache is not None else None
+    for year in results['years']:
+        results['data'][year] = extract_year_cached(
+            year_cache, context, [bs_index, is_index], year_cols[year],
+            lambda year_col: extract_cf_export_year(bs_index, is_index, year_col, scaling_factor)
+        )
+
+@timed('extract.vietnamese_sheets')
+def extract_vietnamese_year(bs_index, is_index, year_col, scaling_factor):
+    """Fields of one year (sheet column year_col) of a Vietnamese BCTC workbook"""
+    year_data = {}
+
+    # Extract from Balance Sheet
+    if bs_index is not None:
+        for field in ['Total Assets', 'Total Current Assets', 'Total Current Liabilities',
+                     'Total Liabilities', 'Total Fixed Assets - Net', 'Shareholders Equity',
+                     'Retained Earnings']:
+            val = lookup_label_index(bs_index, field, year_col)
+            if val is not None:
+                year_data[field] = val * scaling_factor
+
+        # If Total Fixed Assets - Net not found, calculate from components
+        # Formula: TSCĐ = TSCĐ hữu hình + TSCĐ thuê tài chính + TSCĐ vô hình
+        if 'Total Fixed Assets - Net' not in year_data or year_data.get('Total Fixed Assets - Net') is None:
+            tangible = lookup_label_index(bs_index, 'Tangible Fixed Assets Net', year_col)
+            leased = lookup_label_index(bs_index, 'Leased Fixed Assets Net', year_col)
+            intangible = lookup_label_index(bs_index, 'Intangible Fixed Assets Net', year_col)
+
+            # Sum up components (treat None as 0)
+            fixed_assets_total = 0
+            if tangible is not None:
+                fixed_assets_total += tangible
+            if leased is not None:
+                fixed_assets_total += leased
+            if intangible is not None:
+                fixed_assets_total += intangible
+
+            if fixed_assets_total > 0:
+                year_data['Total Fixed Assets - Net'] = fixed_assets_total * scaling_factor
+
+    # Extract from Income Statement
+    if is_index is not None:
+        for field in ['Revenue', 'Net Income after Tax', 'Income before Taxes',
+                     'EBIT', 'Interest Expense', 'Financial Expenses', 'Financial Revenue']:
+            val = lookup_label_index(is_index, field, year_col)
+            if val is not None:
+                year_data[field] = val * scaling_factor
+    else:
+        # Try extracting from Balance Sheet file (some files have all data in one sheet)
+        for field in ['Revenue', 'Net Income after Tax', 'Income before Taxes',
+                     'EBIT', 'Interest Expense', 'Financial Expenses', 'Financial Revenue']:
+            if field not in year_data:
+                val = lookup_label_index(bs_index, field, year_col)
+                if val is not None:
+                    year_data[field] = val * scaling_factor
+
+    # Interest Expense: Use extracted "Chi phí lãi vay" directly
+    # Only calculate from Financial Expenses - Financial Revenue if not available
+    if not year_data.get('Interest Expense'):
+        financial_expenses = year_data.get('Financial Expenses', 0)
+        financial_revenue = year_data.get('Financial Revenue', 0)
+        if financial_expenses:
+            year_data['Interest Expense'] = financial_expenses - (financial_revenue or 0)
+
+    # EBIT: Use extracted "Lợi nhuận thuần từ HĐKD" directly
+    # Only calculate from formula if EBIT was not extracted
+    if not year_data.get('EBIT'):
+        income_before_taxes = year_data.get('Income before Taxes', 0)
+        interest_expense = year_data.get('Interest Expense', 0)
+        if income_before_taxes and interest_expense:
+            year_data['EBIT'] = income_before_taxes + interest_expense
+
+    return year_data
+
+def process_vietnamese_sheets(df_bs, df_is, results, year_cache=None, header=None):
+    """
+    Extract per-year fields from Vietnamese BCTC balance sheet / income
+    statement frames into results. header (vietnamese_header) is read from
+    df_bs if not given.
+    """
+    header = header or vietnamese_header(df_bs)
+    if header['company_name'] is not None:
+        results['company_info']['name'] = header['company_name']
+    scaling_factor = header['scaling_factor']
+    year_cols = header['year_cols']
+
+    years = sorted(year_cols)
+    results['years'] = years
+
+    # Index each sheet's labels once for all years
+    bs_index = build_label_index(df_bs, VN_MAPPING, 'vietnamese')
+    is_index = build_label_index(df_is, VN_MAPPING, 'vietnamese') if df_is is not None else None
+
+    # Extract data for each year, reusing years whose inputs are unchanged
+    context = extraction_context('vietnamese', scaling_factor, [bs_index, is_index]) if year_cache is not None else None
+    for year in years:
+        year_col = year_cols.get(year, None)
+        if year_col is None:
+            continue
+        results['data'][year] = extract_year_cached(
+            year_cache, context, [bs_index, is_index], year_col,
+            lambda year_col: extract_vietnamese_year(bs_index, is_index, year_col, scaling_factor)
+        )
+
+@timed('extract.process_uploaded_file')
+def process_uploaded_file(uploaded_file, year_cache=None):
+    """
+    Process uploaded Excel file and extract financial data. With a year_cache
+    (BoundedCache), years whose column content was extracted before are reused.
+    """
+    results = {
+        'success': False,
+        'data': {},
+        'years': [],
+        'missing_fields': [],
+        'company_info': {
+            'name': 'Unknown Company',
+            'file_name': uploaded_file.name if hasattr(uploaded_file, 'name') else 'Unknown'
+        },
+        'errors': []
+    }
+
+    try:
+        # Read the workbook once, parsing only the statement sheets, and only if their header has a year row
+        workbook = load_statement_workbook(uploaded_file)
+        header = workbook['header']
+        if not has_year_row(header):
+            raise ValueError(f"No year row found in the first {SNIFF_ROWS} rows of sheet "
+                             f"'{workbook['balance_sheet_name']}'")
+        df_bs = workbook['balance_sheet']
+        df_is = workbook['income_statement']
+
+        if workbook['format'] == 'cf_export':
+            process_cf_export_sheets(df_bs, df_is, results, year_cache, header)
+        else:
+            process_vietnamese_sheets(df_bs, df_is, results, year_cache, header)
+
+        # Check for missing required fields
+        if results['years']:
+            latest_year = max(results['years'])
+            latest_data = results['data'].get(latest_year, {})
+            for field in REQUIRED_FIELDS:
+                if field not in latest_data or latest_data[field] is None:
+                    results['missing_fields'].append(field)
+
+        results['success'] = len(results['missing_fields']) < len(REQUIRED_FIELDS) / 2
+
+    except Exception as e:
+        results['errors'].append(str(e))
+        results['success'] = False
+
+    return results
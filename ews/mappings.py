@@ -0,0 +1,84 @@
+"""Statement line mappings for CF-Export (FCC codes) and Vietnamese BCTC workbooks"""
+
+import hashlib
+
+# Mapping for CF-Export format (FCC codes) - Based on CF-Export-07-01-2026 (6) (1).xlsx
+# NOTE: CF-Export files have Scaling=Thousands, values need to be multiplied by 1000
+FCC_MAPPING = {
+    # Balance Sheet
+    'Total Assets': ['ATOT', 'Total Assets'],
+    'Total Current Assets': ['STCA', 'Total Current Assets'],
+    'Total Current Liabilities': ['SCLT', 'Total Current Liabilities'],
+    'Total Liabilities': ['STLB', 'Total Liabilities'],
+    'Total Fixed Assets - Net': ['STNCA', 'Total Fixed Assets - Net'],
+    'PPE Net': ['SPPE', 'Property, Plant & Equipment - Net - Total'],
+    'Intangible Assets Net': ['SINN', 'Intangible Assets - Total - Net'],
+    'Shareholders Equity': ['QTEP', "Shareholders' Equity - Attributable to Parent ShHold - Total",
+                           "Shareholders' Equity - Attributable to Parent Shareholders - Total"],
+    'Total Equity': ['STLE', "Total Shareholders' Equity - including Minority Interest & Hybrid Debt"],
+    'Retained Earnings': ['SRED', 'Retained Earnings - Total'],
+    # Income Statement
+    'Revenue': ['STLR', 'Revenue from Business Activities - Total'],
+    'Net Income after Tax': ['SIAT', 'Net Income after Tax'],
+    'Income before Taxes': ['SIBT', 'Income before Taxes'],
+    'EBIT': ['SEBIT', 'Earnings before Interest & Taxes (EBIT)'],
+    # Interest Expense - Net of (Interest Income) = SNII
+    'Interest Expense': ['SNII', 'Interest Expense - Net of (Interest Income)']
+}
+
+# Mapping for Vietnamese BCTC format - Based on TLG financial statement format
+# NOTE: Vietnamese BCTC files typically use "Nghìn đồng" (thousands) as unit
+VN_MAPPING = {
+    # Balance Sheet (Cân đối kế toán)
+    'Total Assets': ['TỔNG TÀI SẢN', 'TỔNG CỘNG TÀI SẢN', 'Tổng cộng tài sản', 'Tổng tài sản'],
+    'Total Current Assets': ['A. TÀI SẢN NGẮN HẠN', 'TÀI SẢN NGẮN HẠN', 'A. Tài sản ngắn hạn', 'Tài sản ngắn hạn'],
+    'Total Current Liabilities': ['I. Nợ ngắn hạn', 'Nợ ngắn hạn', 'NỢ NGẮN HẠN'],
+    'Total Liabilities': ['C. NỢ PHẢI TRẢ', 'NỢ PHẢI TRẢ', 'C. Nợ phải trả', 'Nợ phải trả', 'Tổng nợ phải trả'],
+    'Total Fixed Assets - Net': ['II. Tài sản cố định', 'Tài sản cố định', 'TÀI SẢN CỐ ĐỊNH'],
+    'Shareholders Equity': ['D. VỐN CHỦ SỞ HỮU', 'VỐN CHỦ SỞ HỮU', 'D. Vốn chủ sở hữu', 'Vốn chủ sở hữu', 'I. Vốn chủ sở hữu'],
+    'Retained Earnings': ['Lợi nhuận sau thuế chưa phân phối', '11. Lợi nhuận sau thuế chưa phân phối', 'LNST chưa phân phối'],
+    # Fixed Assets components for calculation: TSCĐ = TSCĐ hữu hình + TSCĐ thuê tài chính + TSCĐ vô hình
+    'Tangible Fixed Assets Net': ['1. Tài sản cố định hữu hình', 'Tài sản cố định hữu hình', 'TSCĐ hữu hình'],
+    'Leased Fixed Assets Net': ['2. Tài sản cố định thuê tài chính', 'Tài sản cố định thuê tài chính', 'TSCĐ thuê tài chính'],
+    'Intangible Fixed Assets Net': ['3. Tài sản cố định vô hình', 'Tài sản cố định vô hình', 'TSCĐ vô hình'],
+    # Income Statement (Báo cáo thu nhập)
+    'Revenue': ['1. Doanh thu bán hàng và cung cấp dịch vụ', 'Doanh thu bán hàng và cung cấp dịch vụ', 'Doanh thu thuần', 'Doanh thu'],
+    'Net Income after Tax': ['18. Lợi nhuận sau thuế', 'Lợi nhuận sau thuế', '20. Lợi nhuận sau thuế của công ty mẹ', 'LNST'],
+    'Income before Taxes': ['15. Tổng lợi nhuận kế toán trước thuế', 'Tổng lợi nhuận kế toán trước thuế', 'Lợi nhuận trước thuế'],
+    'EBIT': ['11. Lợi nhuận thuần từ hoạt động kinh doanh', 'Lợi nhuận thuần từ hoạt động kinh doanh', 'Lợi nhuận từ HĐKD'],
+    'Interest Expense': ['- Trong đó: Chi phí lãi vay', 'Chi phí lãi vay', 'Lãi vay'],
+    # Components for Net Interest Expense calculation: Chi phí lãi vay (ròng) = Chi phí tài chính - Doanh thu tài chính
+    'Financial Expenses': ['7. Chi phí tài chính', 'Chi phí tài chính', '6. Chi phí tài chính'],
+    'Financial Revenue': ['4. Doanh thu hoạt động tài chính', 'Doanh thu hoạt động tài chính', 'Doanh thu tài chính', '3. Doanh thu hoạt động tài chính']
+}
+
+# Vietnamese sheet name mapping
+VN_SHEET_NAMES = {
+    'balance_sheet': ['Cân đối kế toán', 'CĐKT', 'Balance Sheet', 'Bảng cân đối kế toán'],
+    'income_statement': ['Báo cáo thu nhập', 'BCKQKD', 'Kết quả kinh doanh', 'Income Statement', 'Báo cáo kết quả kinh doanh']
+}
+
+# Required fields for analysis
+REQUIRED_FIELDS = [
+    'Total Assets',
+    'Total Current Assets',
+    'Total Current Liabilities',
+    'Total Liabilities',
+    'Shareholders Equity',
+    'Net Income after Tax',
+    'Revenue'
+]
+
+OPTIONAL_FIELDS = [
+    'Total Fixed Assets - Net',
+    'Retained Earnings',
+    'EBIT',
+    'Income before Taxes',
+    'Interest Expense'
+]
+
+# Fingerprint of the extraction mappings; part of every upload cache key so
+# that editing a mapping never serves results parsed with the old one
+MAPPING_VERSION = hashlib.sha256(
+    repr((FCC_MAPPING, VN_MAPPING, VN_SHEET_NAMES, REQUIRED_FIELDS)).encode('utf-8')
+).hexdigest()[:16]
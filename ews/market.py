@@ -0,0 +1,129 @@
+"""
+Market reference ratios: per-year quantiles of the panel's ratios, overall and
+broken down by size bucket or industry, computed in one grouped pass
+"""
+
+import numpy as np
+import pandas as pd
+
+from .batch import calculate_ews_batch
+from .panel import PANEL_FIELD_COLUMNS
+from .timing import timed
+
+# Ratios compared against the market, and the quantiles kept for each
+MARKET_RATIOS = ['ROA', 'CUR', 'LEV', 'FAR', 'WC_Assets']
+MARKET_QUANTILES = [0.25, 0.5, 0.75]
+
+# Size buckets: terciles of SIZE (log total assets) within each year
+SIZE_BUCKETS = ['Small', 'Mid', 'Large']
+
+# Panel column holding the industry, when the panel has one
+PANEL_INDUSTRY_COLUMN = 'Industry'
+
+# Rows of each year kept when the reference is built from a panel read in chunks
+MARKET_SAMPLE_ROWS = 50000
+
+def market_ratio_frame(df):
+    """Year, SIZE and MARKET_RATIOS (plus the industry, if any) of every panel row, from its statement columns"""
+    fields = pd.DataFrame({field: df[col] for field, col in PANEL_FIELD_COLUMNS.items()}, index=df.index)
+    scores = calculate_ews_batch(fields)
+    frame = scores[['SIZE'] + MARKET_RATIOS].copy()
+    frame.insert(0, 'Year', df['Year'].to_numpy())
+    if PANEL_INDUSTRY_COLUMN in df.columns:
+        frame[PANEL_INDUSTRY_COLUMN] = df[PANEL_INDUSTRY_COLUMN].to_numpy()
+    return frame
+
+def sample_market_ratios(chunks, rows_per_year=MARKET_SAMPLE_ROWS, seed=0):
+    """
+    market_ratio_frame of a panel read in chunks, keeping at most
+    rows_per_year rows of each year: all of them for smaller years, a uniform
+    random sample (the rows_per_year smallest random keys) of larger ones.
+    Memory is bounded by the number of years, not by the panel size.
+    """
+    rng = np.random.default_rng(seed)
+    kept = None
+    for chunk in chunks:
+        frame = market_ratio_frame(chunk)
+        frame['_key'] = rng.random(len(frame))
+        kept = frame if kept is None else pd.concat([kept, frame], ignore_index=True)
+        if kept['Year'].value_counts().max() > rows_per_year:
+            kept = kept.sort_values(['Year', '_key'], kind='stable')
+            kept = kept[kept.groupby('Year').cumcount() < rows_per_year].reset_index(drop=True)
+    if kept is None:
+        return pd.DataFrame(columns=['Year', 'SIZE'] + MARKET_RATIOS)
+    return kept.drop(columns='_key')
+
+def size_bucket_edges(frame):
+    """Year -> SIZE tercile edges of that year's rows"""
+    edges = frame.groupby('Year')['SIZE'].quantile([1 / 3, 2 / 3]).unstack()
+    return {int(year): row.tolist() for year, row in edges.iterrows()}
+
+def size_bucket(size, edges):
+    """SIZE_BUCKETS label of a SIZE value against one year's edges"""
+    return SIZE_BUCKETS[int(np.searchsorted(edges, size, side='right'))]
+
+def grouped_quantiles(frame, keys):
+    """MARKET_QUANTILES of MARKET_RATIOS per group of `keys`, with the group sizes, in one groupby pass"""
+    grouped = frame.groupby(keys, observed=True)
+    quantiles = grouped[MARKET_RATIOS].quantile(MARKET_QUANTILES)
+    quantiles.index = quantiles.index.set_names(keys + ['quantile'])
+    return {'quantiles': quantiles, 'counts': grouped.size()}
+
+def build_market_reference(df):
+    """Market reference (see market_reference_from_ratios) of a panel with its statement columns"""
+    return market_reference_from_ratios(market_ratio_frame(df))
+
+@timed('market.reference')
+def market_reference_from_ratios(frame):
+    """
+    Market reference of a market_ratio_frame: per-year ratio quantiles overall
+    ('all'), per size bucket ('size') and per industry ('industry', None
+    without an industry column), and the size bucket edges
+    """
+    frame = frame.copy()
+    edges = size_bucket_edges(frame)
+    # Same rule as size_bucket: the number of the year's edges at or below SIZE
+    size = frame['SIZE']
+    codes = ((size >= frame['Year'].map({y: e[0] for y, e in edges.items()})).astype(np.int8)
+             + (size >= frame['Year'].map({y: e[1] for y, e in edges.items()})).astype(np.int8))
+    frame['size_bucket'] = pd.Categorical.from_codes(codes.where(size.notna(), -1), categories=SIZE_BUCKETS)
+
+    reference = {
+        'all': grouped_quantiles(frame, ['Year']),
+        'size': grouped_quantiles(frame, ['Year', 'size_bucket']),
+        'industry': None,
+        'size_edges': edges,
+        'years': sorted(int(y) for y in frame['Year'].unique())
+    }
+    if PANEL_INDUSTRY_COLUMN in frame.columns:
+        reference['industry'] = grouped_quantiles(frame, ['Year', PANEL_INDUSTRY_COLUMN])
+    return reference
+
+def market_quantiles(reference, year, quantile=0.5, size=None, industry=None):
+    """
+    Ratio -> market quantile for one year (the median by default), among
+    companies of the same size bucket as SIZE `size`, or of `industry`, if
+    given. Empty when the reference has no such group.
+    """
+    if reference is None:
+        return {}
+    if industry is not None:
+        if reference['industry'] is None:
+            return {}
+        breakdown, key = reference['industry'], (year, industry, quantile)
+    elif size is not None:
+        if year not in reference['size_edges']:
+            return {}
+        breakdown, key = reference['size'], (year, size_bucket(size, reference['size_edges'][year]), quantile)
+    else:
+        breakdown, key = reference['all'], (year, quantile)
+
+    quantiles = breakdown['quantiles']
+    if key not in quantiles.index:
+        return {}
+    row = quantiles.loc[key]
+    return {ratio: float(row[ratio]) for ratio in MARKET_RATIOS if pd.notna(row[ratio])}
+
+def market_medians(reference, year, size=None, industry=None):
+    """Ratio -> market median for one year, overall or within a size bucket or industry"""
+    return market_quantiles(reference, year, 0.5, size, industry)
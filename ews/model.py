@@ -0,0 +1,321 @@
+"""Financial ratios, risk models (Altman Z, S-Score) and EWS signals for one firm-year"""
+
+import numpy as np
+
+from .timing import timed
+
+# -----------------------------------------
+# FINANCIAL RATIO CALCULATIONS
+# -----------------------------------------
+
+@timed('model.ratios')
+def calculate_financial_ratios(data):
+    """Calculate financial ratios from extracted data"""
+    ratios = {}
+
+    # Get values with defaults
+    total_assets = data.get('Total Assets', 0)
+    current_assets = data.get('Total Current Assets', 0)
+    current_liabilities = data.get('Total Current Liabilities', 0)
+    total_liabilities = data.get('Total Liabilities', 0)
+    fixed_assets = data.get('Total Fixed Assets - Net', 0)
+    equity = data.get('Shareholders Equity', 0)
+    retained_earnings = data.get('Retained Earnings', 0)
+    net_income = data.get('Net Income after Tax', 0)
+    ebit = data.get('EBIT', 0)
+    revenue = data.get('Revenue', 0)
+    interest_expense = data.get('Interest Expense', 0)
+
+    # Avoid division by zero
+    if total_assets > 0:
+        ratios['ROA'] = net_income / total_assets
+        ratios['LEV'] = total_liabilities / total_assets
+        ratios['FAR'] = fixed_assets / total_assets if fixed_assets else 0
+        ratios['SIZE'] = np.log(total_assets)
+        ratios['Retained_Earnings_to_Assets'] = retained_earnings / total_assets if retained_earnings else 0
+        ratios['WC_Assets'] = (current_assets - current_liabilities) / total_assets
+        ratios['Equity_to_Assets'] = equity / total_assets if equity else 0
+
+    if current_liabilities > 0:
+        ratios['CUR'] = current_assets / current_liabilities
+    else:
+        ratios['CUR'] = 0
+
+    if revenue > 0:
+        ratios['Net_Profit_Margin'] = net_income / revenue
+        ratios['EBIT_Margin'] = ebit / revenue if ebit else 0
+
+    if total_liabilities > 0:
+        ratios['Equity_to_Debt'] = equity / total_liabilities if equity else 0
+
+    if interest_expense and interest_expense > 0:
+        ratios['EBIT_to_Interest'] = ebit / interest_expense if ebit else 0
+        ratios['Interest_Coverage'] = ebit / interest_expense if ebit else 0
+    else:
+        ratios['EBIT_to_Interest'] = None
+        ratios['Interest_Coverage'] = None
+
+    return ratios
+
+# -----------------------------------------
+# FINANCIAL RISK MODELS
+# -----------------------------------------
+
+@timed('model.altman_z')
+def calculate_altman_z_score(data, ratios):
+    """
+    Calculate Altman Z''-Score for non-manufacturing/emerging market firms
+    Z'' = 6.56*X1 + 3.26*X2 + 6.72*X3 + 1.05*X4
+    """
+    total_assets = data.get('Total Assets', 0)
+    current_assets = data.get('Total Current Assets', 0)
+    current_liabilities = data.get('Total Current Liabilities', 0)
+    retained_earnings = data.get('Retained Earnings', 0)
+    ebit = data.get('EBIT', 0)
+    equity = data.get('Shareholders Equity', 0)
+    total_liabilities = data.get('Total Liabilities', 0)
+
+    if total_assets <= 0:
+        return None, "N/A"
+
+    # X1 = Working Capital / Total Assets
+    X1 = (current_assets - current_liabilities) / total_assets
+
+    # X2 = Retained Earnings / Total Assets
+    X2 = retained_earnings / total_assets if retained_earnings else 0
+
+    # X3 = EBIT / Total Assets
+    X3 = ebit / total_assets if ebit else ratios.get('ROA', 0)
+
+    # X4 = Book Value of Equity / Total Liabilities
+    X4 = equity / total_liabilities if total_liabilities > 0 and equity else 0
+
+    # Z'' Score
+    z_score = 6.56 * X1 + 3.26 * X2 + 6.72 * X3 + 1.05 * X4
+
+    # Interpretation
+    if z_score > 2.6:
+        zone = "Safe Zone"
+    elif z_score > 1.1:
+        zone = "Grey Zone"
+    else:
+        zone = "High Risk Zone"
+
+    return z_score, zone
+
+@timed('model.s_score')
+def calculate_s_score(data, _ratios=None):
+    """
+    Calculate S-Score using Springate (1978) model
+    S = 1.03*A + 3.07*B + 0.66*C + 0.40*D
+    A = Working Capital / Total Assets
+    B = EBIT / Total Assets
+    C = Income before Taxes / Total Current Liabilities
+    D = Revenue / Total Assets
+    Cutoff: S < 0.862 => High Risk
+    """
+    total_assets = data.get('Total Assets', 0)
+    total_current_assets = data.get('Total Current Assets', 0)
+    total_current_liabilities = data.get('Total Current Liabilities', 0)
+    ebit = data.get('EBIT', 0)
+    income_before_taxes = data.get('Income before Taxes', 0)
+    revenue = data.get('Revenue', 0)
+
+    if total_assets == 0 or total_current_liabilities == 0:
+        return None, "N/A"
+
+    a = (total_current_assets - total_current_liabilities) / total_assets
+    b = ebit / total_assets
+    c = income_before_taxes / total_current_liabilities
+    d = revenue / total_assets
+
+    s_score = 1.03 * a + 3.07 * b + 0.66 * c + 0.40 * d
+
+    # Interpretation (Springate cutoff = 0.862)
+    if s_score >= 0.862:
+        zone = "Safe"
+    else:
+        zone = "High Risk"
+
+    return s_score, zone
+
+@timed('model.ews_signals')
+def calculate_ews_signals(data, ratios):
+    """Calculate Early Warning System signals"""
+    signals = {
+        'signal_ebit': 0,
+        'signal_z': 0,
+        'signal_s': 0,
+        'n_signals': 0,
+        'ews_level': 'Safe',
+        'drivers': []
+    }
+
+    # Signal 1: EBIT < Interest Expense
+    ebit = data.get('EBIT', 0)
+    interest = data.get('Interest Expense', 0)
+    if interest and interest > 0 and ebit:
+        if ebit < interest:
+            signals['signal_ebit'] = 1
+            signals['drivers'].append("EBIT lower than Interest Expense - Weak interest coverage")
+
+    # Signal 2: Z-Score
+    z_score, z_zone = calculate_altman_z_score(data, ratios)
+    if z_score is not None and z_zone == "High Risk Zone":
+        signals['signal_z'] = 1
+        signals['drivers'].append(f"Altman Z-Score = {z_score:.2f} - High risk zone")
+
+    # Signal 3: S-Score (Springate 1978, cutoff = 0.862)
+    s_score, s_zone = calculate_s_score(data, ratios)
+    if s_score is not None and s_score < 0.862:
+        signals['signal_s'] = 1
+        signals['drivers'].append(f"S-Score = {s_score:.2f} - High risk")
+
+    # Additional warning signals
+    # Low Current Ratio
+    if ratios.get('CUR', 0) < 1:
+        signals['drivers'].append(f"Current Ratio = {ratios.get('CUR', 0):.2f} < 1 - Liquidity risk")
+
+    # High Leverage
+    if ratios.get('LEV', 0) > 0.7:
+        signals['drivers'].append(f"Leverage = {ratios.get('LEV', 0):.2%} > 70% - High debt risk")
+
+    # Negative ROA
+    if ratios.get('ROA', 0) < 0:
+        signals['drivers'].append(f"ROA = {ratios.get('ROA', 0):.2%} < 0 - Operating loss")
+
+    # Count signals
+    signals['n_signals'] = signals['signal_ebit'] + signals['signal_z'] + signals['signal_s']
+
+    # Determine EWS Level
+    if signals['n_signals'] == 0:
+        signals['ews_level'] = 'Safe'
+    elif signals['n_signals'] == 1:
+        signals['ews_level'] = 'Watchlist'
+    else:
+        signals['ews_level'] = 'High Risk'
+
+    return signals
+
+# -----------------------------------------
+# RECOMMENDATIONS
+# -----------------------------------------
+
+# EWS levels in display order
+EWS_LEVELS = ['Safe', 'Watchlist', 'High Risk']
+
+def generate_recommendations(signals, ratios, data):
+    """Generate management recommendations based on analysis"""
+    recommendations = []
+
+    ews_level = signals.get('ews_level', 'Safe')
+
+    if ews_level == 'Safe':
+        recommendations.append("Financial condition is stable. Continue maintaining current indicators.")
+        recommendations.append("Investment opportunities may be considered, subject to further strategic evaluation.")
+
+    elif ews_level == 'Watchlist':
+        recommendations.append("Close monitoring of financial indicators in subsequent periods is required.")
+
+        if signals.get('signal_ebit') == 1:
+            recommendations.append("Improve operating profit margin to enhance interest coverage.")
+
+        if ratios.get('CUR', 0) < 1.2:
+            recommendations.append("Strengthen working capital management to ensure liquidity.")
+
+        if ratios.get('LEV', 0) > 0.6:
+            recommendations.append("Consider debt restructuring or increasing equity capital.")
+
+    else:  # High Risk
+        recommendations.append("WARNING: The company shows strong signs of financial high risk.")
+        recommendations.append("Urgent action is required:")
+
+        if signals.get('signal_ebit') == 1:
+            recommendations.append("- Renegotiate debt terms with creditors.")
+            recommendations.append("- Cut unnecessary operating expenses.")
+
+        if signals.get('signal_z') == 1:
+            recommendations.append("- Consider selling non-performing assets.")
+            recommendations.append("- Seek additional capital from shareholders.")
+
+        if ratios.get('CUR', 0) < 0.8:
+            recommendations.append("- Prioritize settlement of maturing short-term debts.")
+
+        recommendations.append("- Engage restructuring consultants if necessary.")
+
+    return recommendations
+
+@timed('model.executive_summary')
+def generate_executive_summary(signals, ratios, num_years, all_data, selected_year, scores=None):
+    """
+    Generate Executive Summary based on EWS level and number of years
+    Answers 3 questions:
+    1. Current situation?
+    2. Main causes?
+    3. What should user do next?
+    `scores` is the build_scoring_table result for all_data, built if not given.
+    """
+    ews_level = signals['ews_level']
+    n_signals = signals['n_signals']
+
+    # Check for worsening trend if multiple years
+    worsening_trend = False
+    if num_years > 1:
+        years_sorted = sorted(all_data.keys())
+        if len(years_sorted) >= 2:
+            if scores is None:
+                from .batch import build_scoring_table
+                scores = build_scoring_table(all_data)
+            prev_year = years_sorted[-2]
+            if signals['n_signals'] > scores.loc[prev_year, 'n_signals']:
+                worsening_trend = True
+
+    # Template selection based on EWS level
+    if ews_level == 'Safe':
+        if num_years == 1:
+            summary = (
+                "Based on the uploaded financial statements, the firm is currently classified as <strong>financially stable</strong>. "
+                "No major financial risk signals are triggered in the reporting period. "
+                "Key profitability and liquidity indicators remain within acceptable ranges. "
+                "However, regular monitoring is recommended to ensure that any potential deterioration in operating performance is detected early."
+            )
+        else:
+            summary = (
+                "Based on the uploaded financial statements, the firm is currently assessed as <strong>financially stable</strong> based on the early warning signals. "
+                "While no immediate financial risk is identified in the most recent year, certain financial indicators show signs of fluctuation over time. "
+                "Continued monitoring of profitability and liquidity trends is recommended to prevent potential risk accumulation."
+            )
+
+    elif ews_level == 'Watchlist':
+        if worsening_trend and num_years > 1:
+            # Template 3: Watchlist + Worsening trend
+            summary = (
+                "The firm is currently classified as <strong>Watchlist</strong> based on the uploaded financial statements. "
+                "Although the firm has not entered financial high risk, the number of warning signals has increased compared to the previous period. "
+                "This suggests a deterioration in financial conditions, and proactive risk management actions are advised, "
+                "particularly in areas showing declining performance."
+            )
+        else:
+            # Template 2: Standard Watchlist
+            summary = (
+                "Based on the uploaded financial statements, the firm is classified under the <strong>Watchlist</strong> category. "
+                "One or more early warning signals are triggered, indicating potential weaknesses in profitability or liquidity. "
+                "While no immediate financial risk is identified, closer monitoring of key financial indicators is recommended "
+                "to prevent further risk escalation."
+            )
+
+    else:  # High Risk
+        # Template 4: High Risk
+        summary = (
+            "The analysis of the uploaded financial statements indicates that the firm exhibits multiple <strong>financial high risk</strong> warning signals. "
+            "Multiple financial indicators exceed risk thresholds, reflecting pressure on profitability, liquidity, or capital structure. "
+            "Immediate attention and corrective actions are recommended to mitigate financial risk and stabilize operations."
+        )
+
+    # Add specific drivers if any
+    if signals['drivers']:
+        main_drivers = signals['drivers'][:2]  # Top 2 drivers
+        drivers_text = " The primary concerns include: " + "; ".join(main_drivers) + "."
+        summary += drivers_text
+
+    return summary
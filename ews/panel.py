@@ -0,0 +1,313 @@
+"""Scored EWS panel (05_ews_application.csv): schema, columnar store, index and portfolio cube"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .batch import calculate_ews_batch
+from .model import EWS_LEVELS
+from .timing import timed
+
+# Column of the scored panel (05_ews_application.csv) holding each model field
+PANEL_FIELD_COLUMNS = {
+    'Total Assets': 'Total Assets',
+    'Total Current Assets': 'Total Current Assets',
+    'Total Current Liabilities': 'Total Current Liabilities',
+    'Total Liabilities': 'Total Liabilities',
+    'Shareholders Equity': "Shareholders' Equity - Attributable to Parent ShHold - Total",
+    'Net Income after Tax': 'Net Income after Tax',
+    'Revenue': 'Revenue from Business Activities - Total',
+    'Total Fixed Assets - Net': 'Total Fixed Assets - Net',
+    'Retained Earnings': 'Retained Earnings',
+    'EBIT': 'Earnings before Interest & Taxes (EBIT)',
+    'Income before Taxes': 'Income before Taxes',
+    'Interest Expense': 'Interest Expense - Net of (Interest Income)'
+}
+
+# Model output columns refreshed when scoring the panel
+PANEL_MODEL_COLUMNS = ['SIZE', 'ROA', 'CUR', 'LEV', 'FAR', 'signal_ebit', 'Z_Score', 'signal_z',
+                       'S_Score', 'signal_s', 'n_signals', 'ews_level']
+
+# Financial statement columns of 05_ews_application.csv, in file order
+PANEL_STATEMENT_COLUMNS = [
+    'Income before Taxes to EBIT', 'Capital Expenditures - Total', 'Cost of Revenues - Total',
+    'Intangible Assets - Total - Net', 'EBITDA Margin - %', 'Net Cash Flow from Investing Activities',
+    'Total Non-Current Liabilities', 'Net Cash Flow from Financing Activities', 'Depreciation - Total',
+    'Cash & Cash Equivalents - Total', 'Total Liabilities & Equity', 'Debt - Long-Term - Total', 'Debt - Total',
+    'Earnings before Interest Taxes Depreciation & Amortization',
+    'Earnings before Interest Tax Depr & Amort & Optg Lease Pymt',
+    'Depreciation & Depletion - PPE - CF - to Reconcile',
+    "Shareholders' Equity - Attributable to Parent ShHold - Total", 'Total Liabilities',
+    'Gross Profit - Industrials/Property - Total', 'Income before Taxes', 'Net Cash Flow from Operating Activities',
+    'Cash Flow from Operating Actvs bef Changes in Working Cap', 'Retained Earnings - Total',
+    'Short-Term Investments - Total', 'Cash & Cash Equivalents', 'Cash & Short Term Investments',
+    'Inventories - Total', "Total Shareholders' Equity incl Minority Intr & Hybrid Debt", 'Total Current Assets',
+    'Loans & Receivables - Net - Short-Term', 'Retained Earnings', 'Interest Expense - Net of (Interest Income)',
+    'Earnings before Interest & Taxes (EBIT)', 'Gross Revenue from Business Activities - Total',
+    'Revenue from Business Activities - Total', 'Net Income after Tax', 'Total Assets', 'Total Fixed Assets - Net',
+    'Receivables & Loans - Long-Term', 'Total Current Liabilities'
+]
+# Columns derived from the previous years of each company
+PANEL_HISTORY_COLUMNS = [
+    'n_signals_lag1', 'n_signals_lag2', 'signal_ebit_lag1', 'signal_ebit_lag2', 'signal_z_lag1', 'signal_z_lag2',
+    'signal_s_lag1', 'signal_s_lag2', 'early_warning_flag', 'current_high_risk', 'risk_trend', 'recommendation',
+    'priority_flag'
+]
+# Full panel layout, as written by the batch scoring CLI
+PANEL_SCHEMA = (['Name', 'Date'] + PANEL_STATEMENT_COLUMNS + ['Year'] + PANEL_MODEL_COLUMNS
+                + PANEL_HISTORY_COLUMNS)
+
+# Panel recommendation per ews_level; Watchlist firms whose signal count rose get the stronger one
+PANEL_RECOMMENDATIONS = {
+    'Safe': "Financially stable",
+    'Watchlist': "Monitor",
+    'High Risk': "High risk – immediate review required"
+}
+PANEL_RECOMMENDATION_WORSENING = "Monitor closely – risk increasing"
+
+PANEL_CSV_PATH = "05_ews_application.csv"
+PANEL_STORE_PATH = "05_ews_application.parquet"
+
+# Typed layout of the panel in the columnar store
+PANEL_CATEGORY_COLUMNS = ['Name', 'ews_level', 'risk_trend', 'recommendation']
+PANEL_INT8_COLUMNS = ['signal_ebit', 'signal_z', 'signal_s', 'n_signals',
+                      'early_warning_flag', 'current_high_risk', 'priority_flag']
+PANEL_NULLABLE_INT8_COLUMNS = ['n_signals_lag1', 'n_signals_lag2', 'signal_ebit_lag1', 'signal_ebit_lag2',
+                               'signal_z_lag1', 'signal_z_lag2', 'signal_s_lag1', 'signal_s_lag2']
+
+# Columns the CSV mode reads from the panel
+PANEL_COLUMNS = ['Name', 'Year'] + list(PANEL_FIELD_COLUMNS.values())
+
+def apply_panel_dtypes(df):
+    """Cast panel columns to their compact store types (categoricals, int8, int16 Year)"""
+    df = df.copy()
+    for col in PANEL_CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in PANEL_INT8_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(np.int8)
+    for col in PANEL_NULLABLE_INT8_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('Int8')
+    if 'Year' in df.columns:
+        df['Year'] = df['Year'].astype(np.int16)
+    return df
+
+def build_panel_store(csv_path=PANEL_CSV_PATH, store_path=PANEL_STORE_PATH):
+    """Convert the panel CSV into a typed Parquet file"""
+    df = apply_panel_dtypes(pd.read_csv(csv_path))
+    df.to_parquet(store_path, index=False)
+    return store_path
+
+def panel_store_is_fresh(csv_path=PANEL_CSV_PATH, store_path=PANEL_STORE_PATH):
+    """True if the Parquet store exists and is not older than the CSV"""
+    if not os.path.exists(store_path):
+        return False
+    return not os.path.exists(csv_path) or os.path.getmtime(store_path) >= os.path.getmtime(csv_path)
+
+@timed('panel.load')
+def load_panel(columns=None, csv_path=PANEL_CSV_PATH, store_path=PANEL_STORE_PATH):
+    """
+    Read the panel (only `columns` if given) from the Parquet store, building
+    the store first when it is missing or stale. Falls back to the CSV when
+    the store cannot be built or read.
+    """
+    if not panel_store_is_fresh(csv_path, store_path) and os.path.exists(csv_path):
+        try:
+            build_panel_store(csv_path, store_path)
+        except (OSError, ImportError, ValueError):
+            pass
+
+    if panel_store_is_fresh(csv_path, store_path):
+        try:
+            return pd.read_parquet(store_path, columns=columns)
+        except (OSError, ImportError, ValueError):
+            pass
+
+    return apply_panel_dtypes(pd.read_csv(csv_path, usecols=columns))
+
+def panel_version(csv_path=PANEL_CSV_PATH, store_path=PANEL_STORE_PATH):
+    """Version tag (size and mtime) of the panel source: the CSV, or the store when there is no CSV"""
+    for path in [csv_path, store_path]:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    raise FileNotFoundError(csv_path)
+
+@timed('panel.score')
+def score_ews_panel(df):
+    """
+    Recompute the model columns of the EWS panel from its financial statement
+    columns. On the shipped panel the signals and EWS levels come out equal,
+    and the ratios and scores equal up to floating-point rounding (a few ULP).
+    """
+    fields = pd.DataFrame({field: df[col] for field, col in PANEL_FIELD_COLUMNS.items()}, index=df.index)
+    scores = calculate_ews_batch(fields)
+    df = df.copy()
+    for col in PANEL_MODEL_COLUMNS:
+        df[col] = scores[col]
+    return apply_panel_dtypes(df)
+
+def panel_sort_order(df):
+    """
+    Row positions that sort the panel by Name and Year (stable), and for each
+    sorted row whether the row `lag` places above belongs to the same company,
+    for lag 1 and 2
+    """
+    codes, _ = pd.factorize(df['Name'])
+    order = np.lexsort((df['Year'].to_numpy(), codes))
+    sorted_codes = codes[order]
+    same_company = {}
+    for lag in [1, 2]:
+        same = np.zeros(len(order), dtype=bool)
+        same[lag:] = (sorted_codes[lag:] == sorted_codes[:-lag]) & (sorted_codes[lag:] >= 0)
+        same_company[lag] = same
+    return order, same_company
+
+def grouped_lag(values, order, same_company, lag):
+    """values of the row `lag` years earlier of the same company (NaN if none), in the panel's row order"""
+    sorted_values = np.asarray(values, dtype=float)[order]
+    lagged = np.full(len(order), np.nan)
+    lagged[lag:] = sorted_values[:-lag]
+    lagged[~same_company[lag]] = np.nan
+    out = np.empty(len(order))
+    out[order] = lagged
+    return out
+
+@timed('panel.history')
+def build_panel_history(df):
+    """
+    Derive the lag and trend columns of the panel (PANEL_HISTORY_COLUMNS) from
+    its model columns for every company at once. Lags follow the previous rows
+    of the same company in Year order, as in the published panel, whose
+    history columns this reproduces exactly.
+    """
+    df = df.copy()
+    order, same_company = panel_sort_order(df)
+    for col in ['n_signals', 'signal_ebit', 'signal_z', 'signal_s']:
+        values = df[col].to_numpy(dtype=float)
+        for lag in [1, 2]:
+            df[f'{col}_lag{lag}'] = grouped_lag(values, order, same_company, lag)
+
+    n_signals = df['n_signals'].to_numpy(dtype=float)
+    lag1 = df['n_signals_lag1'].to_numpy()
+    lag2 = df['n_signals_lag2'].to_numpy()
+    ews_level = df['ews_level'].astype(str).to_numpy()
+    worsening = n_signals > lag1
+    early_warning = (lag1 >= 1) | (lag2 >= 1)
+    high_risk = ews_level == 'High Risk'
+
+    risk_trend = np.full(len(df), np.nan, dtype=object)
+    risk_trend[worsening] = "Worsening"
+    risk_trend[n_signals < lag1] = "Improving"
+    risk_trend[n_signals == lag1] = "Stable"
+
+    recommendation = pd.Series(ews_level, index=df.index).map(PANEL_RECOMMENDATIONS).to_numpy(dtype=object)
+    recommendation[worsening & (ews_level == 'Watchlist')] = PANEL_RECOMMENDATION_WORSENING
+
+    df['early_warning_flag'] = early_warning.astype(np.int64)
+    df['current_high_risk'] = high_risk.astype(np.int64)
+    df['risk_trend'] = risk_trend
+    df['recommendation'] = recommendation
+    df['priority_flag'] = (high_risk | (worsening & early_warning)).astype(np.int64)
+    return df
+
+def build_panel_deltas(df):
+    """
+    Add the year-over-year columns of the CSV mode for every company at once:
+    EBIT_yoy (% change of EBIT, as pct_change) and signal_delta (change of
+    n_signals, as diff), against the previous row of the same company
+    """
+    df = df.copy()
+    order, same_company = panel_sort_order(df)
+
+    ebit = df[PANEL_FIELD_COLUMNS['EBIT']].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['EBIT_yoy'] = (ebit / grouped_lag(ebit, order, same_company, 1) - 1) * 100
+
+    n_signals = df['n_signals']
+    values = n_signals.to_numpy(dtype=float)
+    # Same dtype as Series.diff: float32 for small integer columns, else float64
+    delta = values - grouped_lag(values, order, same_company, 1)
+    df['signal_delta'] = delta.astype(np.result_type(n_signals.dtype, np.float32))
+    return df
+
+@timed('panel.index')
+def build_panel_index(df):
+    """
+    Sort the panel by Name/Year and index it once:
+    - 'frame': the sorted panel
+    - 'companies': sorted company names
+    - 'company_slices': Name -> (start, stop) contiguous row slice
+    - 'years': sorted distinct years
+    - 'year_order' / 'year_ranges': row positions ordered by Year, and
+      Year -> (start, stop) range into year_order
+    """
+    df = df.sort_values(['Name', 'Year'], kind='stable').reset_index(drop=True)
+
+    names = df['Name'].to_numpy()
+    if len(df):
+        boundaries = np.flatnonzero(names[1:] != names[:-1]) + 1
+        starts = np.concatenate([[0], boundaries])
+        stops = np.concatenate([boundaries, [len(df)]])
+    else:
+        starts = stops = np.array([], dtype=np.int64)
+    companies = [str(name) for name in names[starts]]
+
+    years = df['Year'].to_numpy()
+    year_order = np.argsort(years, kind='stable')
+    distinct_years, year_starts, year_counts = np.unique(years[year_order], return_index=True, return_counts=True)
+
+    return {
+        'frame': df,
+        'companies': companies,
+        'company_slices': dict(zip(companies, zip(starts.tolist(), stops.tolist()))),
+        'years': [int(y) for y in distinct_years],
+        'year_order': year_order,
+        'year_ranges': {int(y): (int(lo), int(lo + n)) for y, lo, n in zip(distinct_years, year_starts, year_counts)}
+    }
+
+def panel_company_rows(index, name):
+    """All rows of one company, ordered by Year (a slice of the indexed frame)"""
+    start, stop = index['company_slices'].get(name, (0, 0))
+    return index['frame'].iloc[start:stop]
+
+def panel_company_year(index, name, year):
+    """Rows of one company for one year"""
+    start, stop = index['company_slices'].get(name, (0, 0))
+    years = index['frame']['Year'].to_numpy()[start:stop]
+    lo, hi = np.searchsorted(years, [year, year + 1])
+    return index['frame'].iloc[start + lo:start + hi]
+
+def panel_year_rows(index, year):
+    """Rows of every company for one year"""
+    lo, hi = index['year_ranges'].get(year, (0, 0))
+    return index['frame'].iloc[index['year_order'][lo:hi]]
+
+def build_portfolio_cube(df):
+    """Firm counts per Year (rows) and ews_level (columns, EWS_LEVELS order)"""
+    return (
+        df.groupby(['Year', 'ews_level'], observed=True)
+        .size()
+        .unstack(fill_value=0)
+        .reindex(columns=EWS_LEVELS, fill_value=0)
+        .astype(np.int64)
+    )
+
+def portfolio_summary(cube, year=None):
+    """Counts per ews_level for one year, or summed over all years"""
+    if year is None:
+        return cube.sum()
+    if year not in cube.index:
+        return pd.Series(0, index=cube.columns)
+    return cube.loc[year]
+
+def portfolio_counts(cube, year=None):
+    """Long Year/ews_level/count table of the non-zero cells, for one year or all years"""
+    if year is not None:
+        cube = cube.loc[cube.index == year]
+    counts = cube.rename_axis(index='Year', columns='ews_level').stack().reset_index(name='count')
+    counts['ews_level'] = counts['ews_level'].astype(str)
+    return counts[counts['count'] > 0].sort_values(['Year', 'ews_level']).reset_index(drop=True)
@@ -0,0 +1,93 @@
+"""
+Portfolio of uploaded companies: one scored panel of every upload, with its
+EWS distribution, priority league table and peer percentiles
+"""
+
+import os
+
+from .cli import workbook_panel_rows, build_scored_panel
+from .panel import build_portfolio_cube
+
+# Columns of the league table after Name and Year
+LEAGUE_COLUMNS = ['ews_level', 'n_signals', 'priority_flag', 'risk_trend', 'Z_Score', 'S_Score', 'ROA', 'LEV', 'CUR']
+
+# Metrics ranked against the other companies of the same year
+PEER_METRICS = ['Z_Score', 'S_Score', 'ROA', 'CUR', 'LEV', 'n_signals']
+
+# Most severe first
+EWS_LEVEL_RANK = {'High Risk': 0, 'Watchlist': 1, 'Safe': 2}
+
+def portfolio_names(uploads):
+    """
+    Panel Name of each (file_name, results) upload: the company name, or the
+    file name when the company is unknown or shared with another upload
+    """
+    companies = [results['company_info'].get('name') for _, results in uploads]
+    names = []
+    for (file_name, _), company in zip(uploads, companies):
+        stem = os.path.splitext(os.path.basename(file_name))[0]
+        if not company or company == 'Unknown Company':
+            names.append(stem)
+        elif companies.count(company) > 1:
+            names.append(f"{company} ({stem})")
+        else:
+            names.append(company)
+    return names
+
+def build_upload_portfolio(uploads):
+    """Scored panel (PANEL_SCHEMA, with lags and flags) of the readable (file_name, results) uploads"""
+    readable = [upload for upload in uploads if upload[1]['success']]
+    rows = []
+    for (_, results), name in zip(readable, portfolio_names(readable)):
+        rows.extend(workbook_panel_rows(results, name))
+    return build_scored_panel(rows)
+
+def latest_rows(panel, year=None):
+    """One row per company: its row for `year`, or its latest year"""
+    if year is not None:
+        return panel[panel['Year'] == year]
+    return panel.sort_values(['Name', 'Year'], kind='stable').groupby('Name', sort=False).tail(1)
+
+def league_table(panel, year=None):
+    """
+    One row per company for `year` (or its latest year): priority firms first,
+    then by EWS level, signal count and Z-Score
+    """
+    table = latest_rows(panel, year)[['Name', 'Year'] + LEAGUE_COLUMNS].copy()
+    table['_level'] = table['ews_level'].map(EWS_LEVEL_RANK)
+    table = table.sort_values(['priority_flag', '_level', 'n_signals', 'Z_Score', 'Name'],
+                              ascending=[False, True, False, True, True], kind='stable')
+    return table.drop(columns='_level').reset_index(drop=True)
+
+def peer_percentiles(panel, year=None):
+    """
+    Percentile (0-100) of each company's PEER_METRICS among the companies of
+    the same rows (`year`, or each company's latest year): the share of peers
+    at or below its value
+    """
+    rows = latest_rows(panel, year)
+    ranks = rows[PEER_METRICS].rank(method='max', pct=True) * 100
+    ranks.insert(0, 'Name', rows['Name'])
+    return ranks.set_index('Name')
+
+def portfolio_aggregates(uploads):
+    """
+    Everything the portfolio view shows, computed once per batch of uploads:
+    the panel, its Year x ews_level cube, the league table and peer
+    percentiles per year (key None: each company's latest year), and the
+    statements (all_data, company_info) of each company for its reports
+    """
+    panel = build_upload_portfolio(uploads)
+    readable = [upload for upload in uploads if upload[1]['success']]
+    years = sorted(int(y) for y in panel['Year'].unique())
+    return {
+        'panel': panel,
+        'cube': build_portfolio_cube(panel),
+        'years': years,
+        'companies': sorted(panel['Name'].unique().tolist()),
+        'league': {year: league_table(panel, year) for year in [None] + years},
+        'percentiles': {year: peer_percentiles(panel, year) for year in [None] + years},
+        'statements': {name: (results['data'], results['company_info'])
+                       for (_, results), name in zip(readable, portfolio_names(readable))},
+        'failed': [(file_name, results['errors']) for file_name, results in uploads if not results['success']]
+    }
@@ -0,0 +1,483 @@
+"""Per-company PDF risk reports, drawn with FPDF's own primitives (no chart images)
+
+Usage:
+    python -m ews.report INPUT_DIR [--output-dir ews_reports] [--year YEAR] [--workers N] [--chunksize N]
+                                   [--timeout SECONDS]
+"""
+
+import argparse
+import io
+import os
+import re
+import sys
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .batch import build_scoring_table, ratios_from_scores, scores_from_row, signals_from_scores
+from .cli import find_workbooks, pool_map_guarded, process_workbook_guarded
+from .model import generate_recommendations, generate_executive_summary
+from .timing import timed
+
+# Fill colours (RGB) of the EWS levels, as in the dashboard
+EWS_LEVEL_RGB = {'Safe': (46, 204, 113), 'Watchlist': (241, 196, 15), 'High Risk': (231, 76, 60)}
+
+# Gauge axis (min, max) and zone thresholds, as in the dashboard gauges
+Z_GAUGE = {'range': (-2.0, 5.0), 'thresholds': (1.1, 2.6)}
+S_GAUGE = {'range': (-1.0, 3.0), 'thresholds': (0.862, 0.862)}
+
+# Ratios listed in the report: key, label and whether shown as a percentage
+REPORT_RATIOS = [
+    ('ROA', "Return on assets", True),
+    ('CUR', "Current ratio", False),
+    ('LEV', "Leverage (debt / assets)", True),
+    ('FAR', "Fixed assets ratio", True),
+    ('WC_Assets', "Working capital / assets", True),
+    ('EBIT_to_Interest', "EBIT / interest", False),
+]
+
+# Core fonts only: the text is folded to latin-1 by pdf_text
+REPORT_FONT = 'Helvetica'
+REPORT_FONT_STYLES = ['', 'B']
+
+# Characters outside latin-1 with a close equivalent in it
+PDF_CHAR_REPLACEMENTS = {
+    '–': '-', '—': '-', '‘': "'", '’': "'", '“': '"', '”': '"',
+    '…': '...', '•': '-', 'Đ': 'D', 'đ': 'd',
+}
+
+# Worker processes rendering a portfolio's reports in the dashboard
+REPORT_WORKERS = 4
+
+# Layout of the worker process, built once by init_report_worker
+_WORKER_LAYOUT = None
+
+def pdf_text(text):
+    """
+    Text as the core PDF fonts can show it: HTML tags removed and non-latin-1
+    characters folded (accents the font lacks dropped, so 'Cổ' becomes 'Cô')
+    """
+    text = re.sub(r'<[^>]+>', '', str(text))
+    chars = []
+    for ch in text:
+        ch = PDF_CHAR_REPLACEMENTS.get(ch, ch)
+        if ord(ch) > 0xFF:
+            decomposed = unicodedata.normalize('NFD', ch)
+            folded = decomposed[0]
+            for mark in decomposed[1:]:
+                if ord(unicodedata.normalize('NFC', folded + mark)[-1]) <= 0xFF:
+                    folded += mark
+            ch = unicodedata.normalize('NFC', folded)
+            if any(ord(c) > 0xFF for c in ch):
+                ch = '?'
+        chars.append(ch)
+    return ''.join(chars)
+
+def report_file_name(path, input_dir=None):
+    """PDF file name of a workbook's report: its path under input_dir, with separators as '__'"""
+    relative = os.path.relpath(path, input_dir) if input_dir else os.path.basename(path)
+    stem = os.path.splitext(relative)[0]
+    return re.sub(r'[\\/]+', '__', stem) + '.pdf'
+
+# -----------------------------------------
+# REPORT CONTENT
+# -----------------------------------------
+
+def company_report(all_data, company_info, year=None, scores=None):
+    """
+    Everything the PDF shows for one company, for `year` (default: the latest
+    year): EWS level and signals, Z'' and S scores, ratios, drivers,
+    recommendations, executive summary and the year-by-year trend.
+    A `year` missing from all_data is reported on the latest year instead,
+    and kept as 'requested_year' so the PDF says so (None otherwise).
+    `scores` is the build_scoring_table result for all_data, built if not given.
+    """
+    years = sorted(all_data)
+    if scores is None:
+        scores = build_scoring_table(all_data)
+    requested_year = None
+    if year is not None and year not in all_data:
+        requested_year = year
+    if year is None or year not in all_data:
+        year = years[-1]
+
+    row = scores.loc[year]
+    ratios = ratios_from_scores(row)
+    signals = signals_from_scores(row)
+    z_score, z_zone, s_score, s_zone = scores_from_row(row)
+
+    trend = []
+    for y in years:
+        r = scores.loc[y]
+        z, zz, s, sz = scores_from_row(r)
+        trend.append({
+            'year': y, 'z_score': z, 'z_zone': zz, 's_score': s, 's_zone': sz,
+            'n_signals': int(r['n_signals']), 'ews_level': r['ews_level'], 'risk_trend': r['risk_trend']
+        })
+
+    return {
+        'company': company_info.get('name') or 'Unknown Company',
+        'file_name': company_info.get('file_name', ''),
+        'year': year,
+        'requested_year': requested_year,
+        'ews_level': signals['ews_level'],
+        'n_signals': signals['n_signals'],
+        'priority_flag': int(row['priority_flag']),
+        'risk_trend': row['risk_trend'],
+        'z_score': z_score, 'z_zone': z_zone,
+        's_score': s_score, 's_zone': s_zone,
+        'ratios': ratios,
+        'drivers': signals['drivers'],
+        'recommendations': generate_recommendations(signals, ratios, all_data[year]),
+        'summary': generate_executive_summary(signals, ratios, len(years), all_data, year, scores),
+        'trend': trend
+    }
+
+# -----------------------------------------
+# PDF DRAWING
+# -----------------------------------------
+
+def build_report_layout():
+    """
+    Page geometry and styles shared by every report. Also loads the core
+    font metrics, which FPDF then keeps for the life of the process.
+    """
+    from fpdf import FPDF
+
+    pdf = FPDF('P', 'mm', 'A4')
+    for style in REPORT_FONT_STYLES:
+        pdf.set_font(REPORT_FONT, style, 10)
+
+    margin = 15.0
+    width = pdf.w - 2 * margin
+    return {
+        'margin': margin,
+        'width': width,
+        'line': 5.0,
+        'gauge_width': (width - 10) / 2,
+        'trend_columns': [('Year', 16), ("Z''-Score", 24), ("Z'' zone", 34), ('S-Score', 22), ('S zone', 26),
+                          ('Signals', 18), ('EWS level', 40)],
+        'text_rgb': (44, 62, 80),
+        'muted_rgb': (127, 140, 141),
+        'rule_rgb': (189, 195, 199),
+    }
+
+def _fmt(value, digits=2):
+    return f"{value:.{digits}f}" if value is not None else "N/A"
+
+def draw_section_title(pdf, layout, title):
+    pdf.ln(3)
+    pdf.set_font(REPORT_FONT, 'B', 12)
+    pdf.set_text_color(*layout['text_rgb'])
+    pdf.cell(0, 7, pdf_text(title), ln=1)
+    pdf.set_draw_color(*layout['rule_rgb'])
+    pdf.set_line_width(0.3)
+    pdf.line(layout['margin'], pdf.get_y(), layout['margin'] + layout['width'], pdf.get_y())
+    pdf.ln(2)
+
+def draw_gauge(pdf, layout, x, y, title, value, zone, gauge):
+    """Horizontal gauge: the axis in red / yellow / green zones, a marker at the (clamped) value"""
+    width = layout['gauge_width']
+    lo, hi = gauge['range']
+    low, high = gauge['thresholds']
+
+    def to_x(v):
+        return x + (min(max(v, lo), hi) - lo) / (hi - lo) * width
+
+    pdf.set_xy(x, y)
+    pdf.set_font(REPORT_FONT, 'B', 10)
+    pdf.set_text_color(*layout['text_rgb'])
+    pdf.cell(width, 5, pdf_text(f"{title}: {_fmt(value)}"), ln=0)
+    pdf.set_xy(x, y + 5)
+    pdf.set_font(REPORT_FONT, '', 9)
+    pdf.set_text_color(*layout['muted_rgb'])
+    pdf.cell(width, 4, pdf_text(zone or "Not available"), ln=0)
+
+    bar_y, bar_h = y + 11, 6
+    for start, stop, level in [(lo, low, 'High Risk'), (low, high, 'Watchlist'), (high, hi, 'Safe')]:
+        if stop > start:
+            pdf.set_fill_color(*EWS_LEVEL_RGB[level])
+            pdf.rect(to_x(start), bar_y, to_x(stop) - to_x(start), bar_h, 'F')
+
+    pdf.set_font(REPORT_FONT, '', 7)
+    pdf.set_text_color(*layout['muted_rgb'])
+    for tick in sorted({lo, low, high, hi}):
+        pdf.text(to_x(tick) - 2, bar_y + bar_h + 4, f"{tick:g}")
+
+    if value is not None:
+        marker_x = to_x(value)
+        pdf.set_draw_color(0, 0, 0)
+        pdf.set_line_width(0.8)
+        pdf.line(marker_x, bar_y - 1.5, marker_x, bar_y + bar_h + 1.5)
+        pdf.set_line_width(0.2)
+
+def draw_trend_chart(pdf, layout, trend, height=38):
+    """Z''-Score by year: a line over the zone thresholds, points coloured by EWS level"""
+    points = [(t['year'], t['z_score']) for t in trend if t['z_score'] is not None]
+    if len(points) < 2:
+        return
+
+    x0, y0 = layout['margin'] + 10, pdf.get_y() + 2
+    width = layout['width'] - 14
+    low, high = Z_GAUGE['thresholds']
+    values = [v for _, v in points] + [low, high]
+    v_lo, v_hi = min(values), max(values)
+    pad = (v_hi - v_lo) * 0.1 or 1.0
+    v_lo, v_hi = v_lo - pad, v_hi + pad
+    years = [y for y, _ in points]
+    step = width / (len(trend) - 1) if len(trend) > 1 else width
+    year_pos = {t['year']: i for i, t in enumerate(trend)}
+
+    def to_xy(year, value):
+        return x0 + year_pos[year] * step, y0 + height - (value - v_lo) / (v_hi - v_lo) * height
+
+    pdf.set_draw_color(*layout['rule_rgb'])
+    pdf.set_line_width(0.2)
+    pdf.rect(x0, y0, width, height)
+
+    pdf.set_font(REPORT_FONT, '', 7)
+    for threshold, level in [(low, 'High Risk'), (high, 'Safe')]:
+        _, ty = to_xy(years[0], threshold)
+        pdf.set_draw_color(*EWS_LEVEL_RGB[level])
+        pdf.dashed_line(x0, ty, x0 + width, ty, 1.5, 1.0)
+        pdf.set_text_color(*layout['muted_rgb'])
+        pdf.text(x0 - 9, ty + 1, f"{threshold:g}")
+
+    pdf.set_draw_color(*layout['text_rgb'])
+    pdf.set_line_width(0.5)
+    for (ya, va), (yb, vb) in zip(points, points[1:]):
+        pdf.line(*to_xy(ya, va), *to_xy(yb, vb))
+    pdf.set_line_width(0.2)
+
+    levels = {t['year']: t['ews_level'] for t in trend}
+    for year, value in points:
+        px, py = to_xy(year, value)
+        pdf.set_fill_color(*EWS_LEVEL_RGB.get(levels[year], layout['muted_rgb']))
+        pdf.ellipse(px - 1.2, py - 1.2, 2.4, 2.4, 'F')
+
+    pdf.set_text_color(*layout['muted_rgb'])
+    for t in trend:
+        px, _ = to_xy(t['year'], v_lo)
+        pdf.text(px - 3.5, y0 + height + 4, str(t['year']))
+    pdf.set_y(y0 + height + 7)
+
+def draw_bullets(pdf, layout, lines):
+    pdf.set_font(REPORT_FONT, '', 10)
+    pdf.set_text_color(*layout['text_rgb'])
+    for line in lines:
+        text = line if line.startswith('-') else f"- {line}"
+        pdf.set_x(layout['margin'])
+        pdf.multi_cell(0, layout['line'], pdf_text(text))
+
+def draw_trend_table(pdf, layout, trend):
+    pdf.set_font(REPORT_FONT, 'B', 9)
+    pdf.set_text_color(*layout['text_rgb'])
+    pdf.set_fill_color(236, 240, 241)
+    for title, width in layout['trend_columns']:
+        pdf.cell(width, 6, pdf_text(title), border=1, align='C', fill=True)
+    pdf.ln()
+
+    pdf.set_font(REPORT_FONT, '', 9)
+    for t in trend:
+        cells = [str(t['year']), _fmt(t['z_score']), t['z_zone'], _fmt(t['s_score']), t['s_zone'],
+                 str(t['n_signals'])]
+        for (_, width), text in zip(layout['trend_columns'], cells):
+            pdf.cell(width, 6, pdf_text(text), border=1, align='C')
+        pdf.set_fill_color(*EWS_LEVEL_RGB.get(t['ews_level'], (255, 255, 255)))
+        pdf.cell(layout['trend_columns'][-1][1], 6, pdf_text(t['ews_level']), border=1, align='C', fill=True)
+        pdf.ln()
+
+@timed('report.render')
+def render_company_report(report, layout=None):
+    """PDF (bytes) of a company_report. `layout` is a build_report_layout result, built if not given."""
+    from fpdf import FPDF
+
+    layout = layout or _WORKER_LAYOUT or build_report_layout()
+    margin, width = layout['margin'], layout['width']
+
+    pdf = FPDF('P', 'mm', 'A4')
+    pdf.set_margins(margin, margin, margin)
+    pdf.set_auto_page_break(True, margin)
+    pdf.set_title(pdf_text(f"EWS report - {report['company']}"))
+    pdf.add_page()
+
+    # Header
+    pdf.set_font(REPORT_FONT, 'B', 16)
+    pdf.set_text_color(*layout['text_rgb'])
+    pdf.multi_cell(0, 8, pdf_text(report['company']))
+    pdf.set_font(REPORT_FONT, '', 9)
+    pdf.set_text_color(*layout['muted_rgb'])
+    source = f" - {os.path.basename(report['file_name'])}" if report['file_name'] else ""
+    pdf.cell(0, 5, pdf_text(f"Financial risk early warning report, fiscal year {report['year']}{source}"), ln=1)
+    if report.get('requested_year') is not None:
+        pdf.set_text_color(*EWS_LEVEL_RGB['High Risk'])
+        pdf.cell(0, 5, pdf_text(f"Fiscal year {report['requested_year']} is not in the statements; "
+                                f"the latest year, {report['year']}, is reported instead."), ln=1)
+    pdf.ln(3)
+
+    # EWS level banner
+    level = report['ews_level']
+    pdf.set_fill_color(*EWS_LEVEL_RGB.get(level, layout['muted_rgb']))
+    pdf.set_text_color(255, 255, 255)
+    pdf.set_font(REPORT_FONT, 'B', 14)
+    pdf.cell(width, 11, pdf_text(f"EWS level: {level}"), align='C', fill=True, ln=1)
+    pdf.set_text_color(*layout['text_rgb'])
+    pdf.set_font(REPORT_FONT, '', 9)
+    priority = "yes" if report['priority_flag'] else "no"
+    pdf.cell(0, 6, pdf_text(f"Warning signals: {report['n_signals']} of 3    Trend vs previous year: "
+                            f"{report['risk_trend']}    Priority: {priority}"), align='C', ln=1)
+
+    # Gauges
+    draw_section_title(pdf, layout, "Risk scores")
+    y = pdf.get_y()
+    draw_gauge(pdf, layout, margin, y, "Altman Z''-Score", report['z_score'], report['z_zone'], Z_GAUGE)
+    draw_gauge(pdf, layout, margin + layout['gauge_width'] + 10, y, "S-Score", report['s_score'],
+               report['s_zone'], S_GAUGE)
+    pdf.set_y(y + 24)
+
+    # Ratios
+    draw_section_title(pdf, layout, "Key ratios")
+    pdf.set_font(REPORT_FONT, '', 9)
+    half = width / 2
+    for i, (key, label, percent) in enumerate(REPORT_RATIOS):
+        value = report['ratios'].get(key)
+        text = f"{value:.2%}" if percent and value is not None else _fmt(value)
+        pdf.cell(half * 0.65, 5, pdf_text(label))
+        pdf.cell(half * 0.35, 5, text, ln=1 if i % 2 else 0)
+    if len(REPORT_RATIOS) % 2:
+        pdf.ln()
+
+    draw_section_title(pdf, layout, "Executive summary")
+    pdf.set_font(REPORT_FONT, '', 10)
+    pdf.multi_cell(0, layout['line'], pdf_text(report['summary']))
+
+    draw_section_title(pdf, layout, "Risk drivers")
+    draw_bullets(pdf, layout, report['drivers'] or ["No risk driver identified."])
+
+    draw_section_title(pdf, layout, "Recommendations")
+    draw_bullets(pdf, layout, report['recommendations'])
+
+    draw_section_title(pdf, layout, "Trend")
+    if pdf.get_y() + 50 + 6 * (len(report['trend']) + 1) > pdf.h - margin:
+        pdf.add_page()
+    draw_trend_chart(pdf, layout, report['trend'])
+    draw_trend_table(pdf, layout, report['trend'])
+
+    return pdf.output(dest='S').encode('latin-1')
+
+# -----------------------------------------
+# BATCH
+# -----------------------------------------
+
+def init_report_worker():
+    """Process pool initializer: build the shared layout (and font metrics) once per worker"""
+    global _WORKER_LAYOUT
+    _WORKER_LAYOUT = build_report_layout()
+
+def report_workbook(path, output_path, year=None, timeout=None):
+    """
+    Parse one workbook and write its PDF report to output_path.
+    Returns (path, output_path or None, error or None); never raises on a bad workbook.
+    """
+    results = process_workbook_guarded(path, timeout)
+    if not results['success'] or not results['data']:
+        return path, None, "; ".join(results['errors']) or "no usable year"
+    try:
+        report = company_report(results['data'], results['company_info'], year)
+        pdf = render_company_report(report)
+        with open(output_path, 'wb') as f:
+            f.write(pdf)
+    except Exception as e:
+        return path, None, str(e)
+    return path, output_path, None
+
+def _report_workbook_task(task, year, timeout):
+    return report_workbook(task[0], task[1], year, timeout)
+
+def report_directory(input_dir, output_dir, year=None, workers=1, chunksize=1, timeout=None):
+    """
+    One PDF per workbook under input_dir, written to output_dir, in a process
+    pool of `workers`. Returns (path, pdf_path or None, error or None) per workbook.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = find_workbooks(input_dir)
+    tasks = [(path, os.path.join(output_dir, report_file_name(path, input_dir))) for path in paths]
+
+    if workers <= 1 or len(tasks) <= 1:
+        init_report_worker()
+        return [_report_workbook_task(task, year, timeout) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=init_report_worker) as executor:
+        return pool_map_guarded(executor, _report_workbook_task, tasks, (year, timeout), chunksize,
+                                lambda task, error: (task[0], None, error))
+
+def _render_report_task(item):
+    all_data, company_info, year = item
+    return render_company_report(company_report(all_data, company_info, year))
+
+def render_company_reports(items, workers=1, chunksize=4, mp_context=None):
+    """
+    PDF bytes for each (all_data, company_info, year) item, in input order,
+    rendered in a process pool of `workers` when there are several.
+    """
+    if workers <= 1 or len(items) <= 1:
+        init_report_worker()
+        return [_render_report_task(item) for item in items]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(items)), mp_context=mp_context,
+                             initializer=init_report_worker) as executor:
+        return list(executor.map(_render_report_task, items, chunksize=chunksize))
+
+def report_archive(named_pdfs):
+    """
+    ZIP (bytes) of (company name, PDF bytes) pairs, one '<name>.pdf' entry
+    each; names that clash once sanitized get ' (2)', ' (3)', ...
+    """
+    buffer = io.BytesIO()
+    used = set()
+    # PDF streams are already deflated
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for name, pdf in named_pdfs:
+            stem = re.sub(r'[^\w\-. ()]+', '_', pdf_text(name)).strip()
+            entry, n = stem, 1
+            # Case-insensitively, as the archive may be extracted on Windows or macOS
+            while entry.lower() in used:
+                n += 1
+                entry = f"{stem} ({n})"
+            used.add(entry.lower())
+            archive.writestr(entry + '.pdf', pdf)
+    return buffer.getvalue()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m ews.report',
+        description="Write a PDF early warning report for every financial statement workbook under a directory."
+    )
+    parser.add_argument('input_dir', help="directory searched recursively for .xlsx/.xlsm/.xls workbooks")
+    parser.add_argument('--output-dir', default='ews_reports', help="directory for the PDFs (default: ews_reports)")
+    parser.add_argument('--year', type=int, default=None,
+                        help="fiscal year reported on (default: each workbook's latest year)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="worker processes rendering reports in parallel; 0 uses every CPU (default: 1)")
+    parser.add_argument('--chunksize', type=int, default=1,
+                        help="workbooks handed to a worker per task (default: 1)")
+    parser.add_argument('--timeout', type=float, default=None,
+                        help="seconds after which parsing a single workbook is abandoned")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"not a directory: {args.input_dir}")
+
+    if args.workers < 0 or args.chunksize < 1:
+        parser.error("--workers must be >= 0 and --chunksize >= 1")
+    workers = args.workers or os.cpu_count() or 1
+
+    results = report_directory(args.input_dir, args.output_dir, args.year, workers, args.chunksize, args.timeout)
+    failed = [(path, error) for path, output, error in results if output is None]
+    for path, error in failed:
+        print(f"{path}: {error}", file=sys.stderr)
+    print(f"Wrote {len(results) - len(failed)} of {len(results)} reports -> {args.output_dir}", file=sys.stderr)
+    return 0 if len(results) > len(failed) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
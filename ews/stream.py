@@ -0,0 +1,297 @@
+"""
+Streaming access to panels too large to load whole. One chunked pass over the
+CSV records where each company's rows sit in the file (a sidecar offset index)
+and the portfolio counts; a company's rows are then read on demand from those
+byte ranges. Memory is bounded by the block size and the number of companies,
+not by the number of rows.
+"""
+
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from .model import EWS_LEVELS
+from .panel import (
+    PANEL_CSV_PATH, PANEL_COLUMNS, PANEL_FIELD_COLUMNS, score_ews_panel, build_panel_history, build_panel_deltas,
+    apply_panel_dtypes, build_portfolio_cube, panel_version
+)
+from .timing import timed
+
+# Bytes of CSV parsed per chunk of the scan
+PANEL_STREAM_BLOCK_BYTES = 8 * 2 ** 20
+# Panels from this size on are streamed by the dashboard instead of loaded whole
+PANEL_STREAM_MIN_BYTES = 512 * 2 ** 20
+# Bumped when the layout of the sidecar index changes
+PANEL_STREAM_INDEX_VERSION = 1
+
+# Types of the streamed columns; everything else in PANEL_COLUMNS is a float field. Other
+# columns of a company's rows (read in full) keep the types pandas infers for them.
+PANEL_STREAM_DTYPES = {'Name': str, 'Year': np.int16, **{col: np.float64 for col in PANEL_FIELD_COLUMNS.values()}}
+
+def panel_stream_index_path(csv_path=PANEL_CSV_PATH):
+    """Sidecar offset index of a panel CSV"""
+    return csv_path + '.idx.npz'
+
+def use_panel_stream(csv_path=PANEL_CSV_PATH):
+    """True if the panel CSV should be streamed: EWS_PANEL_STREAM=1, or a CSV of PANEL_STREAM_MIN_BYTES or more"""
+    setting = os.environ.get('EWS_PANEL_STREAM')
+    if setting is not None:
+        return setting == '1'
+    return os.path.exists(csv_path) and os.path.getsize(csv_path) >= PANEL_STREAM_MIN_BYTES
+
+def read_csv_header(csv_path):
+    """Column names of the CSV and the byte offset of its first data row"""
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+    return list(pd.read_csv(io.BytesIO(header), nrows=0).columns), len(header)
+
+def iter_csv_blocks(csv_path, start, block_bytes=PANEL_STREAM_BLOCK_BYTES):
+    """(offset, bytes) blocks of whole lines from byte `start` to the end of the file"""
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        offset = start
+        carry = b''
+        while True:
+            data = f.read(block_bytes)
+            if not data:
+                break
+            data = carry + data
+            cut = data.rfind(b'\n') + 1
+            if cut == 0:
+                carry = data
+                continue
+            yield offset, data[:cut]
+            offset += cut
+            carry = data[cut:]
+        if carry.strip():
+            yield offset, carry
+
+def parse_panel_rows(data, columns, usecols=PANEL_COLUMNS):
+    """
+    Parse raw panel CSV lines (no header) into the streamed columns (or
+    `usecols`, None for all) with their stream types
+    """
+    if usecols is None:
+        dtype = {col: dtype for col, dtype in PANEL_STREAM_DTYPES.items() if col in columns}
+    else:
+        dtype = PANEL_STREAM_DTYPES
+    return pd.read_csv(io.BytesIO(data), header=None, names=columns, usecols=usecols, dtype=dtype)
+
+def iter_panel_chunks(csv_path=PANEL_CSV_PATH, block_bytes=PANEL_STREAM_BLOCK_BYTES):
+    """The streamed columns of the panel CSV, one parsed frame per block"""
+    columns, data_start = read_csv_header(csv_path)
+    for _, data in iter_csv_blocks(csv_path, data_start, block_bytes):
+        yield parse_panel_rows(data, columns)
+
+def in_year_range(years, year_range):
+    if year_range is None:
+        return np.ones(len(years), dtype=bool)
+    return (years >= year_range[0]) & (years <= year_range[1])
+
+@timed('panel.scan')
+def scan_panel(csv_path=PANEL_CSV_PATH, year_range=None, block_bytes=PANEL_STREAM_BLOCK_BYTES):
+    """
+    One chunked pass over the panel CSV. Returns the stream index:
+    - 'names': company names by code; 'companies': sorted names with rows in year_range
+    - 'run_codes' / 'run_starts' / 'run_stops': byte ranges of consecutive rows of one company
+    - 'years': sorted distinct years in year_range; 'cube': Year x ews_level firm counts
+    Rows must be one per line (as written by pandas); rows of a company need not be contiguous.
+    Rows without a Name are counted in the cube but belong to no company.
+    """
+    columns, data_start = read_csv_header(csv_path)
+    codes_by_name = {}
+    in_range_codes = set()
+    run_codes, run_starts, run_stops = [], [], []
+    cube = None
+
+    for offset, data in iter_csv_blocks(csv_path, data_start, block_bytes):
+        chunk = parse_panel_rows(data, columns)
+
+        # Byte offset of every line of the block, to match the parsed rows
+        newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord('\n'))
+        line_stops = newlines + 1
+        if len(data) and data[-1:] != b'\n':
+            line_stops = np.append(line_stops, len(data))
+        if len(line_stops) != len(chunk):
+            raise ValueError("Panel CSV has blank or multi-line rows and cannot be streamed")
+        line_starts = np.concatenate([[0], line_stops[:-1]])
+
+        block_codes, uniques = pd.factorize(chunk['Name'])
+        code_map = np.array([codes_by_name.setdefault(name, len(codes_by_name)) for name in uniques],
+                            dtype=np.int64)
+        # Rows without a Name (factorized as -1) get code -1 and belong to no company
+        codes = np.append(code_map, -1)[block_codes]
+
+        # Runs of consecutive rows of one company; the first may continue the previous block's last run
+        if len(codes):
+            boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+            starts = np.concatenate([[0], boundaries])
+            stops = np.concatenate([boundaries, [len(codes)]])
+            named = codes[starts] >= 0
+            block_run_codes = codes[starts][named]
+            block_run_starts = offset + line_starts[starts][named]
+            block_run_stops = offset + line_stops[stops - 1][named]
+            if (run_codes and len(block_run_codes) and run_codes[-1][-1] == block_run_codes[0]
+                    and run_stops[-1][-1] == block_run_starts[0]):
+                run_stops[-1][-1] = block_run_stops[0]
+                block_run_codes, block_run_starts, block_run_stops = (
+                    block_run_codes[1:], block_run_starts[1:], block_run_stops[1:]
+                )
+            # Only blocks that open runs are kept, so the last kept run is always at run_codes[-1][-1]
+            if len(block_run_codes):
+                run_codes.append(block_run_codes)
+                run_starts.append(block_run_starts)
+                run_stops.append(block_run_stops)
+
+        mask = in_year_range(chunk['Year'].to_numpy(), year_range)
+        if mask.any():
+            in_range_codes.update(np.unique(codes[mask & (codes >= 0)]).tolist())
+            counts = build_portfolio_cube(score_ews_panel(chunk[mask]))
+            cube = counts if cube is None else cube.add(counts, fill_value=0)
+
+    names = np.array(list(codes_by_name), dtype=str)
+    if cube is None:
+        cube = pd.DataFrame(columns=EWS_LEVELS, dtype=np.int64)
+    cube = cube.sort_index().astype(np.int64)
+    cube.index.name = 'Year'
+    return {
+        'csv_path': csv_path,
+        'columns': columns,
+        'year_range': year_range,
+        'names': names,
+        'companies': sorted(names[sorted(in_range_codes)].tolist()),
+        'run_codes': np.concatenate(run_codes) if run_codes else np.array([], dtype=np.int64),
+        'run_starts': np.concatenate(run_starts) if run_starts else np.array([], dtype=np.int64),
+        'run_stops': np.concatenate(run_stops) if run_stops else np.array([], dtype=np.int64),
+        'years': [int(y) for y in cube.index],
+        'cube': cube
+    }
+
+def save_stream_index(index, index_path, version):
+    """Write the stream index as an .npz sidecar tagged with the panel version"""
+    year_range = index['year_range'] if index['year_range'] is not None else (-1, -1)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            layout=np.int64(PANEL_STREAM_INDEX_VERSION),
+            version=np.array(version),
+            year_range=np.array(year_range, dtype=np.int64),
+            columns=np.array(index['columns'], dtype=str),
+            names=index['names'],
+            companies=np.array(index['companies'], dtype=str),
+            run_codes=index['run_codes'],
+            run_starts=index['run_starts'],
+            run_stops=index['run_stops'],
+            cube_years=index['cube'].index.to_numpy(dtype=np.int64),
+            cube_counts=index['cube'].to_numpy(dtype=np.int64)
+        )
+    os.replace(tmp_path, index_path)
+
+def read_stream_index(index_path, csv_path, version, year_range):
+    """The sidecar stream index if it matches the panel version and year range, else None"""
+    try:
+        with np.load(index_path, allow_pickle=False) as saved:
+            saved_range = tuple(saved['year_range'].tolist())
+            if (int(saved['layout']) != PANEL_STREAM_INDEX_VERSION or str(saved['version']) != version
+                    or saved_range != (tuple(year_range) if year_range is not None else (-1, -1))):
+                return None
+            cube = pd.DataFrame(saved['cube_counts'], index=pd.Index(saved['cube_years'], name='Year'),
+                                columns=EWS_LEVELS)
+            return {
+                'csv_path': csv_path,
+                'columns': saved['columns'].tolist(),
+                'year_range': year_range,
+                'names': saved['names'],
+                'companies': saved['companies'].tolist(),
+                'run_codes': saved['run_codes'],
+                'run_starts': saved['run_starts'],
+                'run_stops': saved['run_stops'],
+                'years': [int(y) for y in cube.index],
+                'cube': cube
+            }
+    except (OSError, KeyError, ValueError):
+        return None
+
+def load_stream_index(csv_path=PANEL_CSV_PATH, year_range=None, index_path=None):
+    """
+    Stream index of the panel CSV, read from its sidecar when that is current,
+    otherwise scanned and saved (the sidecar is skipped if it cannot be written)
+    """
+    index_path = index_path or panel_stream_index_path(csv_path)
+    version = panel_version(csv_path, store_path='')
+    index = read_stream_index(index_path, csv_path, version, year_range)
+    if index is None:
+        index = scan_panel(csv_path, year_range)
+        try:
+            save_stream_index(index, index_path, version)
+        except OSError:
+            pass
+    index['company_codes'] = {name: code for code, name in enumerate(index['names'].tolist())}
+    return index
+
+def stream_rows_frame(index, parts):
+    """
+    Raw panel CSV lines of whole companies (every column), scored, with
+    history and year-over-year columns, restricted to the year range
+    """
+    if parts:
+        df = parse_panel_rows(b''.join(parts), index['columns'], usecols=None)
+    else:
+        df = pd.DataFrame({col: pd.Series(dtype=PANEL_STREAM_DTYPES.get(col, np.float64))
+                           for col in index['columns']})
+    df = apply_panel_dtypes(build_panel_history(score_ews_panel(df)))
+    df = df[in_year_range(df['Year'].to_numpy(), index['year_range'])]
+    return build_panel_deltas(df)
+
+@timed('panel.stream_company')
+def stream_company_rows(index, name):
+    """
+    One company's rows read from the CSV through the stream index (every
+    column), scored, with history and year-over-year columns, restricted to
+    the year range and ordered by Year: the frame panel_company_rows gives for
+    a loaded panel
+    """
+    code = index['company_codes'].get(name)
+    runs = np.flatnonzero(index['run_codes'] == code) if code is not None else []
+    parts = []
+    with open(index['csv_path'], 'rb') as f:
+        for run in runs:
+            start = int(index['run_starts'][run])
+            f.seek(start)
+            parts.append(f.read(int(index['run_stops'][run]) - start))
+
+    df = stream_rows_frame(index, parts)
+    return df.sort_values('Year', kind='stable').reset_index(drop=True)
+
+def iter_stream_companies(index, block_bytes=PANEL_STREAM_BLOCK_BYTES):
+    """
+    The companies of the stream index with the columns of stream_company_rows,
+    sorted by Name and Year: the rows a loaded panel gives, in frames of
+    whole companies read from about block_bytes of CSV each
+    """
+    run_order = np.argsort(index['run_codes'], kind='stable')
+    sorted_codes = index['run_codes'][run_order]
+    parts = []
+    size = 0
+    with open(index['csv_path'], 'rb') as f:
+        for name in index['companies']:
+            code = index['company_codes'][name]
+            lo, hi = np.searchsorted(sorted_codes, [code, code + 1])
+            for run in run_order[lo:hi]:
+                start = int(index['run_starts'][run])
+                f.seek(start)
+                parts.append(f.read(int(index['run_stops'][run]) - start))
+                size += len(parts[-1])
+            if size >= block_bytes:
+                yield stream_rows_frame(index, parts).sort_values(['Name', 'Year'], kind='stable')
+                parts = []
+                size = 0
+    if parts:
+        yield stream_rows_frame(index, parts).sort_values(['Name', 'Year'], kind='stable')
+
+def stream_company_year(df_company, year):
+    """Rows of a streamed company for one year"""
+    return df_company[df_company['Year'] == year]
@@ -0,0 +1,126 @@
+"""
+Span timing for the hot paths. Recording is per thread (one Streamlit rerun
+or one batch job) and off by default; while off, a timed function costs one
+thread-local lookup.
+"""
+
+import functools
+import json
+import threading
+import time
+
+class _State(threading.local):
+    # Class defaults, so a thread that never started recording reads None without an AttributeError
+    records = None
+    depth = 0
+
+_local = _State()
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+class _Span:
+    __slots__ = ('name', 'records', 'start')
+
+    def __init__(self, name, records):
+        self.name = name
+        self.records = records
+
+    def __enter__(self):
+        _local.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        _local.depth -= 1
+        self.records.append((self.name, _local.depth, elapsed))
+        return False
+
+def start():
+    """Start recording spans in this thread, discarding any earlier records"""
+    _local.records = []
+    _local.depth = 0
+
+def stop():
+    """Stop recording in this thread; returns the (name, depth, seconds) records in completion order"""
+    records = _local.records
+    _local.records = None
+    return records or []
+
+def is_enabled():
+    return _local.records is not None
+
+def capture(fn, *args, **kwargs):
+    """
+    Call fn with recording on in this thread (e.g. a worker), restoring the
+    thread's previous recording state after. Returns (result, records).
+    """
+    saved = _local.records, _local.depth
+    start()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        records = stop()
+        _local.records, _local.depth = saved
+    return result, records
+
+def merge(records):
+    """Add spans recorded in another thread (see capture) to this thread's, nested at the current depth"""
+    if _local.records is None:
+        return
+    depth = _local.depth
+    _local.records.extend((name, depth + d, elapsed) for name, d, elapsed in records)
+
+def span(name):
+    """Context manager timing the enclosed block as `name` while recording is on"""
+    records = _local.records
+    if records is None:
+        return _NO_SPAN
+    return _Span(name, records)
+
+def timed(name):
+    """Decorator timing every call of the function as span `name`"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            records = _local.records
+            if records is None:
+                return fn(*args, **kwargs)
+            with _Span(name, records):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def summarize(records):
+    """
+    Per-span totals (name, depth, calls, total_ms, max_ms), outermost spans
+    first and then by total time
+    """
+    summary = {}
+    for name, depth, elapsed in records:
+        entry = summary.get(name)
+        if entry is None:
+            entry = summary[name] = {'name': name, 'depth': depth, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        elapsed_ms = elapsed * 1000
+        entry['calls'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+        entry['depth'] = min(entry['depth'], depth)
+    return sorted(summary.values(), key=lambda entry: (entry['depth'], -entry['total_ms']))
+
+def log_line(records, **context):
+    """One-line JSON record of a run's span totals, with extra context fields"""
+    payload = dict(context)
+    payload['spans'] = {
+        entry['name']: {'calls': entry['calls'], 'total_ms': round(entry['total_ms'], 3),
+                        'max_ms': round(entry['max_ms'], 3)}
+        for entry in summarize(records)
+    }
+    return json.dumps(payload, ensure_ascii=False)
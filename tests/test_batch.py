@@ -0,0 +1,75 @@
+"""Vectorized EWS model (ews.batch) against the per-firm-year scalar model (ews.model)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ews.batch import (
+    MODEL_FIELDS, build_scoring_table, build_scoring_table_cached, calculate_ews_batch, ratios_from_scores,
+    scores_from_row, signals_from_scores
+)
+from ews.cache import BoundedCache
+from ews.model import calculate_financial_ratios, calculate_altman_z_score, calculate_s_score, calculate_ews_signals
+
+def random_records(n, seed=0):
+    """n firm-years of model fields, some missing and some zero, as the scalar model reads them"""
+    rng = np.random.default_rng(seed)
+    records = []
+    for _ in range(n):
+        total_assets = rng.uniform(1e9, 1e13)
+        record = {field: total_assets * rng.uniform(-0.2, 1.2) for field in MODEL_FIELDS}
+        record['Total Assets'] = total_assets
+        for field in MODEL_FIELDS:
+            draw = rng.random()
+            if draw < 0.1:
+                del record[field]
+            elif draw < 0.15:
+                record[field] = 0.0
+        records.append(record)
+    # Edge cases: no assets, no current liabilities, no data at all
+    records.append({'Total Assets': 0.0, 'EBIT': 5.0, 'Interest Expense': 10.0})
+    records.append({'Total Assets': 1e9, 'Total Current Liabilities': 0.0, 'Revenue': 2e9})
+    records.append({})
+    return records
+
+def assert_same_number(actual, expected):
+    if expected is None:
+        assert actual is None
+    else:
+        assert actual == pytest.approx(expected, rel=1e-12, abs=0)
+
+@pytest.fixture(scope='module')
+def records():
+    return random_records(500)
+
+def test_batch_matches_scalar_model(records):
+    table = calculate_ews_batch(pd.DataFrame(records))
+    for data, (_, row) in zip(records, table.iterrows()):
+        ratios = calculate_financial_ratios(data)
+        batch_ratios = ratios_from_scores(row)
+        assert batch_ratios.keys() == ratios.keys()
+        for name, value in ratios.items():
+            assert_same_number(batch_ratios[name], value)
+
+        z_score, z_zone, s_score, s_zone = scores_from_row(row)
+        expected_z, expected_z_zone = calculate_altman_z_score(data, ratios)
+        expected_s, expected_s_zone = calculate_s_score(data, ratios)
+        assert_same_number(z_score, expected_z)
+        assert_same_number(s_score, expected_s)
+        assert (z_zone, s_zone) == (expected_z_zone, expected_s_zone)
+
+        assert signals_from_scores(row) == calculate_ews_signals(data, ratios)
+
+def test_cached_scoring_table_matches_full_rescoring(records):
+    all_data = {2010 + i: data for i, data in enumerate(records[:12])}
+    cache = BoundedCache(1024, 2 ** 24)
+    pd.testing.assert_frame_equal(build_scoring_table_cached(all_data, cache)[build_scoring_table(all_data).columns],
+                                  build_scoring_table(all_data))
+
+    # A corrected year is rescored; only its trend and the next year's are refreshed
+    corrected = dict(all_data)
+    corrected[2015] = {**all_data[2015], 'EBIT': -all_data[2015].get('EBIT', 1e9)}
+    misses = cache.stats()['misses']
+    table = build_scoring_table_cached(corrected, cache)
+    assert cache.stats()['misses'] - misses == 3
+    pd.testing.assert_frame_equal(table[build_scoring_table(corrected).columns], build_scoring_table(corrected))
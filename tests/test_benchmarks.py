@@ -0,0 +1,34 @@
+"""Benchmark harness (benchmarks.run): a quick run's results file and its comparison against a baseline"""
+
+import json
+
+from benchmarks.run import main, measure
+
+def test_measure_counts_every_call():
+    calls = []
+    result = measure(lambda: calls.append(len(calls)), repeat=3, items=10)
+    # One warm-up, the timed runs and one traced run
+    assert len(calls) == 5
+    assert result['repeat'] == 3 and result['items'] == 10
+    assert 0 <= result['min_s'] <= result['wall_s'] and result['peak_mb'] >= 0
+
+def test_quick_run_writes_and_compares_results(tmp_path, capsys):
+    baseline = tmp_path / 'baseline.json'
+    assert main(['--quick', '--only', 'report.', '--repeat', '1', '--output', str(baseline)]) == 0
+    report = json.loads(baseline.read_text(encoding='utf-8'))
+    assert {'timestamp', 'python', 'numpy', 'pandas'} <= set(report['meta'])
+    assert [(r['name'], r['params']) for r in report['results']] == [
+        ('report.content', {'years': 5}), ('report.render_pdf', {'years': 5}),
+        ('report.content', {'years': 10}), ('report.render_pdf', {'years': 10})
+    ]
+    assert all(r['unit'] == 'reports' and r['wall_s'] > 0 for r in report['results'])
+    capsys.readouterr()
+
+    current = tmp_path / 'current.json'
+    assert main(['--quick', '--only', 'report.render', '--repeat', '1', '--output', str(current),
+                 '--compare', str(baseline)]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ['case', 'baseline', 'ms', 'current', 'ms', 'speedup']
+    assert [line.split()[:2] for line in lines[1:]] == [['report.render_pdf', 'years=5'],
+                                                       ['report.render_pdf', 'years=10']]
+    assert all(line.endswith('x') for line in lines[1:])
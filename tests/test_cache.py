@@ -0,0 +1,129 @@
+"""Upload and figure caching (ews.cache) against uncached processing and freshly built figures"""
+
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ews.extraction
+from benchmarks.workbooks import cf_export_workbook, vietnamese_workbook
+from ews.cache import (
+    BoundedCache, figure_cache_key, iter_processed_uploads, process_uploaded_file_cached, upload_cache_key
+)
+from ews.extraction import process_uploaded_file
+
+def upload(buffer):
+    """A fresh upload-like copy of a workbook buffer"""
+    copy = io.BytesIO(buffer.getvalue())
+    copy.name = buffer.name
+    return copy
+
+@pytest.fixture
+def counted(monkeypatch):
+    """Count the uploads that are actually parsed"""
+    calls = []
+
+    def process(uploaded_file, year_cache=None):
+        calls.append(uploaded_file.name)
+        return process_uploaded_file(uploaded_file, year_cache)
+
+    monkeypatch.setattr(ews.extraction, 'process_uploaded_file', process)
+    return calls
+
+def test_identical_uploads_are_parsed_once(counted):
+    workbook = cf_export_workbook(years=4)
+    cache = BoundedCache(8, 2 ** 24)
+    first = process_uploaded_file_cached(upload(workbook), cache)
+    second = process_uploaded_file_cached(upload(workbook), cache)
+    assert counted == [workbook.name]
+    assert second == first == process_uploaded_file(upload(workbook))
+
+    changed = cf_export_workbook(years=4, seed=1)
+    assert upload_cache_key(changed) != upload_cache_key(workbook)
+    process_uploaded_file_cached(upload(changed), cache)
+    assert len(counted) == 2
+
+def test_cache_evicts_least_recently_used():
+    cache = BoundedCache(2, 1000)
+    cache.put('a', 1, nbytes=10)
+    cache.put('b', 2, nbytes=10)
+    assert cache.get('a') == 1
+    cache.put('c', 3, nbytes=10)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+
+    cache.put('d', 4, nbytes=995)
+    assert len(cache) == 1 and 'd' in cache
+    cache.put('e', 5, nbytes=1001)
+    assert 'e' not in cache
+
+def test_parallel_uploads_match_serial(counted):
+    workbooks = [cf_export_workbook(years=3, seed=seed) for seed in range(3)] + [vietnamese_workbook(years=3)]
+    uploads = [upload(workbook) for workbook in workbooks] + [upload(workbooks[0])]
+    cache = BoundedCache(8, 2 ** 24)
+    results = dict(iter_processed_uploads(uploads, cache))
+    assert sorted(results) == list(range(len(uploads)))
+    for position, uploaded_file in enumerate(uploads):
+        assert results[position] == process_uploaded_file(upload(uploaded_file))
+
+def test_distinct_chart_inputs_get_distinct_keys():
+    frame = pd.DataFrame({'Year': [2020, 2021], 'ROA': [0.05, np.nan]})
+    pairs = [
+        # A dict's items are drawn in insertion order
+        ({'ROA': 0.05, 'LEV': 0.4}, {'LEV': 0.4, 'ROA': 0.05}),
+        (np.nan, None),
+        ([0.05, np.nan], [0.05, None]),
+        (frame, frame.to_numpy()),
+        (frame, frame[['ROA', 'Year']]),
+        (frame, frame.astype({'Year': float})),
+        (frame['ROA'], frame['ROA'].rename('LEV')),
+        (1, 1.0),
+        ('2020', 2020),
+        (['a', 'b'], ['a b']),
+    ]
+    for first, second in pairs:
+        assert figure_cache_key('chart', first) != figure_cache_key('chart', second), (first, second)
+    assert figure_cache_key('chart', frame) == figure_cache_key('chart', frame.copy())
+    assert figure_cache_key('chart', frame, 2020) != figure_cache_key('other', frame, 2020)
+    assert figure_cache_key('chart', 'a', 'b') != figure_cache_key('chart', 'ab')
+
+@pytest.fixture
+def figure_cache(monkeypatch):
+    """dashboard.cached_chart over a fresh figure cache"""
+    dashboard = pytest.importorskip('dashboard')
+    cache = BoundedCache(64, 2 ** 24)
+    monkeypatch.setattr(dashboard, 'get_figure_cache', lambda: cache)
+    return dashboard
+
+def figure_spec(fig):
+    """A figure's JSON spec, parsed: plotly may order the layout keys differently"""
+    return json.loads(fig.to_json())
+
+def test_cached_figures_round_trip(figure_cache):
+    dashboard = figure_cache
+    df = pd.DataFrame({
+        'Year': [2019, 2020, 2021, 2022], 'Interest': [1e9, 2e9, -1e8, 3e9], 'EBIT': [4e9, 1e9, 2e9, np.nan],
+        'ews_level': ['Safe', 'Watchlist', 'High Risk', 'Safe']
+    })
+    built = []
+
+    def build():
+        built.append(dashboard.create_interest_coverage_chart(df, 'Interest', 'EBIT'))
+        return built[-1]
+
+    inputs = (df, 'Interest', 'EBIT')
+    miss = dashboard.cached_chart('interest_coverage', inputs, build)
+    hit = dashboard.cached_chart('interest_coverage', inputs, build)
+    assert len(built) == 1
+    expected = built[0]
+    for result in [miss, hit]:
+        assert result['fig'] is not expected['fig']
+        assert figure_spec(result['fig']) == figure_spec(expected['fig'])
+        assert {k: v for k, v in result.items() if k != 'fig'} == {k: v for k, v in expected.items() if k != 'fig'}
+    # Each caller gets its own figure, so changing one does not touch the cached entry
+    miss['fig'].update_layout(title='changed')
+    assert figure_spec(dashboard.cached_chart('interest_coverage', inputs, build)['fig']) == figure_spec(expected['fig'])
+
+    gauge = dashboard.cached_chart('gauge', (1.8, 'Z'), lambda: dashboard.create_gauge_chart(1.8, 'Z', 0, 5, [1.1, 2.6]))
+    assert figure_spec(gauge) == figure_spec(dashboard.create_gauge_chart(1.8, 'Z', 0, 5, [1.1, 2.6]))
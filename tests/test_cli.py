@@ -0,0 +1,119 @@
+"""Headless batch scoring (ews.cli): the guarded worker pool and directory scoring"""
+
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+
+import ews.cli
+from benchmarks.workbooks import cf_export_workbook, vietnamese_workbook
+from ews.cli import (
+    ERROR_REPORT_COLUMNS, main, pool_map_guarded, process_workbook_guarded, process_workbooks, score_directory
+)
+from ews.panel import PANEL_SCHEMA
+
+@pytest.fixture
+def workbooks(tmp_path, monkeypatch):
+    """A good, a corrupt and a slow workbook; parsing the slow one takes far longer than any test timeout"""
+    paths = {
+        'good': tmp_path / 'good.xlsx',
+        'corrupt': tmp_path / 'corrupt.xlsx',
+        'slow': tmp_path / 'slow.xlsx',
+    }
+    paths['good'].write_bytes(cf_export_workbook(years=4).getvalue())
+    paths['corrupt'].write_bytes(b'PK\x03\x04 not really a zip')
+    paths['slow'].write_bytes(vietnamese_workbook(years=4).getvalue())
+    process_workbook = ews.cli.process_workbook
+
+    def slow_process_workbook(path):
+        if path.endswith('slow.xlsx'):
+            time.sleep(30)
+        return process_workbook(path)
+
+    # Worker processes are forked, so they see the patched module too
+    monkeypatch.setattr(ews.cli, 'process_workbook', slow_process_workbook)
+    return {name: str(path) for name, path in paths.items()}
+
+def test_timeout_in_main_thread_restores_the_alarm(workbooks):
+    handler = signal.getsignal(signal.SIGALRM)
+    started = time.perf_counter()
+    results = process_workbook_guarded(workbooks['slow'], timeout=0.2)
+    assert time.perf_counter() - started < 5
+    assert results['errors'] == ['timed out after 0.2s'] and not results['success']
+    assert signal.getsignal(signal.SIGALRM) is handler
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+
+@pytest.mark.parametrize('chunksize', [1, 2])
+def test_pool_keeps_order_and_isolates_failures(workbooks, chunksize):
+    paths = [workbooks['corrupt'], workbooks['good'], workbooks['slow'], workbooks['good']]
+    results = process_workbooks(paths, workers=2, chunksize=chunksize, timeout=1)
+
+    assert [r['company_info']['file_name'] for r in results] == paths
+    corrupt, good, slow, good_again = results
+    assert not corrupt['success'] and corrupt['errors']
+    assert good['success'] and good_again['success'] and good['data'] == good_again['data']
+    assert slow['errors'] == ['timed out after 1s']
+
+def _fail_on_odd(item, offset):
+    if item % 2:
+        raise ValueError(f"odd item {item}")
+    return item + offset
+
+def test_failed_tasks_do_not_abort_the_batch():
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        results = pool_map_guarded(executor, _fail_on_odd, list(range(6)), (100,), chunksize=1,
+                                   failed=lambda item, error: (item, error))
+    assert results[0::2] == [100, 102, 104]
+    assert [item for item, _ in results[1::2]] == [1, 3, 5]
+    assert all("ValueError('odd item" in error for _, error in results[1::2])
+
+def _exit_worker(item):
+    os._exit(1)
+
+def test_dead_worker_fails_its_items():
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        results = pool_map_guarded(executor, _exit_worker, [1, 2, 3], chunksize=2,
+                                   failed=lambda item, error: (item, error))
+    assert [item for item, _ in results] == [1, 2, 3]
+    assert all(error.startswith("worker process died") for _, error in results)
+
+def test_score_directory_builds_the_panel(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'cf.xlsx').write_bytes(cf_export_workbook(years=4).getvalue())
+    (tmp_path / 'sub' / 'vn.xlsx').write_bytes(vietnamese_workbook(years=3).getvalue())
+    (tmp_path / 'notes.xlsx').write_bytes(b'not a workbook')
+    (tmp_path / '~$cf.xlsx').write_bytes(b'lock file')
+
+    panel, report = score_directory(str(tmp_path))
+    assert list(panel.columns) == PANEL_SCHEMA
+    assert panel['Name'].tolist() == ['cf'] * 4 + ['vn'] * 3
+    assert panel['Year'].tolist() == [2010, 2011, 2012, 2013, 2010, 2011, 2012]
+    assert (panel['Date'] == panel['Year'].map(lambda year: f"{year}-12-31")).all()
+    assert panel['ews_level'].isin(['Safe', 'Watchlist', 'High Risk']).all()
+
+    assert list(report.columns) == ERROR_REPORT_COLUMNS
+    assert report['name'].tolist() == ['cf', 'notes', 'vn']
+    assert report['status'].tolist() == ['ok', 'failed', 'ok']
+    assert report.loc[1, 'years'] == 0 and report.loc[1, 'errors']
+
+    panel, _ = score_directory(str(tmp_path), name_from='company')
+    assert panel['Name'].drop_duplicates().tolist() == ['CÔNG TY CỔ PHẦN TỔNG HỢP 0', 'Synthetic Corp 0']
+
+def test_main_writes_panel_and_report(tmp_path, capsys):
+    input_dir = tmp_path / 'in'
+    input_dir.mkdir()
+    (input_dir / 'cf.xlsx').write_bytes(cf_export_workbook(years=4).getvalue())
+    (input_dir / 'broken.xlsx').write_bytes(b'not a workbook')
+    output, errors = tmp_path / 'panel.csv', tmp_path / 'errors.csv'
+
+    assert main([str(input_dir), '--output', str(output), '--errors', str(errors)]) == 0
+    panel = pd.read_csv(output)
+    assert list(panel.columns) == PANEL_SCHEMA and len(panel) == 4
+    assert pd.read_csv(errors)['status'].tolist() == ['failed', 'ok']
+    assert 'Scored 1 of 2 workbooks (4 firm-years)' in capsys.readouterr().err
+
+    (input_dir / 'cf.xlsx').unlink()
+    assert main([str(input_dir), '--output', str(output), '--errors', str(errors)]) == 1
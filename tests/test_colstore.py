@@ -0,0 +1,53 @@
+"""Memory-mapped column store (ews.colstore) against the indexed panel it is written from"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from ews.colstore import (
+    build_column_store, column_store_frame, column_store_is_fresh, open_column_store, store_company_rows,
+    store_company_year, store_portfolio_cube, store_year_rows
+)
+from ews.panel import (
+    apply_panel_dtypes, build_panel_deltas, build_panel_history, build_panel_index, build_portfolio_cube,
+    panel_company_rows, panel_company_year, panel_year_rows, score_ews_panel
+)
+
+PANEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '05_ews_application.csv')
+
+@pytest.fixture(scope='module')
+def index():
+    """The shipped panel as the dashboard's CSV mode indexes it"""
+    df = apply_panel_dtypes(build_panel_history(score_ews_panel(pd.read_csv(PANEL_PATH))))
+    return build_panel_index(build_panel_deltas(df[(df['Year'] >= 2014) & (df['Year'] <= 2024)]))
+
+@pytest.fixture(scope='module')
+def store(index, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('store') / 'panel.npcols')
+    build_column_store(index, path, version='v1')
+    return open_column_store(path)
+
+def as_stored(df, store):
+    """df with its string columns as the store's categoricals, as the store keeps strings as codes"""
+    return df.astype({column['name']: column['dtype'] for column in store['columns'] if column['kind'] == 'category'})
+
+def test_store_round_trips_the_frame(index, store):
+    pd.testing.assert_frame_equal(column_store_frame(store), as_stored(index['frame'], store))
+    for key in ['companies', 'company_slices', 'years', 'year_ranges']:
+        assert store[key] == index[key]
+
+def test_store_lookups_match_panel_index(index, store):
+    for name in index['companies'][::50]:
+        pd.testing.assert_frame_equal(store_company_rows(store, name), as_stored(panel_company_rows(index, name), store))
+        pd.testing.assert_frame_equal(store_company_year(store, name, 2020),
+                                      as_stored(panel_company_year(index, name, 2020), store))
+    for year in index['years']:
+        pd.testing.assert_frame_equal(store_year_rows(store, year), as_stored(panel_year_rows(index, year), store))
+    pd.testing.assert_frame_equal(store_portfolio_cube(store), build_portfolio_cube(index['frame']),
+                                  check_names=False, check_column_type=False)
+
+def test_store_freshness_follows_version(store):
+    assert column_store_is_fresh(store['path'], version='v1')
+    assert not column_store_is_fresh(store['path'], version='v2')
+    assert not column_store_is_fresh(store['path'] + '.missing')
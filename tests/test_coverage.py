@@ -0,0 +1,67 @@
+"""Portfolio coverage summary (ews.coverage) against a direct pass over the whole frame"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ews.coverage import COVERAGE_BIN_DECADES, build_coverage_summary, coverage_bins
+from ews.export import iter_frame_chunks
+
+@pytest.fixture(scope='module')
+def panel():
+    """5000 firm-years with some missing, zero and negative Interest and EBIT"""
+    rng = np.random.default_rng(0)
+    n = 5000
+    interest = rng.lognormal(20, 2, n) * rng.choice([-1, 0, 1], n, p=[0.05, 0.05, 0.9])
+    ebit = rng.lognormal(21, 2, n) * rng.choice([-1, 1], n, p=[0.1, 0.9])
+    interest[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame({
+        'Name': [f'C{i % 700:03d}' for i in range(n)],
+        'Year': rng.integers(2014, 2025, n),
+        'Interest': interest,
+        'EBIT': ebit,
+        'ews_level': rng.choice(['Safe', 'Watchlist', 'High Risk'], n)
+    })
+
+def summarize(chunks, **kwargs):
+    return build_coverage_summary(chunks, interest_col='Interest', ebit_col='EBIT', **kwargs)
+
+def test_chunked_summary_matches_whole_frame(panel):
+    summary = summarize(iter_frame_chunks(panel, rows=700), budget=len(panel))
+    present = panel.dropna(subset=['Interest', 'EBIT'])
+    positive = present[(present['Interest'] > 0) & (present['EBIT'] > 0)]
+
+    assert summary['n_points'] == len(positive)
+    assert summary['n_interest_non_positive'] == int((present['Interest'] <= 0).sum())
+    assert summary['n_ebit_non_positive'] == int((present['EBIT'] <= 0).sum())
+    assert (summary['x_min'], summary['x_max']) == (positive['Interest'].min(), positive['Interest'].max())
+    pd.testing.assert_frame_equal(summary['points'][['Interest', 'EBIT']],
+                                  positive[['Interest', 'EBIT']].reset_index(drop=True))
+
+    # Bins add up to the points, whatever the chunking
+    assert summary['bins']['count'].sum() == summary['n_points']
+    whole = summarize([panel], budget=len(panel))['bins']
+    pd.testing.assert_frame_equal(summary['bins'], whole)
+
+def test_points_dropped_past_budget(panel):
+    within = summarize(iter_frame_chunks(panel, rows=700), budget=len(panel))
+    over = summarize(iter_frame_chunks(panel, rows=700), budget=within['n_points'] - 1)
+    assert over['points'] is None
+    assert over['n_points'] == within['n_points']
+    pd.testing.assert_frame_equal(over['bins'], within['bins'])
+
+def test_year_filter(panel):
+    summary = summarize(iter_frame_chunks(panel, rows=700), year=2020, budget=len(panel))
+    assert set(summary['points']['Year']) == {2020}
+    assert summary['n_points'] == summarize([panel[panel['Year'] == 2020]], budget=len(panel))['n_points']
+
+def test_bins_count_the_points_in_their_bounds(panel):
+    positive = panel[(panel['Interest'] > 0) & (panel['EBIT'] > 0)].iloc[:500]
+    bins = coverage_bins(positive)
+    width = COVERAGE_BIN_DECADES
+    for level, ix, iy, count in bins.itertuples(index=False):
+        inside = ((positive['ews_level'] == level)
+                  & (positive['Interest'] >= 10 ** (ix * width)) & (positive['Interest'] < 10 ** ((ix + 1) * width))
+                  & (positive['EBIT'] >= 10 ** (iy * width)) & (positive['EBIT'] < 10 ** ((iy + 1) * width)))
+        assert inside.sum() == count
+    assert bins['count'].sum() == len(positive)
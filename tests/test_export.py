@@ -0,0 +1,60 @@
+"""XLSX export of a scored panel (ews.export) read back against the panel it was written from"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from ews.batch import signals_from_scores
+from ews.export import DRIVER_COLUMNS, EXPORT_SHEETS, export_panel_xlsx, iter_frame_chunks
+from ews.model import EWS_LEVELS
+from ews.panel import apply_panel_dtypes, build_panel_deltas, build_panel_history, build_portfolio_cube, score_ews_panel
+
+PANEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '05_ews_application.csv')
+
+@pytest.fixture(scope='module')
+def panel():
+    """The first 1500 rows of the shipped panel, scored as the dashboard's CSV mode scores it"""
+    df = apply_panel_dtypes(build_panel_history(score_ews_panel(pd.read_csv(PANEL_PATH, nrows=1500))))
+    return build_panel_deltas(df).sort_values(['Name', 'Year'], kind='stable').reset_index(drop=True)
+
+@pytest.fixture(scope='module')
+def sheets(panel):
+    """Each exported sheet's rows, written in chunks of 400 panel rows"""
+    with export_panel_xlsx(iter_frame_chunks(panel, rows=400)) as f:
+        workbook = load_workbook(f, read_only=True)
+        sheets = {name: list(workbook[name].values) for name in workbook.sheetnames}
+        workbook.close()
+    return sheets
+
+def test_companies_sheet_holds_every_row(panel, sheets):
+    assert list(sheets) == EXPORT_SHEETS
+    header, *rows = sheets['Companies']
+    assert list(header) == list(panel.columns)
+    exported = pd.DataFrame(rows, columns=header)
+    assert len(exported) == len(panel)
+    assert exported['Name'].tolist() == panel['Name'].astype(str).tolist()
+    assert exported['ews_level'].tolist() == panel['ews_level'].astype(str).tolist()
+    for col in ['Year', 'n_signals']:
+        np.testing.assert_array_equal(exported[col].to_numpy(dtype=float), panel[col].to_numpy(dtype=float))
+    # Cells keep the significant digits openpyxl writes, not always the last bit of a float
+    for col in ['Z_Score', 'S_Score', 'ROA']:
+        np.testing.assert_allclose(exported[col].to_numpy(dtype=float), panel[col].to_numpy(dtype=float),
+                                   rtol=1e-15, atol=0)
+
+def test_summary_sheet_counts_match_cube(panel, sheets):
+    header, *rows = sheets['Summary']
+    assert list(header) == ['Year'] + EWS_LEVELS + ['Total']
+    cube = build_portfolio_cube(panel)
+    expected = [tuple([int(year)] + [int(counts[level]) for level in EWS_LEVELS] + [int(counts.sum())])
+                for year, counts in cube.iterrows()]
+    assert rows == expected
+
+def test_drivers_sheet_matches_signals(panel, sheets):
+    header, *rows = sheets['Drivers']
+    assert list(header) == DRIVER_COLUMNS
+    expected = [(str(row['Name']), int(row['Year']), str(row['ews_level']), driver)
+                for _, row in panel.iterrows() for driver in signals_from_scores(row)['drivers']]
+    assert rows == expected
@@ -0,0 +1,155 @@
+"""Workbook loading and extraction (ews.extraction) against pandas' read_excel and openpyxl's load_workbook"""
+
+import datetime
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import ews.extraction
+
+from benchmarks.workbooks import cf_export_workbook, vietnamese_workbook
+from ews.cache import BoundedCache
+from ews.extraction import (
+    SNIFF_ROWS, load_statement_workbook, open_xlsx_package, process_cf_export_sheets, process_uploaded_file,
+    process_vietnamese_sheets, read_worksheet_frame, read_xlsx_statements, select_statement_sheets,
+    sniff_statement_header
+)
+
+def edge_case_workbook():
+    """A sheet with gaps, dates, booleans, formulas and error values"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Balance Sheet'
+    ws['A2'] = 'Company Name'
+    ws['B2'] = 'ACME JSC'
+    ws['A5'] = 'Statement Data'
+    ws['C5'] = 2020
+    ws['D5'] = 2021.0
+    ws['E5'] = datetime.date(2021, 12, 31)
+    ws['F5'] = True
+    ws['A7'] = '=1+1'
+    ws['G9'] = '#N/A'
+    ws['B40'] = 'below'
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+WORKBOOKS = {
+    'cf_export': lambda: cf_export_workbook(years=6, extra_rows=40),
+    'vietnamese': lambda: vietnamese_workbook(years=6, extra_rows=40),
+    'edge_cases': edge_case_workbook
+}
+
+@pytest.mark.parametrize('name', list(WORKBOOKS))
+def test_streamed_sheets_match_read_excel(name):
+    buffer = WORKBOOKS[name]()
+    wb = openpyxl.load_workbook(buffer, read_only=True, data_only=True)
+    for sheet in wb.sheetnames:
+        buffer.seek(0)
+        expected = pd.read_excel(buffer, sheet_name=sheet, header=None)
+        # read_excel infers float for a column of booleans and blanks; the values still agree
+        pd.testing.assert_frame_equal(read_worksheet_frame(wb[sheet]), expected, check_dtype=name != 'edge_cases')
+    wb.close()
+
+@pytest.mark.parametrize('build, process, sheets', [
+    (cf_export_workbook, process_cf_export_sheets, ['Balance Sheet', 'Income Statement']),
+    (vietnamese_workbook, process_vietnamese_sheets, ['Cân đối kế toán', 'Kết quả kinh doanh'])
+])
+def test_upload_matches_read_excel_extraction(build, process, sheets):
+    results = process_uploaded_file(build(years=6, extra_rows=40))
+    assert results['success'], results['errors']
+    assert results['years'] == list(range(2010, 2016))
+
+    # The same extraction over frames parsed by pd.read_excel, as before the streaming loader
+    frames = pd.read_excel(build(years=6, extra_rows=40), sheet_name=sheets, header=None)
+    expected = {'data': {}, 'years': [], 'company_info': {}}
+    process(frames[sheets[0]], frames[sheets[1]], expected)
+    assert results['data'] == expected['data']
+    assert results['company_info']['name'] == expected['company_info']['name']
+
+def test_reupload_reextracts_only_changed_years():
+    workbook = cf_export_workbook(years=6, extra_rows=40)
+    year_cache = BoundedCache(1024, 2 ** 24)
+    process_uploaded_file(workbook, year_cache)
+
+    # Correct Total Assets (ATOT, the first statement line) for 2012 only
+    wb = openpyxl.load_workbook(workbook)
+    wb['Balance Sheet'].cell(row=5, column=5).value *= 2
+    corrected = io.BytesIO()
+    wb.save(corrected)
+    corrected.name = workbook.name
+
+    misses = year_cache.stats()['misses']
+    corrected.seek(0)
+    results = process_uploaded_file(corrected, year_cache)
+    assert year_cache.stats()['misses'] - misses == 1
+    corrected.seek(0)
+    assert results == process_uploaded_file(corrected)
+
+@pytest.mark.parametrize('name', list(WORKBOOKS))
+def test_package_parse_matches_load_workbook(name):
+    buffer = WORKBOOKS[name]()
+    reader = open_xlsx_package(buffer)
+    try:
+        workbook = read_xlsx_statements(reader)
+    finally:
+        reader.archive.close()
+
+    buffer.seek(0)
+    wb = openpyxl.load_workbook(buffer, read_only=True, data_only=True)
+    file_format, bs_sheet, is_sheet = select_statement_sheets(wb.sheetnames)
+    assert workbook['sheet_names'] == wb.sheetnames
+    assert (workbook['format'], workbook['balance_sheet_name']) == (file_format, bs_sheet)
+    assert workbook['header'] == sniff_statement_header(read_worksheet_frame(wb[bs_sheet], SNIFF_ROWS), file_format)
+    pd.testing.assert_frame_equal(workbook['balance_sheet'], read_worksheet_frame(wb[bs_sheet]))
+    if is_sheet is not None:
+        pd.testing.assert_frame_equal(workbook['income_statement'], read_worksheet_frame(wb[is_sheet]))
+    wb.close()
+
+def test_only_statement_sheets_are_parsed(monkeypatch):
+    parsed = []
+    iter_xlsx_rows = ews.extraction.iter_xlsx_rows
+
+    def recording(reader, sheet_path, shared_strings):
+        parsed.append([sheet_path, 0])
+        for row in iter_xlsx_rows(reader, sheet_path, shared_strings):
+            parsed[-1][1] += 1
+            yield row
+
+    monkeypatch.setattr(ews.extraction, 'iter_xlsx_rows', recording)
+    load_statement_workbook(cf_export_workbook(years=4))
+    assert [path for path, _ in parsed] == ['xl/worksheets/sheet1.xml', 'xl/worksheets/sheet2.xml']
+
+    # Without a year row in the first SNIFF_ROWS rows, nothing past them is read
+    wb = openpyxl.Workbook()
+    for i in range(200):
+        wb.active.append([f'item {i}', i * 1.5])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.name = 'no_years.xlsx'
+    parsed.clear()
+    workbook = load_statement_workbook(buffer)
+    assert parsed == [['xl/worksheets/sheet1.xml', SNIFF_ROWS]]
+    assert workbook['balance_sheet'] is None
+    results = process_uploaded_file(buffer)
+    assert results['errors'] == [f"No year row found in the first {SNIFF_ROWS} rows of sheet 'Sheet'"]
+
+def test_package_errors_fall_back_to_load_workbook(monkeypatch):
+    expected = process_uploaded_file(cf_export_workbook(years=4))
+
+    def failing(reader):
+        raise AttributeError('openpyxl internals changed')
+
+    monkeypatch.setattr(ews.extraction, 'read_xlsx_statements', failing)
+    assert process_uploaded_file(cf_export_workbook(years=4)) == expected
+
+def test_other_package_errors_are_raised(monkeypatch):
+    def failing(reader):
+        raise RuntimeError('a bug in the package parse')
+
+    monkeypatch.setattr(ews.extraction, 'read_xlsx_statements', failing)
+    with pytest.raises(RuntimeError):
+        load_statement_workbook(cf_export_workbook(years=4))
@@ -0,0 +1,40 @@
+"""Import weight of the ews package: scoring loads without Streamlit, Plotly or FPDF"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+UI_MODULES = ['streamlit', 'plotly', 'fpdf']
+
+def loaded_ui_modules(code):
+    """UI modules in sys.modules after running `code` in a fresh interpreter"""
+    script = code + f"\nimport sys\nprint(','.join(m for m in {UI_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [name for name in result.stdout.strip().split(',') if name]
+
+def test_every_module_imports_without_ui_packages():
+    assert loaded_ui_modules(
+        "import importlib, pkgutil, ews\n"
+        "for module in pkgutil.iter_modules(ews.__path__):\n"
+        "    importlib.import_module('ews.' + module.name)"
+    ) == []
+
+def test_scoring_a_workbook_stays_light():
+    assert loaded_ui_modules(
+        "from benchmarks.workbooks import cf_export_workbook\n"
+        "from ews.cli import build_scored_panel, workbook_panel_rows\n"
+        "from ews.extraction import process_uploaded_file\n"
+        "results = process_uploaded_file(cf_export_workbook(years=4))\n"
+        "assert len(build_scored_panel(workbook_panel_rows(results, 'ACME'))) == 4"
+    ) == []
+
+def test_rendering_a_report_loads_only_fpdf():
+    assert loaded_ui_modules(
+        "from benchmarks.workbooks import cf_export_workbook\n"
+        "from ews.extraction import process_uploaded_file\n"
+        "from ews.report import company_report, render_company_report\n"
+        "results = process_uploaded_file(cf_export_workbook(years=4))\n"
+        "render_company_report(company_report(results['data'], results['company_info']))"
+    ) == ['fpdf']
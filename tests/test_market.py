@@ -0,0 +1,76 @@
+"""Market reference ratios (ews.market) against the medians the dashboard used to hard-code"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from ews.export import iter_frame_chunks
+from ews.market import (
+    MARKET_RATIOS, SIZE_BUCKETS, build_market_reference, market_medians, market_quantiles, market_ratio_frame,
+    market_reference_from_ratios, sample_market_ratios
+)
+from ews.panel import PANEL_COLUMNS
+
+PANEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '05_ews_application.csv')
+
+# The dashboard's pre-computed market medians of the shipped panel, rounded to 6 digits
+HARD_CODED_MEDIANS = {
+    2014: {'ROA': 0.052769, 'CUR': 1.510826, 'LEV': 0.502633, 'FAR': 0.360363, 'WC_Assets': 0.187950},
+    2015: {'ROA': 0.052414, 'CUR': 1.606347, 'LEV': 0.504608, 'FAR': 0.337595, 'WC_Assets': 0.210579},
+    2016: {'ROA': 0.054283, 'CUR': 1.641246, 'LEV': 0.500153, 'FAR': 0.360917, 'WC_Assets': 0.211378},
+    2017: {'ROA': 0.059779, 'CUR': 1.589761, 'LEV': 0.493173, 'FAR': 0.374649, 'WC_Assets': 0.202941},
+    2018: {'ROA': 0.059748, 'CUR': 1.604579, 'LEV': 0.476176, 'FAR': 0.358879, 'WC_Assets': 0.200405},
+    2019: {'ROA': 0.050066, 'CUR': 1.563973, 'LEV': 0.474889, 'FAR': 0.367471, 'WC_Assets': 0.214203},
+    2020: {'ROA': 0.046377, 'CUR': 1.557456, 'LEV': 0.467699, 'FAR': 0.371910, 'WC_Assets': 0.185982},
+    2021: {'ROA': 0.050660, 'CUR': 1.653436, 'LEV': 0.464749, 'FAR': 0.333126, 'WC_Assets': 0.216935},
+    2022: {'ROA': 0.045701, 'CUR': 1.677991, 'LEV': 0.454609, 'FAR': 0.324720, 'WC_Assets': 0.226708},
+    2023: {'ROA': 0.033380, 'CUR': 1.671736, 'LEV': 0.452314, 'FAR': 0.323718, 'WC_Assets': 0.220284},
+    2024: {'ROA': 0.038895, 'CUR': 1.677622, 'LEV': 0.455929, 'FAR': 0.317569, 'WC_Assets': 0.228293},
+    2025: {'ROA': 0.030631, 'CUR': 1.446915, 'LEV': 0.432996, 'FAR': 0.309996, 'WC_Assets': 0.232440},
+}
+
+@pytest.fixture(scope='module')
+def panel():
+    return pd.read_csv(PANEL_PATH, usecols=PANEL_COLUMNS)
+
+@pytest.fixture(scope='module')
+def reference(panel):
+    return build_market_reference(panel)
+
+def test_medians_match_hard_coded_values(reference):
+    assert reference['years'] == list(HARD_CODED_MEDIANS)
+    for year, medians in HARD_CODED_MEDIANS.items():
+        assert market_medians(reference, year) == pytest.approx(medians, abs=5e-7)
+
+def test_breakdowns(panel, reference):
+    frame = market_ratio_frame(panel[panel['Year'] == 2020])
+    size = float(frame['SIZE'].median())
+    lower, upper = reference['size_edges'][2020]
+    assert lower < size < upper
+    mid = frame[(frame['SIZE'] >= lower) & (frame['SIZE'] < upper)]
+    assert market_medians(reference, 2020, size=size) == pytest.approx(mid[MARKET_RATIOS].median().to_dict())
+    assert reference['size']['counts'].loc[2020].index.tolist() == SIZE_BUCKETS
+
+    quartiles = market_quantiles(reference, 2020, 0.25)
+    assert all(quartiles[ratio] <= market_medians(reference, 2020)[ratio] for ratio in MARKET_RATIOS)
+    assert market_medians(reference, 2030) == {}
+    # The shipped panel has no industry column
+    assert reference['industry'] is None and market_medians(reference, 2020, industry='Banks') == {}
+
+def test_sample_keeps_at_most_rows_per_year(panel):
+    sample = sample_market_ratios(iter_frame_chunks(panel, rows=500), rows_per_year=100)
+    counts = sample['Year'].value_counts()
+    assert counts.max() == 100
+    assert counts[2025] == (panel['Year'] == 2025).sum()
+    assert set(counts.index) == set(panel['Year'])
+    # Every sampled row is a row of its year
+    full = market_ratio_frame(panel)
+    keys = ['Year', 'SIZE'] + MARKET_RATIOS
+    assert len(sample.merge(full[keys].drop_duplicates(), on=keys)) == len(sample)
+
+def test_unsampled_stream_matches_loaded_panel(panel, reference):
+    streamed = market_reference_from_ratios(sample_market_ratios(iter_frame_chunks(panel, rows=500)))
+    for year in reference['years']:
+        assert market_medians(streamed, year) == pytest.approx(market_medians(reference, year))
+    pd.testing.assert_series_equal(streamed['all']['counts'], reference['all']['counts'])
@@ -0,0 +1,48 @@
+"""Panel scoring and history (ews.panel) against the shipped 05_ews_application.csv"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ews.panel import (
+    PANEL_HISTORY_COLUMNS, PANEL_MODEL_COLUMNS, build_panel_history, build_panel_deltas, score_ews_panel
+)
+
+PANEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '05_ews_application.csv')
+
+FLOAT_MODEL_COLUMNS = ['SIZE', 'ROA', 'CUR', 'LEV', 'FAR', 'Z_Score', 'S_Score']
+
+@pytest.fixture(scope='module')
+def shipped():
+    return pd.read_csv(PANEL_PATH)
+
+def assert_same_values(actual, expected):
+    pd.testing.assert_series_equal(actual.astype(object).where(actual.notna(), None),
+                                   expected.astype(object).where(expected.notna(), None),
+                                   check_dtype=False, check_names=False)
+
+def test_history_columns_match_shipped_panel(shipped):
+    # Shuffled, so the grouping cannot rely on the file's row order
+    shuffled = shipped.drop(columns=PANEL_HISTORY_COLUMNS).sample(frac=1, random_state=0)
+    rebuilt = build_panel_history(shuffled).loc[shipped.index]
+    for col in PANEL_HISTORY_COLUMNS:
+        assert_same_values(rebuilt[col], shipped[col])
+
+def test_model_columns_match_shipped_panel(shipped):
+    scored = score_ews_panel(shipped)
+    for col in PANEL_MODEL_COLUMNS:
+        if col in FLOAT_MODEL_COLUMNS:
+            # Equal up to floating-point rounding (a few ULP), not bit for bit
+            np.testing.assert_allclose(scored[col].to_numpy(dtype=float), shipped[col].to_numpy(dtype=float),
+                                       rtol=1e-12, atol=0, equal_nan=True)
+        else:
+            assert_same_values(scored[col], shipped[col])
+
+def test_deltas_match_per_company_diff(shipped):
+    df = build_panel_deltas(shipped.sample(frac=1, random_state=1)).sort_values(['Name', 'Year'])
+    grouped = df.groupby('Name', sort=False)
+    expected_yoy = grouped['Earnings before Interest & Taxes (EBIT)'].pct_change(fill_method=None) * 100
+    np.testing.assert_allclose(df['EBIT_yoy'], expected_yoy, equal_nan=True)
+    np.testing.assert_allclose(df['signal_delta'], grouped['n_signals'].diff(), equal_nan=True)
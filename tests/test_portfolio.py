@@ -0,0 +1,68 @@
+"""Portfolio of uploads (ews.portfolio): league table order, peer percentiles and uneven year coverage"""
+
+import pytest
+
+from benchmarks.workbooks import cf_export_workbook, vietnamese_workbook
+from ews.extraction import process_uploaded_file
+from ews.portfolio import EWS_LEVEL_RANK, LEAGUE_COLUMNS, PEER_METRICS, portfolio_aggregates, portfolio_names
+
+def upload(workbook):
+    return workbook.name, process_uploaded_file(workbook)
+
+@pytest.fixture(scope='module')
+def uploads():
+    """Six workbooks covering 2010-2013 to 2010-2015, one of them twice, and an unreadable file"""
+    workbooks = [cf_export_workbook(years=6, seed=seed) for seed in range(3)]
+    workbooks += [vietnamese_workbook(years=4, seed=seed) for seed in range(2)]
+    workbooks.append(cf_export_workbook(years=5, seed=0))
+    broken = ('broken.xlsx', {'success': False, 'errors': ['not a workbook'], 'company_info': {}})
+    return [upload(workbook) for workbook in workbooks] + [broken]
+
+@pytest.fixture(scope='module')
+def aggregates(uploads):
+    return portfolio_aggregates(uploads)
+
+def test_names_and_failures(uploads, aggregates):
+    names = portfolio_names(uploads[:-1])
+    assert names[1:5] == ['Synthetic Corp 1', 'Synthetic Corp 2', 'CÔNG TY CỔ PHẦN TỔNG HỢP 0',
+                          'CÔNG TY CỔ PHẦN TỔNG HỢP 1']
+    # The company uploaded twice is told apart by file name
+    assert names[0] == 'Synthetic Corp 0 (cf_export_6y_0r_0)' and names[5] == 'Synthetic Corp 0 (cf_export_5y_0r_0)'
+    assert aggregates['companies'] == sorted(names)
+    assert aggregates['failed'] == [('broken.xlsx', ['not a workbook'])]
+    assert set(aggregates['statements']) == set(names)
+
+def test_league_table_order(aggregates):
+    for year, table in aggregates['league'].items():
+        assert list(table.columns) == ['Name', 'Year'] + LEAGUE_COLUMNS
+        assert table['Name'].is_unique
+        keys = list(zip(~table['priority_flag'], table['ews_level'].map(EWS_LEVEL_RANK),
+                        -table['n_signals'], table['Z_Score'], table['Name']))
+        assert keys == sorted(keys)
+
+def test_peer_percentiles_are_bounded(aggregates):
+    for year, percentiles in aggregates['percentiles'].items():
+        assert list(percentiles.columns) == PEER_METRICS
+        values = percentiles.to_numpy()
+        assert ((values > 0) & (values <= 100)).all()
+        # Each metric's top company sits at 100
+        assert (percentiles.max() == 100).all()
+
+def test_missing_years(aggregates):
+    panel = aggregates['panel']
+    assert aggregates['years'] == list(range(2010, 2016))
+    assert panel.groupby('Name')['Year'].max().value_counts().to_dict() == {2015: 3, 2014: 1, 2013: 2}
+
+    # Companies without a 2015 row are left out of that year, not filled in
+    assert sorted(aggregates['league'][2015]['Name']) == sorted(panel.loc[panel['Year'] == 2015, 'Name'])
+    assert len(aggregates['percentiles'][2015]) == 3
+    assert aggregates['cube'].loc[2015].sum() == 3 and aggregates['cube'].loc[2010].sum() == 6
+
+    # Without a year, every company is ranked on its latest year
+    latest = aggregates['league'][None]
+    assert len(latest) == 6
+    assert latest.set_index('Name')['Year'].to_dict() == panel.groupby('Name')['Year'].max().to_dict()
+    percentiles = aggregates['percentiles'][None]
+    assert sorted(percentiles.index) == aggregates['companies']
+    assert percentiles.loc[latest['Name'], 'n_signals'].tolist() == pytest.approx(
+        (latest['n_signals'].rank(method='max', pct=True) * 100).tolist())
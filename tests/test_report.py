@@ -0,0 +1,77 @@
+"""PDF risk reports (ews.report): content, rendering, archives and the batch paths"""
+
+import io
+import re
+import zipfile
+import zlib
+
+import pytest
+
+from benchmarks.workbooks import cf_export_workbook, vietnamese_workbook
+from ews.extraction import process_uploaded_file
+from ews.report import company_report, main, render_company_report, render_company_reports, report_archive
+
+@pytest.fixture(scope='module')
+def uploads():
+    """Extraction results of two workbooks (2010-2013 and 2010-2014)"""
+    return [process_uploaded_file(cf_export_workbook(years=4)), process_uploaded_file(vietnamese_workbook(years=5))]
+
+def page_text(pdf):
+    """The decompressed content streams of a PDF, where its drawn text can be searched"""
+    streams = re.findall(rb'stream\r?\n(.*?)\r?\nendstream', pdf, re.S)
+    return b''.join(zlib.decompress(stream) for stream in streams).decode('latin-1')
+
+def without_creation_date(pdf):
+    return re.sub(rb'/CreationDate \(D:\d+\)', b'', pdf)
+
+def test_company_report_renders_a_pdf(uploads):
+    results = uploads[0]
+    report = company_report(results['data'], results['company_info'])
+    assert report['year'] == 2013 and report['requested_year'] is None
+    pdf = render_company_report(report)
+    assert pdf.startswith(b'%PDF') and pdf.rstrip().endswith(b'%%EOF')
+    text = page_text(pdf)
+    assert 'fiscal year 2013' in text
+    assert 'is not in the statements' not in text
+
+def test_missing_year_is_labeled(uploads):
+    results = uploads[0]
+    report = company_report(results['data'], results['company_info'], year=2020)
+    assert (report['year'], report['requested_year']) == (2013, 2020)
+    text = page_text(render_company_report(report))
+    assert 'Fiscal year 2020 is not in the statements; the latest year, 2013, is reported instead.' in text
+
+def test_pool_renders_the_serial_bytes(uploads):
+    items = [(results['data'], results['company_info'], year)
+             for results in uploads for year in [None, 2011]]
+    serial = render_company_reports(items, workers=1)
+    pooled = render_company_reports(items, workers=2, chunksize=1)
+    assert len(pooled) == len(items)
+    # Only the creation timestamp may differ
+    assert [without_creation_date(pdf) for pdf in pooled] == [without_creation_date(pdf) for pdf in serial]
+
+def test_archive_entries_stay_distinct():
+    names = ['ACME JSC', 'acme jsc', 'A/B Corp', 'A_B Corp', '../etc', 'Cổ Phần', 'ACME JSC']
+    pdfs = [f'%PDF-{i}'.encode() for i in range(len(names))]
+    with zipfile.ZipFile(io.BytesIO(report_archive(zip(names, pdfs)))) as archive:
+        entries = archive.namelist()
+        assert [archive.read(entry) for entry in entries] == pdfs
+    assert len({entry.lower() for entry in entries}) == len(names)
+    assert all(entry.endswith('.pdf') and '/' not in entry and '\\' not in entry for entry in entries)
+    assert entries[:2] == ['ACME JSC.pdf', 'acme jsc (2).pdf']
+    assert entries[5] == 'Cô Phân.pdf'
+
+def test_main_reports_each_workbook(tmp_path, capsys):
+    input_dir = tmp_path / 'in'
+    (input_dir / 'sub').mkdir(parents=True)
+    (input_dir / 'cf.xlsx').write_bytes(cf_export_workbook(years=4).getvalue())
+    (input_dir / 'sub' / 'vn.xlsx').write_bytes(vietnamese_workbook(years=4).getvalue())
+    (input_dir / 'broken.xlsx').write_bytes(b'not a workbook')
+    output_dir = tmp_path / 'out'
+
+    assert main([str(input_dir), '--output-dir', str(output_dir), '--year', '2012']) == 0
+    assert sorted(path.name for path in output_dir.iterdir()) == ['cf.pdf', 'sub__vn.pdf']
+    assert (output_dir / 'cf.pdf').read_bytes().startswith(b'%PDF')
+    err = capsys.readouterr().err
+    assert 'broken.xlsx' in err
+    assert 'Wrote 2 of 3 reports' in err
@@ -0,0 +1,110 @@
+"""Streamed panel access (ews.stream) against the panel loaded whole (ews.panel)"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ews.panel import (
+    PANEL_CATEGORY_COLUMNS, PANEL_FIELD_COLUMNS, apply_panel_dtypes, build_panel_deltas, build_panel_history, build_panel_index,
+    build_portfolio_cube, panel_company_rows, panel_version, score_ews_panel
+)
+from ews.stream import (
+    iter_stream_companies, load_stream_index, panel_stream_index_path, read_stream_index, scan_panel,
+    stream_company_rows
+)
+
+PANEL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '05_ews_application.csv')
+
+YEAR_RANGE = (2016, 2022)
+# Small blocks, so runs of a company span block boundaries
+BLOCK_BYTES = 4096
+
+@pytest.fixture(scope='module')
+def panel_csv(tmp_path_factory):
+    """Rows of 40 shipped companies, shuffled so each company's rows are split into many runs"""
+    shipped = pd.read_csv(PANEL_PATH)
+    names = shipped['Name'].drop_duplicates().iloc[:40]
+    rows = shipped[shipped['Name'].isin(names)].sample(frac=1, random_state=0)
+    path = str(tmp_path_factory.mktemp('panel') / 'panel.csv')
+    rows.to_csv(path, index=False)
+    return path
+
+@pytest.fixture(scope='module')
+def loaded(panel_csv):
+    """The panel index the dashboard builds from the loaded CSV"""
+    df = apply_panel_dtypes(build_panel_history(score_ews_panel(pd.read_csv(panel_csv))))
+    df = df[(df['Year'] >= YEAR_RANGE[0]) & (df['Year'] <= YEAR_RANGE[1])]
+    return build_panel_index(build_panel_deltas(df))
+
+def comparable(df):
+    """Fields as float (streamed fields are parsed as float) and categoricals by value"""
+    df = df.astype({col: object for col in PANEL_CATEGORY_COLUMNS})
+    return df.astype({col: float for col in PANEL_FIELD_COLUMNS.values()}).reset_index(drop=True)
+
+def assert_same_rows(streamed, expected):
+    pd.testing.assert_frame_equal(comparable(streamed), comparable(expected))
+
+def test_company_rows_match_loaded_panel(panel_csv, loaded):
+    index = load_stream_index(panel_csv, YEAR_RANGE)
+    assert index['companies'] == loaded['companies']
+    assert index['years'] == loaded['years']
+    pd.testing.assert_frame_equal(index['cube'], build_portfolio_cube(loaded['frame']),
+                                  check_names=False, check_column_type=False, check_index_type=False)
+    for name in loaded['companies']:
+        assert_same_rows(stream_company_rows(index, name), panel_company_rows(loaded, name))
+
+def test_streamed_companies_match_loaded_panel(panel_csv, loaded):
+    index = load_stream_index(panel_csv, YEAR_RANGE)
+    frames = list(iter_stream_companies(index, block_bytes=BLOCK_BYTES))
+    assert len(frames) > 1
+    assert_same_rows(pd.concat(frames), loaded['frame'])
+
+def test_sidecar_index_round_trip(panel_csv):
+    index_path = panel_stream_index_path(panel_csv)
+    version = panel_version(panel_csv, store_path='')
+    # Scanned in small blocks, the runs still match a scan in one block
+    scanned = scan_panel(panel_csv, YEAR_RANGE, block_bytes=BLOCK_BYTES)
+    assert len(scanned['run_codes']) > len(scanned['names'])
+
+    load_stream_index(panel_csv, YEAR_RANGE)
+    saved = read_stream_index(index_path, panel_csv, version, YEAR_RANGE)
+    assert saved is not None
+    for key in ['names', 'run_codes', 'run_starts', 'run_stops']:
+        np.testing.assert_array_equal(saved[key], scanned[key])
+    assert saved['companies'] == scanned['companies']
+    pd.testing.assert_frame_equal(saved['cube'], scanned['cube'], check_names=False, check_column_type=False,
+                                  check_index_type=False)
+
+    # Another year range or panel version is not served from the sidecar
+    assert read_stream_index(index_path, panel_csv, version, (2014, 2024)) is None
+    assert read_stream_index(index_path, panel_csv, 'other', YEAR_RANGE) is None
+
+def test_rows_without_a_name_belong_to_no_company(panel_csv, tmp_path):
+    rows = pd.read_csv(panel_csv)
+    # Blank Names at the start, in the middle and on the last line, where code -1 would index the last company
+    blank = [0, len(rows) // 2, len(rows) - 1]
+    rows.loc[blank, 'Name'] = np.nan
+    path = str(tmp_path / 'blank_names.csv')
+    rows.to_csv(path, index=False)
+
+    index = scan_panel(path, YEAR_RANGE, block_bytes=BLOCK_BYTES)
+    assert (index['run_codes'] >= 0).all()
+    named = rows.drop(index=blank)
+    in_range = named[(named['Year'] >= YEAR_RANGE[0]) & (named['Year'] <= YEAR_RANGE[1])]
+    assert index['companies'] == sorted(in_range['Name'].unique())
+    # Each company's runs cover exactly its own lines
+    with open(path, 'rb') as f:
+        data = f.read()
+    for code, name in enumerate(index['names']):
+        runs = np.flatnonzero(index['run_codes'] == code)
+        lines = b''.join(data[index['run_starts'][run]:index['run_stops'][run]] for run in runs)
+        assert lines.count(b'\n') == (named['Name'] == name).sum()
+        assert all(line.startswith(name.encode()) or f'"{name}"'.encode() in line
+                   for line in lines.splitlines())
+
+    # The cube still counts every firm-year in range, named or not
+    scored = score_ews_panel(rows[(rows['Year'] >= YEAR_RANGE[0]) & (rows['Year'] <= YEAR_RANGE[1])])
+    pd.testing.assert_frame_equal(index['cube'], build_portfolio_cube(scored),
+                                  check_names=False, check_column_type=False, check_index_type=False)
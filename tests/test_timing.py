@@ -0,0 +1,107 @@
+"""Span timing (ews.timing): nesting, exceptions and spans recorded in worker threads"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ews import timing
+from ews.cache import BoundedCache, iter_processed_uploads
+from benchmarks.workbooks import cf_export_workbook, vietnamese_workbook
+
+@pytest.fixture
+def recording():
+    timing.start()
+    yield
+    timing.stop()
+
+@timing.timed('inner')
+def inner(value):
+    time.sleep(0.01)
+    return value * 2
+
+@timing.timed('failing')
+def failing():
+    with timing.span('failing.step'):
+        raise ValueError('boom')
+
+def test_nested_spans(recording):
+    with timing.span('outer'):
+        with timing.span('middle'):
+            assert inner(2) == 4
+        assert inner(3) == 6
+    records = timing.stop()
+    assert [(name, depth) for name, depth, _ in records] == [('inner', 2), ('middle', 1), ('inner', 1), ('outer', 0)]
+    elapsed = {name: seconds for name, _, seconds in records}
+    assert elapsed['outer'] >= elapsed['middle'] >= 0.01
+
+    summary = timing.summarize(records)
+    # Outermost first, then by total time: inner's two calls outlast middle's one
+    assert [entry['name'] for entry in summary] == ['outer', 'inner', 'middle']
+    assert summary[1]['calls'] == 2 and summary[1]['depth'] == 1
+    assert json.loads(timing.log_line(records, page='test'))['spans']['inner']['calls'] == 2
+
+def test_raising_function_closes_its_span(recording):
+    with pytest.raises(ValueError):
+        failing()
+    # Depth is back at the top, so the next span is not nested under the failed one
+    with timing.span('after'):
+        pass
+    assert [(name, depth) for name, depth, _ in timing.stop()] == [
+        ('failing.step', 1), ('failing', 0), ('after', 0)
+    ]
+
+def test_off_by_default():
+    assert not timing.is_enabled()
+    assert inner(1) == 2
+    with timing.span('ignored'):
+        pass
+    assert timing.stop() == []
+
+    # Another thread does not see this thread's recording
+    timing.start()
+    enabled = []
+    worker = threading.Thread(target=lambda: enabled.append(timing.is_enabled()))
+    worker.start()
+    worker.join()
+    timing.stop()
+    assert enabled == [False]
+
+def test_spans_from_pool_threads_merge_into_caller(recording):
+    with timing.span('batch'):
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(timing.capture, inner, value) for value in range(6)]
+            for future in futures:
+                result, records = future.result()
+                assert [(name, depth) for name, depth, _ in records] == [('inner', 0)]
+                timing.merge(records)
+    records = timing.stop()
+    assert [(name, depth) for name, depth, _ in records] == [('inner', 1)] * 6 + [('batch', 0)]
+
+    # Without recording in the caller, merge drops the worker's spans
+    timing.merge(records)
+    assert timing.stop() == []
+
+def test_capture_restores_the_thread_state(recording):
+    with timing.span('outer'):
+        result, records = timing.capture(inner, 5)
+        assert result == 10 and [(name, depth) for name, depth, _ in records] == [('inner', 0)]
+        assert timing.is_enabled()
+    assert [name for name, _, _ in timing.stop()] == ['outer']
+
+    with pytest.raises(ValueError):
+        timing.capture(failing)
+    assert not timing.is_enabled()
+
+def test_upload_workers_spans_are_merged(recording):
+    uploads = [cf_export_workbook(years=4), vietnamese_workbook(years=4)]
+    with timing.span('uploads'):
+        results = dict(iter_processed_uploads(uploads, BoundedCache(8, 2 ** 24)))
+    assert all(results[position]['success'] for position in range(2))
+    records = timing.stop()
+    names = [name for name, _, _ in records]
+    assert names[-1] == 'uploads'
+    assert names.count('extract.read_workbook') == 2
+    assert all(depth >= 1 for _, depth, _ in records[:-1])